@@ -4,20 +4,101 @@ A toolkit of geo-processing tools.
 
 These tools were created for special tasks by Alaska NPS GIS users
 and then generalized.
+
+The public names are imported lazily: a tool module (and its dependencies) is
+only imported when one of its names is first used.  Python 2.7 and 3.5/3.6
+do not support a module level __getattr__, so they import everything now.
 """
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import importlib
+import sys
+import types
+
 # Expose select internal module items as a single module.
-from .utils import valid_field_name
-from .add_area import add_area_to_feature, add_area_to_features
-from .add_area import valid_units_pretty as valid_area_units
-from .add_id import add_id_to_feature, add_id_to_features
-from .add_length import add_length_to_feature, add_length_to_features
-from .add_length import valid_units_pretty as valid_length_units
-from .lake_volume import lake_volume
-from .line_to_rectangle import line_to_rectangle
-from .longest_axis import longest_axis
-from .obscure_points import obscure_points
-from .points_to_polygons import points_to_polygons
-from .polygon_from_point import polygon_from_control_point
-from .random_transects import random_transects
-from .square_building import square_buildings
-from .table_to_shape import table_to_shape
+# public name: (module, name in module)
+_exports = {
+    "valid_field_name": ("utils", "valid_field_name"),
+    "AlaskaPakError": ("utils", "AlaskaPakError"),
+    "ParameterError": ("utils", "ParameterError"),
+    "add_area_to_feature": ("add_area", "add_area_to_feature"),
+    "add_area_to_features": ("add_area", "add_area_to_features"),
+    "valid_area_units": ("add_area", "valid_units_pretty"),
+    "add_geometry_attributes": ("add_geometry_attributes", "add_geometry_attributes"),
+    "add_geometry_attributes_to_feature": (
+        "add_geometry_attributes",
+        "add_geometry_attributes_to_feature",
+    ),
+    "geometry_metrics": ("add_geometry_attributes", "METRICS"),
+    "add_geometry_attributes_parameter_fixer": (
+        "add_geometry_attributes",
+        "parameter_fixer",
+    ),
+    "add_id_to_feature": ("add_id", "add_id_to_feature"),
+    "add_id_to_features": ("add_id", "add_id_to_features"),
+    "id_modes": ("add_id", "ID_MODES"),
+    "id_spatial_orders": ("add_id", "SPATIAL_ORDERS"),
+    "add_length_to_feature": ("add_length", "add_length_to_feature"),
+    "add_length_to_features": ("add_length", "add_length_to_features"),
+    "valid_length_units": ("add_length", "valid_units_pretty"),
+    "lake_volume": ("lake_volume", "lake_volume"),
+    "line_to_rectangle": ("line_to_rectangle", "line_to_rectangle"),
+    "longest_axis": ("longest_axis", "longest_axis"),
+    "obscure_points": ("obscure_points", "obscure_points"),
+    "points_to_polygons": ("points_to_polygons", "points_to_polygons"),
+    "polygon_from_control_point": ("polygon_from_point", "polygon_from_control_point"),
+    "run_batch": ("batch", "run_batch"),
+    "random_transects": ("random_transects", "random_transects"),
+    "random_transects_parameter_fixer": ("random_transects", "parameter_fixer"),
+    "square_buildings": ("square_building", "square_buildings"),
+    "table_to_shape": ("table_to_shape", "table_to_shape"),
+}
+
+
+def _import(module_name):
+    """Import a tool module and bind all of its public names in the package."""
+    module = importlib.import_module("." + module_name, __name__)
+    names = globals()
+    for name, (export_module, attribute) in _exports.items():
+        if export_module == module_name:
+            names[name] = getattr(module, attribute)
+    return module
+
+
+if sys.version_info >= (3, 7):
+
+    class _Package(types.ModuleType):
+        """The type of this package module.
+
+        Importing a submodule (e.g. `import alaskapak.random_transects`, or
+        `importlib.import_module()`) sets the package attribute of the same
+        name to the module, which would hide the public function with that
+        name.  The function is bound instead, as it was when the package
+        imported every module up front.
+        """
+
+        def __setattr__(self, name, value):
+            if isinstance(value, types.ModuleType) and name in _exports:
+                export_module, attribute = _exports[name]
+                if value.__name__ == __name__ + "." + export_module:
+                    value = getattr(value, attribute)
+            super(_Package, self).__setattr__(name, value)
+
+    sys.modules[__name__].__class__ = _Package
+
+    def __getattr__(name):
+        """Import the module for a public name when it is first used (PEP 562)."""
+        if name not in _exports:
+            msg = "module {0!r} has no attribute {1!r}".format(__name__, name)
+            raise AttributeError(msg)
+        _import(_exports[name][0])
+        return globals()[name]
+
+    def __dir__():
+        """List the public names, including those not imported yet."""
+        return sorted(set(globals()) | set(_exports))
+
+else:
+    for _module_name in sorted(set(module for module, _ in _exports.values())):
+        _import(_module_name)
@@ -35,30 +35,43 @@ valid_units_pretty = [
 valid_units = [units.upper().replace(" ", "") for units in valid_units_pretty]
 
 
-def add_area_to_feature(feature, units=None, field_name="Area", overwrite=False):
+@utils.instrumented
+@utils.cached_schema
+def add_area_to_feature(
+    feature, units=None, field_name="Area", overwrite=False, incremental=False
+):
     """Add an area attribute to a polygon feature class.
 
     Args:
         feature (text): A path to an ArcGIS polygon feature classes.
         units (text, optional): The areal units for the calculated area.
           must be one of `valid_units`. If None, the square units of the feature
-          class will be used. Defaults to None.
+          class will be used (square meters for geographic data, where the area
+          is measured on the ellipsoid). Defaults to None.
         field_name (text, optional): The name of the field to store the
           calculated area. Defaults to "Area".
         overwrite (bool, optional): If True, then we are allowed to overwrite
           any existing values in the field named `field_name`. Defaults to False.
+        incremental (bool, optional): If True, only rows whose shape changed since
+          the last incremental run are recalculated.  The hash of each shape is
+          saved in a text field named for `field_name` with a "_Hash" suffix.
+          Implies overwrite. Defaults to False.
 
     Returns:
-        None
+        int: The number of rows updated, or None if the feature class was skipped.
     """
+
+    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+
     print_units = units if units is not None else "feature's units"
     utils.info("Adding {0} (in {1}) to {2}".format(field_name, print_units, feature))
 
     # Verify or create field name
-    field_names = [field.name for field in arcpy.ListFields(feature)]
+    created = False
+    field_names = [field.name for field in utils.list_fields(feature)]
     if field_name in field_names:
-        if overwrite:
-            if not arcpy.ListFields(feature, field_name, "Double"):
+        if overwrite or incremental:
+            if not utils.list_fields(feature, field_name, "Double"):
                 msg = "Field {0} exists, but is not the right type. Skipping..."
                 utils.warn(msg.format(field_name))
                 return
@@ -71,38 +84,96 @@ def add_area_to_feature(feature, units=None, field_name="Area", overwrite=False)
         if arcpy.TestSchemaLock(feature):
             new_field_name = utils.valid_field_name(field_name, feature)
             utils.info("Creating new field {0}".format(new_field_name))
-            arcpy.AddField_management(feature, new_field_name, "Double")
+            utils.add_field(feature, new_field_name, "Double")
+            created = True
         else:
             msg = "Unable to acquire a schema lock to add the new field. Skipping..."
             utils.warn(msg)
             return
 
-    description = arcpy.Describe(feature)
-    geometry_name = description.shapeFieldName
-    spatial_reference = description.spatialReference
-    if spatial_reference.type == "Geographic":
-        utils.warn("Calculating area on geographic data is usually suspect.")
-
-    if units is None:
-        area = "!{0}.area!".format(geometry_name)
+    spatial_reference = utils.describe(feature).spatialReference
+    geographic = spatial_reference.type == "Geographic"
+    if geographic:
+        if units is None:
+            utils.info("Geographic data; area will be in square meters.")
+            units = "SQUAREMETERS"
+        factor = utils.unit_factor("SQUAREMETERS", units)
     else:
-        if spatial_reference.type == "Geographic":
-            area = "!{0}.geodesicArea@{1}!".format(geometry_name, units)
-        else:
-            area = "!{0}.area@{1}!".format(geometry_name, units)
-
-    # For the !shape! calculation, the expression type must be python.
-    # In Pro, the default is "PYTHON3" (ok), but in 10.x, the default is "VB"
-    # Need to explicitly use "PYTHON_9.3" in 10.x
-    expression_type = "PYTHON3"
-    if sys.version_info[0] < 3:
-        expression_type = "PYTHON_9.3"
+        factor = area_factor(spatial_reference, units)
 
-    arcpy.CalculateField_management(feature, new_field_name, area, expression_type)
+    fields = ["OID@", new_field_name]
+    changed = None
+    if incremental:
+        hash_field = utils.add_hash_field(feature, new_field_name)
+        if hash_field is None:
+            return
+        fields.append(hash_field)
+        method = "geodesic" if geographic else "planar"
+        salt = "{0} {1!r}".format(method, factor)
+        changed = utils.changed_shapes(feature, hash_field, salt, force=created)
+
+    if geographic:
+        # Planar area in square degrees is meaningless; use the ellipsoid
+        areas = utils.geodesic_measures(feature, ["area"], changed)
+    else:
+        areas = utils.planar_measures(feature, ["area"], changed)
+
+    # The cursor has no shape field; updating a row with its shape writes the
+    # shape back, which is slow, updates the editor tracking fields and can
+    # change the coordinates.
+    count = 0
+    skipped = 0
+    with utils.span("write"), arcpy.da.UpdateCursor(feature, fields) as cursor:
+        for row in cursor:
+            if changed is not None:
+                if row[0] not in changed:
+                    skipped += 1
+                    continue
+                row[2] = changed[row[0]]
+            (area,) = areas.get(row[0], [None])
+            row[1] = None if area is None else area * factor
+            cursor.updateRow(row)
+            count += 1
+    utils.count("rows_written", count)
+    utils.count("rows_skipped", skipped)
+    if changed is not None:
+        utils.info("Skipped {0} unchanged rows.".format(skipped))
+    return count
+
+
+def area_factor(spatial_reference, units=None):
+    """Return the number of `units` in one square unit of spatial_reference.
 
+    Args:
+        spatial_reference (arcpy.SpatialReference): The coordinate system of the
+          calculated areas.
+        units (text, optional): One of `valid_units`, or None for the
+          square units of spatial_reference (a factor of 1). Defaults to None.
 
-def add_area_to_features(features, units=None, field_name="Area", overwrite=False):
-    """Add an area attribute to a polygon feature class.
+    Returns:
+        float: The multiplier to convert the areas to `units`.
+    """
+    if units is None:
+        return 1.0
+    meters = spatial_reference.metersPerUnit
+    return meters * meters * utils.unit_factor("SQUAREMETERS", units)
+
+
+@utils.instrumented
+@utils.cached_schema
+def add_area_to_features(
+    features,
+    units=None,
+    field_name="Area",
+    overwrite=False,
+    workers=1,
+    incremental=False,
+):
+    """Add an area attribute to multiple polygon feature classes.
+
+    Feature classes in different workspaces can be processed at the same time
+    (see `utils.process_by_workspace()`).  A summary of the time and status for
+    each feature class is printed at the end.
 
     Args:
         features (list[text]): A list of paths to ArcGIS polygon feature classes.
@@ -113,13 +184,17 @@ def add_area_to_features(features, units=None, field_name="Area", overwrite=Fals
           calculated area. Defaults to "Area".
         overwrite (bool, optional): If True, then we are allowed to overwrite
           any existing values in the field named `field_name`. Defaults to False.
+        workers (int, optional): The maximum number of workspaces to process at
+          the same time. Defaults to 1.
+        incremental (bool, optional): If True, only rows whose shape changed
+          are recalculated (see `add_area_to_feature()`). Defaults to False.
 
     Returns:
-        None
+        list[tuple]: The results from `utils.process_by_workspace()`.
     """
 
-    for feature in features:
-        add_area_to_feature(feature, units, field_name, overwrite)
+    args = (units, field_name, overwrite, incremental)
+    return utils.process_by_workspace(add_area_to_feature, features, args, workers)
 
 
 def parameter_fixer(args):
@@ -143,16 +218,27 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-branches
 
     arg_count = len(args)
-    if arg_count < 1 or arg_count > 4:
-        usage = "Usage: {0} features [units] [field_name] [overwrite]"
+    if arg_count < 1 or arg_count > 6:
+        usage = (
+            "Usage: {0} features [units] [field_name] [overwrite] [workers] "
+            "[incremental]"
+        )
         utils.die(usage.format(sys.argv[0]))
 
+    if arg_count < 6 or not args[5]:
+        incremental = "#"
+    else:
+        incremental = args[5]
+    if arg_count < 5 or not args[4]:
+        workers = "#"
+    else:
+        workers = args[4]
     if arg_count < 4 or not args[3]:
         overwrite = "#"
     else:
@@ -172,8 +258,8 @@ def parameter_fixer(args):
     for feature in feature_list.split(";"):
         if feature[0] == "'" and feature[-1] == "'":
             feature = feature[1:-1]
-        if arcpy.Exists(feature):
-            if arcpy.Describe(feature).shapeType == "Polygon":
+        if utils.exists(feature):
+            if utils.describe(feature).shapeType == "Polygon":
                 features.append(feature)
             else:
                 msg = "Feature class ({0}) is not polygons. Skipping."
@@ -201,7 +287,22 @@ def parameter_fixer(args):
     else:
         overwrite = overwrite.upper() in ["TRUE", "YES", "ON"]
 
-    return [features, units, field_name, overwrite]
+    # validate workers
+    if workers == "#":
+        workers = 1
+    elif utils.is_int(workers) and int(workers) > 0:
+        workers = int(workers)
+    else:
+        utils.warn("Workers must be a positive integer. Using 1.")
+        workers = 1
+
+    # validate incremental
+    if incremental == "#":
+        incremental = False
+    else:
+        incremental = incremental.upper() in ["TRUE", "YES", "ON"]
+
+    return [features, units, field_name, overwrite, workers, incremental]
 
 
 if __name__ == "__main__":
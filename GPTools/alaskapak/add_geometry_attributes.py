@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Add area, perimeter, length and/or centroid attributes to one or more
+feature classes in a single pass over each feature class.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import math
+import sys
+
+import arcpy
+
+if __name__ == "__main__":
+    # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
+    import add_area
+    import add_length
+    import utils
+else:
+    # for use as a module and Python toolboxes (*.pyt)
+    from . import add_area
+    from . import add_length
+    from . import utils
+
+
+METRICS = ["AREA", "PERIMETER", "LENGTH", "CENTROID"]
+
+# The (double) fields filled in for each metric
+metric_fields = {
+    "AREA": ["Area"],
+    "PERIMETER": ["Perimeter"],
+    "LENGTH": ["Length"],
+    "CENTROID": ["Centroid_X", "Centroid_Y"],
+}
+
+# The metrics used when none are requested
+default_metrics = {
+    "Polygon": ["AREA", "PERIMETER", "CENTROID"],
+    "Polyline": ["LENGTH", "CENTROID"],
+    "Point": ["CENTROID"],
+    "Multipoint": ["CENTROID"],
+}
+
+# The shape types each metric can be calculated for
+metric_shapes = {
+    "AREA": ["Polygon"],
+    "PERIMETER": ["Polygon"],
+    "LENGTH": ["Polygon", "Polyline"],
+    "CENTROID": ["Polygon", "Polyline", "Point", "Multipoint"],
+}
+
+
+@utils.instrumented
+@utils.cached_schema
+def add_geometry_attributes(
+    features, metrics=None, area_units=None, length_units=None, overwrite=False
+):
+    """Add geometry attributes to multiple feature classes.
+
+    Args:
+        features (list[text]): A list of paths to ArcGIS feature classes.
+        metrics (list[text], optional): See `add_geometry_attributes_to_feature()`.
+        area_units (text, optional): See `add_geometry_attributes_to_feature()`.
+        length_units (text, optional): See `add_geometry_attributes_to_feature()`.
+        overwrite (bool, optional): If True, then we are allowed to overwrite
+          any existing values in the attribute fields. Defaults to False.
+
+    Returns:
+        None
+    """
+    for feature in features:
+        add_geometry_attributes_to_feature(
+            feature, metrics, area_units, length_units, overwrite
+        )
+
+
+@utils.instrumented
+@utils.cached_schema
+def add_geometry_attributes_to_feature(
+    feature, metrics=None, area_units=None, length_units=None, overwrite=False
+):
+    """Add geometry attributes to a feature class with one UpdateCursor.
+
+    All the new fields are added with one schema operation, and all the values
+    are written in one pass.  The fields for each metric are in `metric_fields`.
+    Lengths and areas of geographic data are measured on the ellipsoid in
+    batches before the update (see `utils.geodesic_measures()`), and
+    centroids are in the feature's coordinate system.
+
+    Args:
+        feature (text): The path to an ArcGIS feature class.
+        metrics (list[text], optional): Any of `METRICS`.  Metrics that do not
+          apply to the shape type are skipped with a warning. If None, the
+          `default_metrics` for the shape type are used. Defaults to None.
+        area_units (text, optional): One of `add_area.valid_units`. If None,
+          the square units of the feature class will be used (square meters
+          for geographic data). Defaults to None.
+        length_units (text, optional): One of `add_length.valid_units`. If None,
+          the units of the feature class will be used (meters for geographic
+          data). Defaults to None.
+        overwrite (bool, optional): If True, then we are allowed to overwrite
+          any existing values in the attribute fields. Defaults to False.
+
+    Returns:
+        None
+    """
+
+    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+
+    description = utils.describe(feature)
+    shape_type = description.shapeType
+    if metrics is None:
+        metrics = default_metrics.get(shape_type, [])
+    metrics = [metric.upper() for metric in metrics]
+    for metric in list(metrics):
+        if shape_type not in metric_shapes[metric]:
+            msg = "Cannot calculate {0} for {1} features. Skipping..."
+            utils.warn(msg.format(metric.lower(), shape_type.lower()))
+            metrics.remove(metric)
+    if not metrics:
+        return
+    utils.info("Adding {0} to {1}".format(", ".join(metrics).lower(), feature))
+
+    spatial_reference = description.spatialReference
+    if area_units is not None:
+        area_units = area_units.upper().replace(" ", "")
+    if length_units is not None:
+        length_units = length_units.upper().replace(" ", "")
+
+    methods = []
+    for metric in list(metrics):
+        method = measure_method(metric, spatial_reference, area_units, length_units)
+        if method is None:
+            metrics.remove(metric)
+        else:
+            methods.append(method)
+    if not methods:
+        return
+
+    names = [name for metric in metrics for name in metric_fields[metric]]
+    fields = add_double_fields(feature, names, overwrite)
+    if fields is None:
+        return
+
+    # Read and measure all the shapes first, so the update does not write the
+    # shapes back.
+    planar = [measure for kind, measure, _ in methods if kind == "planar"]
+    geodesic = [measure for kind, measure, _ in methods if kind == "geodesic"]
+    planar_values = utils.planar_measures(feature, planar) if planar else {}
+    geodesic_values = utils.geodesic_measures(feature, geodesic) if geodesic else {}
+
+    count = 0
+    with utils.span("write"), arcpy.da.UpdateCursor(
+        feature, ["OID@"] + fields
+    ) as cursor:
+        for row in cursor:
+            measured = {
+                "planar": iter(planar_values.get(row[0], [None] * len(planar))),
+                "geodesic": iter(geodesic_values.get(row[0], [None] * len(geodesic))),
+            }
+            values = []
+            for kind, measure, factor in methods:
+                value = next(measured[kind])
+                if measure == "centroid":
+                    values.extend(value if value else (None, None))
+                else:
+                    values.append(None if value is None else value * factor)
+            cursor.updateRow([row[0]] + values)
+            count += 1
+    utils.count("rows_written", count)
+
+
+def measure_method(metric, spatial_reference, area_units, length_units):
+    """Return how to calculate a metric, or None if it is not possible.
+
+    Returns:
+        tuple: (kind, measure, factor) where kind is "planar" or "geodesic",
+        measure is "area", "length" or "centroid", and the measured area or
+        length is multiplied by factor.
+    """
+    geographic = spatial_reference.type == "Geographic"
+    if metric == "CENTROID":
+        return ("planar", "centroid", None)
+    if metric == "AREA":
+        if geographic:
+            factor = utils.unit_factor("SQUAREMETERS", area_units or "SQUAREMETERS")
+            return ("geodesic", "area", factor)
+        return ("planar", "area", add_area.area_factor(spatial_reference, area_units))
+    if length_units == "DECIMALDEGREES":
+        if not geographic:
+            msg = "Decimal degrees requires geographic data. Skipping {0}..."
+            utils.warn(msg.format(metric.lower()))
+            return None
+        factor = math.degrees(spatial_reference.radiansPerUnit)
+        return ("planar", "length", factor)
+    if geographic:
+        factor = utils.unit_factor("METERS", length_units or "METERS")
+        return ("geodesic", "length", factor)
+    factor = add_length.length_factor(spatial_reference, length_units)
+    return ("planar", "length", factor)
+
+
+def add_double_fields(feature, field_names, overwrite=False):
+    """Check or create the double fields for the new attributes.
+
+    Existing fields are used if overwrite is True and they are doubles.
+    Missing fields are created (with valid names) in one schema operation.
+
+    Args:
+        feature (text): The path to an ArcGIS feature class.
+        field_names (list[text]): The requested field names.
+        overwrite (bool, optional): If True, then we are allowed to overwrite
+          any existing values in the fields. Defaults to False.
+
+    Returns:
+        list[text]: The name of each field in the feature class, or None if
+        the fields cannot be used (with a warning).
+    """
+    existing = [field.name for field in utils.list_fields(feature)]
+    fields = []
+    new_fields = []
+    for field_name in field_names:
+        if field_name in existing:
+            if not overwrite:
+                msg = "Not allowed to overwrite existing field {0}. Skipping..."
+                utils.warn(msg.format(field_name))
+                return None
+            if not utils.list_fields(feature, field_name, "Double"):
+                msg = "Field {0} exists, but is not the right type. Skipping..."
+                utils.warn(msg.format(field_name))
+                return None
+            fields.append(field_name)
+        else:
+            new_field_name = utils.valid_field_name(field_name, feature)
+            fields.append(new_field_name)
+            new_fields.append(new_field_name)
+
+    if new_fields:
+        if not arcpy.TestSchemaLock(feature):
+            msg = "Unable to acquire a schema lock to add the new fields. Skipping..."
+            utils.warn(msg)
+            return None
+        utils.info("Creating new fields {0}".format(", ".join(new_fields)))
+        utils.add_fields(feature, [[name, "DOUBLE"] for name in new_fields])
+    return fields
+
+
+def parameter_fixer(args):
+    """Validates and transforms the command line arguments for the task.
+
+    1) Converts text values from old style toolbox (*.tbx) parameters (or the
+       command line) to the python object arguments expected by the primary task
+       of the script, and as provided by the new style toolbox (*.pyt).
+    2) Validates the correct number of arguments.
+    3) Provides default values for command line options provided as "#"
+       or missing from the end of the command line.
+    4) Provides additional validation for command line parameters to match the
+       validation done by the toolbox interface.  This isn't required when
+       called by an old style toolbox, but it isn't possible to tell it is
+       called by the toolbox or by the command line.
+
+    Args:
+        args (list[text]): A list of commands arguments, Usually obtained
+        from the sys.argv or arcpy.GetParameterAsText().  Provide "#" as
+        placeholder for an unspecified intermediate argument.
+
+    Returns:
+        A list of validated arguments expected by the task being called.
+        Raises utils.ParameterError if the args cannot be transformed.
+    """
+
+    # pylint: disable=too-many-branches
+
+    arg_count = len(args)
+    if arg_count < 1 or arg_count > 5:
+        usage = "Usage: {0} features [metrics] [area_units] [length_units] [overwrite]"
+        utils.die(usage.format(sys.argv[0]))
+
+    args = list(args) + ["#"] * (5 - arg_count)
+    feature_list, metric_list, area_units, length_units, overwrite = [
+        "#" if not arg else arg for arg in args
+    ]
+
+    # validate features
+    features = []
+    for feature in feature_list.split(";"):
+        if feature[0] == "'" and feature[-1] == "'":
+            feature = feature[1:-1]
+        if utils.exists(feature):
+            if utils.describe(feature).shapeType in default_metrics:
+                features.append(feature)
+            else:
+                msg = "Feature class ({0}) does not have a supported shape. Skipping."
+                utils.warn(msg.format(feature))
+        else:
+            utils.warn("Feature class ({0}) not found. Skipping.".format(feature))
+    if not features:
+        utils.die("No features found.")
+
+    # validate metrics
+    if metric_list == "#":
+        metrics = None
+    else:
+        metrics = []
+        for metric in metric_list.split(";"):
+            metric = metric.strip("'").upper()
+            if metric in METRICS:
+                metrics.append(metric)
+            else:
+                utils.warn("Unknown metric '{0}'. Skipping.".format(metric))
+        if not metrics:
+            utils.die("No valid metrics requested.")
+
+    # validate units
+    if area_units == "#":
+        area_units = None
+    if area_units and area_units.upper().replace(" ", "") not in add_area.valid_units:
+        msg = "Unknown units '{0}'. Area will be in the feature's units."
+        utils.warn(msg.format(area_units))
+        area_units = None
+    if length_units == "#":
+        length_units = None
+    if (
+        length_units
+        and length_units.upper().replace(" ", "") not in add_length.valid_units
+    ):
+        msg = "Unknown units '{0}'. Length will be in the feature's units."
+        utils.warn(msg.format(length_units))
+        length_units = None
+
+    # validate overwrite
+    if overwrite == "#":
+        overwrite = False
+    else:
+        overwrite = overwrite.upper() in ["TRUE", "YES", "ON"]
+
+    return [features, metrics, area_units, length_units, overwrite]
+
+
+if __name__ == "__main__":
+    # Set command line or simple testing
+    # sys.argv[1:] = ["C:/tmp/akr_facility.gdb/PARKLOTS_PY", "Area;Centroid", "Acres"]
+    utils.execute(add_geometry_attributes, parameter_fixer)
@@ -5,18 +5,106 @@ Add a unique integer id to one or more feature classes.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import multiprocessing
 import sys
 
 import arcpy
+import numpy as np
 
 if __name__ == "__main__":
     # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
+    import geometry
     import utils
 else:
     # for use as a module and Python toolboxes (*.pyt)
+    from . import geometry
     from . import utils
 
 
+# The spatial orders, and the function that calculates the sort key of each
+# centroid for that order
+SPATIAL_ORDERS = ["HILBERT", "MORTON", "READING_ORDER"]
+spatial_key_functions = {
+    "HILBERT": geometry.hilbert_keys,
+    "MORTON": geometry.morton_keys,
+    "READING_ORDER": geometry.reading_order_keys,
+}
+
+# How ids are numbered across multiple feature classes
+# RESTART: each feature class starts at start (ids are only unique per class)
+# CONTINUE: one sequence of ids spans all the feature classes
+# BLOCK: each feature class gets its own block of block_size ids
+ID_MODES = ["RESTART", "CONTINUE", "BLOCK"]
+
+# The allocator shared with the worker processes (see _set_allocator())
+_allocator = None
+
+
+class IdAllocator(object):
+    """Reserves ranges of ids so the ids in different feature classes never collide.
+
+    In CONTINUE mode, each feature class reserves the next range of ids from one
+    counter.  The counter is a multiprocessing.Value, and the reservation is
+    atomic, so the allocator can be shared by worker processes.  The ranges are
+    contiguous, but their order depends on which feature class is done first.
+
+    In BLOCK mode, the ids for a feature class depend only on its position in
+    the list of feature classes, so the ids do not change between runs.
+    """
+
+    def __init__(self, feature_classes, start=1, increment=1, block_size=None):
+        """Create an allocator for feature_classes.
+
+        Args:
+            feature_classes (list[text]): The feature classes that will get ids.
+            start (int, optional): The first id. Defaults to 1.
+            increment (int, optional): The difference between ids. Defaults to 1.
+            block_size (int, optional): The number of ids in each feature class's
+              block, or None for CONTINUE mode. Defaults to None.
+        """
+        self.start = start
+        self.increment = increment
+        self.block_size = block_size
+        self.blocks = {}
+        if block_size is not None:
+            for index, feature_class in enumerate(feature_classes):
+                self.blocks[feature_class] = index
+                # Worker processes get the catalog path of the feature class
+                catalog_path = utils.describe(feature_class).catalogPath
+                self.blocks[catalog_path] = index
+        self.next_id = multiprocessing.Value("l", start)
+
+    def reserve(self, feature_class, count):
+        """Return the first of count ids reserved for feature_class.
+
+        Raises:
+            ValueError: If count does not fit in a block.
+        """
+        if self.block_size is None:
+            with self.next_id.get_lock():
+                first = self.next_id.value
+                self.next_id.value = first + count * self.increment
+            return first
+        if count > self.block_size:
+            msg = "{0} has {1} rows, which is more than the block size ({2})"
+            raise ValueError(msg.format(feature_class, count, self.block_size))
+        index = self.blocks[feature_class]
+        return self.start + index * self.block_size * self.increment
+
+
+def _set_allocator(allocator):
+    """Set the allocator for the ids in this (worker) process."""
+    global _allocator  # pylint: disable=global-statement
+    _allocator = allocator
+
+
+def _add_id_from_allocator(feature_class, *args):
+    """Call add_id_to_feature() with the ids reserved from the process's allocator."""
+    return add_id_to_feature(feature_class, *args, allocator=_allocator)
+
+
+@utils.instrumented
+@utils.cached_schema
 def add_id_to_features(
     feature_classes,
     field_name="UniqueID",
@@ -24,17 +112,57 @@ def add_id_to_features(
     increment=1,
     sort_field_name=None,
     overwrite=False,
+    spatial_order=None,
+    id_mode="RESTART",
+    block_size=None,
+    workers=1,
 ):
-    """Add id to multiple feature classes."""
+    """Add id to multiple feature classes.
+
+    Args:
+        feature_classes (list[text]): The feature classes (or tables).
+        field_name, start, increment, sort_field_name, overwrite, spatial_order:
+          See `add_id_to_feature()`.
+        id_mode (text, optional): One of `ID_MODES`. Defaults to "RESTART".
+        block_size (int, optional): The number of ids reserved for each feature
+          class in BLOCK mode.  A feature class with more rows is skipped.
+          Defaults to None (the most rows in any of the feature classes).
+        workers (int, optional): The maximum number of workspaces to process at
+          the same time (see `utils.process_by_workspace()`). Defaults to 1.
+
+    Returns:
+        list[tuple]: The results from `utils.process_by_workspace()`.
+    """
 
     # pylint: disable=too-many-arguments
 
-    for feature_class in feature_classes:
-        add_id_to_feature(
-            feature_class, field_name, start, increment, sort_field_name, overwrite
+    args = (field_name, start, increment, sort_field_name, overwrite, spatial_order)
+    id_mode = (id_mode or "RESTART").upper()
+    if id_mode == "RESTART":
+        return utils.process_by_workspace(
+            add_id_to_feature, feature_classes, args, workers
+        )
+    if id_mode == "BLOCK" and block_size is None:
+        block_size = max(
+            int(arcpy.GetCount_management(feature_class).getOutput(0))
+            for feature_class in feature_classes
         )
+        utils.info("Using a block size of {0}".format(block_size))
+    if id_mode != "BLOCK":
+        block_size = None
+    allocator = IdAllocator(feature_classes, start, increment, block_size)
+    return utils.process_by_workspace(
+        _add_id_from_allocator,
+        feature_classes,
+        args,
+        workers,
+        initializer=_set_allocator,
+        initargs=(allocator,),
+    )
 
 
+@utils.instrumented
+@utils.cached_schema
 def add_id_to_feature(
     feature_class,
     field_name="UniqueID",
@@ -42,17 +170,47 @@ def add_id_to_feature(
     increment=1,
     sort_field_name=None,
     overwrite=False,
+    spatial_order=None,
+    allocator=None,
 ):
-    """Add id to a feature class."""
+    """Add id to a feature class.
 
-    # pylint: disable=too-many-arguments
+    If a sort is given, the rows are read and sorted in memory (see
+    `sort_order()`), so sorting works for every workspace (including shapefiles),
+    and the ids are written back by OID.  Otherwise the ids are in the order
+    the rows are read.
+
+    Args:
+        feature_class (text): The path to a feature class (or table).
+        field_name (text, optional): The name of the id field.
+          Defaults to "UniqueID".
+        start (int, optional): The first id. Defaults to 1.
+        increment (int, optional): The difference between ids. Defaults to 1.
+        sort_field_name (text or list[text], optional): One or more sort fields
+          as a list or a semicolon separated string.  Each field name can be
+          followed by ASCENDING (the default) or DESCENDING, and then by
+          NULLS LAST (the default) or NULLS FIRST, i.e.
+          "Type;Date DESCENDING NULLS FIRST". Defaults to None.
+        overwrite (bool, optional): If True, then we are allowed to overwrite
+          any existing values in the id field. Defaults to False.
+        spatial_order (text, optional): One of `SPATIAL_ORDERS`.  The rows
+          are sorted by the location of the centroid of each shape (after any
+          sort fields).  Defaults to None.
+        allocator (IdAllocator, optional): If not None, the ids are reserved
+          from the allocator, and start is ignored. Defaults to None.
+
+    Returns:
+        int: The number of rows updated, or None if the feature class was skipped.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-locals
 
     utils.info("Adding {0} to {1}".format(field_name, feature_class))
-    field_names = [field.name for field in arcpy.ListFields(feature_class)]
+    field_names = [field.name for field in utils.list_fields(feature_class)]
     id_field_name = utils.valid_field_name(field_name, feature_class)
     if id_field_name in field_names:
         if overwrite:
-            if not arcpy.ListFields(feature_class, id_field_name, "Long"):
+            if not utils.list_fields(feature_class, id_field_name, "Long"):
                 msg = "Field {0} exists, but is not the right type. Skipping..."
                 utils.warn(msg.format(id_field_name))
                 return
@@ -63,31 +221,224 @@ def add_id_to_feature(
     else:
         if arcpy.TestSchemaLock(feature_class):
             utils.info("Creating new field {0}".format(id_field_name))
-            arcpy.AddField_management(feature_class, id_field_name, "Long")
+            utils.add_field(feature_class, id_field_name, "Long")
         else:
             msg = "Unable to acquire a schema lock to add the new field. Skipping..."
             utils.warn(msg)
             return
 
-    order_by = None
-    if sort_field_name:
-        if sort_field_name not in field_names:
+    sort_fields = []
+    for name, descending, nulls_first in parse_sort_fields(sort_field_name):
+        if name not in field_names:
             msg = "Sort field `{0}` not in {1}. Ignoring"
-            utils.warn(msg.format(sort_field_name, feature_class))
+            utils.warn(msg.format(name, feature_class))
+        else:
+            sort_fields.append((name, descending, nulls_first))
+    if spatial_order is not None:
+        spatial_order = spatial_order.upper().replace(" ", "_")
+        if spatial_order not in SPATIAL_ORDERS:
+            utils.warn("Unknown spatial order `{0}`. Ignoring".format(spatial_order))
+            spatial_order = None
+        elif utils.describe(feature_class).dataType == "Table":
+            utils.warn("Tables do not have a spatial order. Ignoring")
+            spatial_order = None
+
+    if not sort_fields and spatial_order is None and allocator is None:
+        count = 0
+        feature_id = start
+        with utils.span("write"), arcpy.da.UpdateCursor(
+            feature_class, [id_field_name]
+        ) as cursor:
+            for row in cursor:
+                row[0] = feature_id
+                feature_id += increment
+                cursor.updateRow(row)
+                count += 1
+        utils.count("rows_written", count)
+        return count
+
+    read_fields = [name for name, _, _ in sort_fields]
+    descending = [reverse for _, reverse, _ in sort_fields]
+    nulls_first = [first for _, _, first in sort_fields]
+    if spatial_order is not None:
+        read_fields.append("SHAPE@XY")
+        descending.append(False)
+        nulls_first.append(False)
+    oids, columns = read_columns(feature_class, read_fields)
+    with utils.span("sort"):
+        if spatial_order is not None:
+            columns[-1] = spatial_keys(columns[-1], spatial_order)
+        if columns:
+            order = sort_order(columns, descending, nulls_first)
+        else:
+            order = np.arange(len(oids))
+    if allocator is not None:
+        start = allocator.reserve(feature_class, len(oids))
+        increment = allocator.increment
+        if len(oids):
+            last = start + (len(oids) - 1) * increment
+            utils.info("Using ids {0} to {1}".format(start, last))
+    return write_ids(feature_class, id_field_name, oids[order], start, increment)
+
+
+def parse_sort_fields(sort_fields):
+    """Return a list of (field name, descending, nulls first) for a sort
+    specification.
+
+    Args:
+        sort_fields (text or list[text]): None, or a list or a semicolon
+          separated string of field names each optionally followed by ASC,
+          ASCENDING, DESC or DESCENDING, and then by NULLS FIRST or NULLS LAST
+          (as in a toolbox value table, where "#" is an empty cell).
+
+    Returns:
+        list[tuple]: The field name, True if the sort is descending, and True
+        if nulls sort before all other values (by default they sort last).
+    """
+    if not sort_fields:
+        return []
+    if not isinstance(sort_fields, (list, tuple)):
+        sort_fields = sort_fields.split(";")
+    directions = {
+        "ASC": "ASCENDING",
+        "ASCENDING": "ASCENDING",
+        "DESC": "DESCENDING",
+        "DESCENDING": "DESCENDING",
+    }
+    keys = []
+    for sort_field in sort_fields:
+        parts = [part for part in sort_field.split() if part != "#"]
+        if not parts:
+            continue
+        nulls = "LAST"
+        words = [part.strip("'").upper() for part in parts[-2:]]
+        if len(parts) > 2 and words[0] == "NULLS" and words[1] in ("FIRST", "LAST"):
+            nulls = words[1]
+            parts = parts[:-2]
+        direction = "ASCENDING"
+        if len(parts) > 1 and parts[-1].upper() in directions:
+            direction = directions[parts.pop().upper()]
+        name = " ".join(parts).strip("'")
+        keys.append((name, direction == "DESCENDING", nulls == "FIRST"))
+    return keys
+
+
+def spatial_keys(centroids, spatial_order):
+    """Return the spatial sort key of each centroid.
+
+    Args:
+        centroids (list[tuple]): The (x, y) of each shape, None for empty shapes.
+        spatial_order (text): One of `SPATIAL_ORDERS`.
+
+    Returns:
+        numpy.ndarray: The float key of each centroid, NaN for empty shapes.
+    """
+    keys = np.full(len(centroids), np.nan)
+    valid = [
+        index
+        for index, centroid in enumerate(centroids)
+        if centroid is not None and centroid[0] is not None
+    ]
+    if valid:
+        points = np.array([centroids[index] for index in valid], dtype=float)
+        key_function = spatial_key_functions[spatial_order]
+        keys[valid] = key_function(points[:, 0], points[:, 1])
+    return keys
+
+
+def read_columns(table, field_names):
+    """Return the OIDs and the values in field_names for all rows in table.
+
+    Returns:
+        tuple: (numpy.ndarray of OIDs, list of the values in each field)
+    """
+    oids = []
+    columns = [[] for _ in field_names]
+    with utils.span("read"), arcpy.da.SearchCursor(
+        table, ["OID@"] + list(field_names)
+    ) as cursor:
+        for row in cursor:
+            oids.append(row[0])
+            for column, value in zip(columns, row[1:]):
+                column.append(value)
+    utils.count("rows_read", len(oids))
+    return np.array(oids, dtype=np.int64), columns
+
+
+def sort_order(columns, descending=None, nulls_first=None):
+    """Return the indices that sort the rows by one or more columns.
+
+    The sort is stable, so rows with equal keys stay in the order they were
+    read.  Each column is replaced by the rank of its values (so text, numbers
+    and dates all sort the same way) and the ranks are sorted with
+    `numpy.lexsort()`.
+
+    Args:
+        columns (list[list]): The values of each sort key, primary key first.
+          None (or NaN in a float numpy.ndarray) is a null value.
+        descending (list[bool], optional): True for each column to sort in
+          descending order. Defaults to None (all ascending).
+        nulls_first (list[bool], optional): True for each column whose nulls
+          sort before all other values, otherwise they sort after them
+          (regardless of the direction). Defaults to None (all nulls last).
+
+    Returns:
+        numpy.ndarray: The row indices in sorted order.
+    """
+    if descending is None:
+        descending = [False] * len(columns)
+    if nulls_first is None:
+        nulls_first = [False] * len(columns)
+    keys = []
+    for column, reverse, first in zip(columns, descending, nulls_first):
+        if isinstance(column, np.ndarray) and column.dtype.kind == "f":
+            nulls = np.isnan(column)
+            values = column[~nulls]
         else:
-            if arcpy.Describe(feature_class).dataType == "ShapeFile":
-                utils.warn("Shapefiles do not support sort fields. Ignoring")
-            else:
-                order_by = "ORDER BY {0}".format(sort_field_name)
-
-    feature_id = start
-    with arcpy.da.UpdateCursor(
-        feature_class, [id_field_name], sql_clause=(None, order_by)
+            nulls = np.array([value is None for value in column], dtype=bool)
+            values = np.asarray([value for value in column if value is not None])
+        ranks = np.zeros(len(column), dtype=np.int64)
+        if not nulls.all():
+            _, inverse = np.unique(values, return_inverse=True)
+            inverse = inverse.ravel()
+            if reverse:
+                inverse = inverse.max() - inverse
+            ranks[~nulls] = inverse + 1
+        ranks[nulls] = 0 if first else len(column) + 1
+        keys.append(ranks)
+    if not keys:
+        return np.arange(0)
+    # lexsort uses the last key as the primary key
+    return np.lexsort(keys[::-1])
+
+
+def write_ids(table, id_field_name, oids, start=1, increment=1):
+    """Write sequential ids to the rows of table in the order of oids.
+
+    Args:
+        table (text): The path to a table or feature class.
+        id_field_name (text): The name of an existing integer field.
+        oids (numpy.ndarray): The OIDs of the rows in id order.  Rows not in
+          oids are not changed.
+        start (int, optional): The first id. Defaults to 1.
+        increment (int, optional): The difference between ids. Defaults to 1.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    ids = start + increment * np.arange(len(oids), dtype=np.int64)
+    id_by_oid = dict(zip(oids.tolist(), ids.tolist()))
+    count = 0
+    with utils.span("write"), arcpy.da.UpdateCursor(
+        table, ["OID@", id_field_name]
     ) as cursor:
         for row in cursor:
-            row[0] = feature_id
-            feature_id += increment
-            cursor.updateRow(row)
+            if row[0] in id_by_oid:
+                row[1] = id_by_oid[row[0]]
+                cursor.updateRow(row)
+                count += 1
+    utils.count("rows_written", count)
+    return count
 
 
 def parameter_fixer(args):
@@ -111,19 +462,26 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-branches,too-many-statements
 
     arg_count = len(args)
-    if arg_count < 1 or arg_count > 6:
+    if arg_count < 1 or arg_count > 10:
         usage = (
             "Usage: {0} features [id_field_name] [start] "
-            "[increment] [sort_field_name] [overwrite]"
+            "[increment] [sort_field_name] [overwrite] [spatial_order] "
+            "[id_mode] [block_size] [workers]"
         )
         utils.die(usage.format(sys.argv[0]))
 
+    args = list(args) + ["#"] * (10 - arg_count)
+    id_mode, block_size, workers = ["#" if not arg else arg for arg in args[7:]]
+    if arg_count < 7 or not args[6]:
+        spatial_order = "#"
+    else:
+        spatial_order = args[6]
     if arg_count < 6 or not args[5]:
         overwrite = "#"
     else:
@@ -151,7 +509,7 @@ def parameter_fixer(args):
     for feature in feature_list.split(";"):
         if feature[0] == "'" and feature[-1] == "'":
             feature = feature[1:-1]
-        if arcpy.Exists(feature):
+        if utils.exists(feature):
             features.append(feature)
         else:
             utils.warn("Feature class ({0}) not found. Skipping.".format(feature))
@@ -190,7 +548,50 @@ def parameter_fixer(args):
     else:
         overwrite = overwrite.upper() in ["TRUE", "YES", "ON"]
 
-    return [features, id_field_name, start, increment, sort_field_name, overwrite]
+    # validate spatial_order
+    if spatial_order == "#":
+        spatial_order = None
+    elif spatial_order.upper().replace(" ", "_") not in SPATIAL_ORDERS:
+        utils.warn("Unknown spatial order '{0}'. Ignoring.".format(spatial_order))
+        spatial_order = None
+
+    # validate id_mode
+    if id_mode == "#":
+        id_mode = "RESTART"
+    elif id_mode.upper() in ID_MODES:
+        id_mode = id_mode.upper()
+    else:
+        utils.die("ID mode ({0}) must be one of {1}.".format(id_mode, ID_MODES))
+
+    # validate block_size
+    if block_size == "#":
+        block_size = None
+    elif utils.is_int(block_size) and int(block_size) > 0:
+        block_size = int(block_size)
+    else:
+        utils.die("Block size ({0}) is not a positive integer.".format(block_size))
+
+    # validate workers
+    if workers == "#":
+        workers = 1
+    elif utils.is_int(workers) and int(workers) > 0:
+        workers = int(workers)
+    else:
+        utils.warn("Workers must be a positive integer. Using 1.")
+        workers = 1
+
+    return [
+        features,
+        id_field_name,
+        start,
+        increment,
+        sort_field_name,
+        overwrite,
+        spatial_order,
+        id_mode,
+        block_size,
+        workers,
+    ]
 
 
 if __name__ == "__main__":
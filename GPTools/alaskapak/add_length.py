@@ -5,6 +5,7 @@ Add a length attribute to one or more polyline or polygon feature classes.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import math
 import sys
 
 import arcpy
@@ -35,31 +36,44 @@ valid_units_pretty = [
 valid_units = [units.upper().replace(" ", "") for units in valid_units_pretty]
 
 
-def add_length_to_feature(feature, units=None, field_name="Length", overwrite=False):
+@utils.instrumented
+@utils.cached_schema
+def add_length_to_feature(
+    feature, units=None, field_name="Length", overwrite=False, incremental=False
+):
     """Add a length attribute to a single polyline or polygon feature class.
 
     Args:
         feature (text): The path to an ArcGIS feature class.
         units (text, optional): The linear units for the calculated length.
           must be one of `valid_units`. If None, the units of the feature
-          class will be used. Defaults to None.
+          class will be used (meters for geographic data, where the length
+          is measured on the ellipsoid). Defaults to None.
         field_name (text, optional): The name of the field to store the
           calculated length. Defaults to "Length".
         overwrite (bool, optional): If True, then we are allowed to overwrite
           any existing values in the field named `field_name`. Defaults to False.
+        incremental (bool, optional): If True, only rows whose shape changed since
+          the last incremental run are recalculated.  The hash of each shape is
+          saved in a text field named for `field_name` with a "_Hash" suffix.
+          Implies overwrite. Defaults to False.
 
     Returns:
-        None
+        int: The number of rows updated, or None if the feature class was skipped.
     """
+
+    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+
     print_units = units if units is not None else "feature's units"
     utils.info("Adding {0} (in {1}) to {2}".format(field_name, print_units, feature))
 
     # Verify and/or create field name
+    created = False
     field_name = utils.valid_field_name(field_name, feature)
-    field_names = [field.name for field in arcpy.ListFields(feature)]
+    field_names = [field.name for field in utils.list_fields(feature)]
     if field_name in field_names:
-        if overwrite:
-            if not arcpy.ListFields(feature, field_name, "Double"):
+        if overwrite or incremental:
+            if not utils.list_fields(feature, field_name, "Double"):
                 msg = "Field {0} exists, but is not the right type. Skipping..."
                 utils.warn(msg.format(field_name))
                 return
@@ -70,35 +84,108 @@ def add_length_to_feature(feature, units=None, field_name="Length", overwrite=Fa
     else:
         if arcpy.TestSchemaLock(feature):
             utils.info("Creating new field {0}".format(field_name))
-            arcpy.AddField_management(feature, field_name, "Double")
+            utils.add_field(feature, field_name, "Double")
+            created = True
         else:
             msg = "Unable to acquire a schema lock to add the new field. Skipping..."
             utils.warn(msg)
             return
 
-    geometry_name = arcpy.Describe(feature).shapeFieldName
-    if units is None:
-        length = "!{0}.length!".format(geometry_name)
+    spatial_reference = utils.describe(feature).spatialReference
+    geographic = spatial_reference.type == "Geographic"
+    if units is not None:
+        units = units.upper().replace(" ", "")
+    if units == "DECIMALDEGREES":
+        if not geographic:
+            msg = "Decimal degrees requires geographic data. Skipping..."
+            utils.warn(msg)
+            return
+        factor = math.degrees(spatial_reference.radiansPerUnit)
+        geodesic = False
+    elif geographic:
+        # Planar length in degrees is meaningless; use the ellipsoid
+        if units is None:
+            utils.info("Geographic data; length will be in meters.")
+            units = "METERS"
+        factor = utils.unit_factor("METERS", units)
+        geodesic = True
     else:
-        spatial_reference = arcpy.Describe(feature).spatialReference
-        if spatial_reference.type == "Geographic":
-            length = "!{0}.geodesicLength@{1}!".format(geometry_name, units)
-        else:
-            length = "!{0}.length@{1}!".format(geometry_name, units)
+        factor = length_factor(spatial_reference, units)
+        geodesic = False
+
+    fields = ["OID@", field_name]
+    changed = None
+    if incremental:
+        hash_field = utils.add_hash_field(feature, field_name)
+        if hash_field is None:
+            return
+        fields.append(hash_field)
+        method = "geodesic" if geodesic else "planar"
+        salt = "{0} {1!r}".format(method, factor)
+        changed = utils.changed_shapes(feature, hash_field, salt, force=created)
+
+    lengths = None
+    if geodesic:
+        lengths = utils.geodesic_measures(feature, ["length"], changed)
+    else:
+        fields.append("SHAPE@LENGTH")
+
+    count = 0
+    skipped = 0
+    with utils.span("write"), arcpy.da.UpdateCursor(feature, fields) as cursor:
+        for row in cursor:
+            if changed is not None:
+                if row[0] not in changed:
+                    skipped += 1
+                    continue
+                row[2] = changed[row[0]]
+            if lengths is None:
+                length = row[-1]
+            else:
+                (length,) = lengths.get(row[0], [None])
+            row[1] = None if length is None else length * factor
+            cursor.updateRow(row)
+            count += 1
+    utils.count("rows_written", count)
+    utils.count("rows_skipped", skipped)
+    if changed is not None:
+        utils.info("Skipped {0} unchanged rows.".format(skipped))
+    return count
 
-    # For the !shape! calculation, the expression type must be python.
-    # In Pro, the default is "PYTHON3" (ok), but in 10.x, the default is "VB"
-    # Need to explicitly use "PYTHON_9.3" in 10.x
-    expression_type = "PYTHON3"
-    if sys.version_info[0] < 3:
-        expression_type = "PYTHON_9.3"
 
-    arcpy.CalculateField_management(feature, field_name, length, expression_type)
+def length_factor(spatial_reference, units=None):
+    """Return the number of `units` in one linear unit of spatial_reference.
 
+    Args:
+        spatial_reference (arcpy.SpatialReference): A projected coordinate system.
+        units (text, optional): One of `valid_units` (except decimal degrees),
+          or None for the units of spatial_reference (a factor of 1).
+          Defaults to None.
 
-def add_length_to_features(features, units=None, field_name="Length", overwrite=False):
+    Returns:
+        float: The multiplier to convert the lengths to `units`.
+    """
+    if units is None:
+        return 1.0
+    return spatial_reference.metersPerUnit * utils.unit_factor("METERS", units)
+
+
+@utils.instrumented
+@utils.cached_schema
+def add_length_to_features(
+    features,
+    units=None,
+    field_name="Length",
+    overwrite=False,
+    workers=1,
+    incremental=False,
+):
     """Add a length attribute to multiple polyline or polygon feature classes.
 
+    Feature classes in different workspaces can be processed at the same time
+    (see `utils.process_by_workspace()`).  A summary of the time and status for
+    each feature class is printed at the end.
+
     Args:
         features (list[text]): A list of paths to ArcGIS feature classes.
         units (text, optional): The linear units for the calculated length.
@@ -108,12 +195,16 @@ def add_length_to_features(features, units=None, field_name="Length", overwrite=
           calculated length. Defaults to "Length".
         overwrite (bool, optional): If True, then we are allowed to overwrite
           any existing values in the field named `field_name`. Defaults to False.
+        workers (int, optional): The maximum number of workspaces to process at
+          the same time. Defaults to 1.
+        incremental (bool, optional): If True, only rows whose shape changed
+          are recalculated (see `add_length_to_feature()`). Defaults to False.
 
     Returns:
-        None
+        list[tuple]: The results from `utils.process_by_workspace()`.
     """
-    for feature in features:
-        add_length_to_feature(feature, units, field_name, overwrite)
+    args = (units, field_name, overwrite, incremental)
+    return utils.process_by_workspace(add_length_to_feature, features, args, workers)
 
 
 def parameter_fixer(args):
@@ -137,16 +228,27 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-branches
 
     arg_count = len(args)
-    if arg_count < 1 or arg_count > 4:
-        usage = "Usage: {0} features [units] [field_name] [overwrite]"
+    if arg_count < 1 or arg_count > 6:
+        usage = (
+            "Usage: {0} features [units] [field_name] [overwrite] [workers] "
+            "[incremental]"
+        )
         utils.die(usage.format(sys.argv[0]))
 
+    if arg_count < 6 or not args[5]:
+        incremental = "#"
+    else:
+        incremental = args[5]
+    if arg_count < 5 or not args[4]:
+        workers = "#"
+    else:
+        workers = args[4]
     if arg_count < 4 or not args[3]:
         overwrite = "#"
     else:
@@ -166,8 +268,8 @@ def parameter_fixer(args):
     for feature in feature_list.split(";"):
         if feature[0] == "'" and feature[-1] == "'":
             feature = feature[1:-1]
-        if arcpy.Exists(feature):
-            if arcpy.Describe(feature).shapeType in ["Polygon", "Polyline"]:
+        if utils.exists(feature):
+            if utils.describe(feature).shapeType in ["Polygon", "Polyline"]:
                 features.append(feature)
             else:
                 msg = "Feature class ({0}) is not polygon or polylines. Skipping."
@@ -195,7 +297,22 @@ def parameter_fixer(args):
     else:
         overwrite = overwrite.upper() in ["TRUE", "YES", "ON"]
 
-    return [features, units, field_name, overwrite]
+    # validate workers
+    if workers == "#":
+        workers = 1
+    elif utils.is_int(workers) and int(workers) > 0:
+        workers = int(workers)
+    else:
+        utils.warn("Workers must be a positive integer. Using 1.")
+        workers = 1
+
+    # validate incremental
+    if incremental == "#":
+        incremental = False
+    else:
+        incremental = incremental.upper() in ["TRUE", "YES", "ON"]
+
+    return [features, units, field_name, overwrite, workers, incremental]
 
 
 if __name__ == "__main__":
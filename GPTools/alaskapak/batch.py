@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Run a batch of tools listed in a manifest file, and log the results.
+
+The manifest is a CSV or JSON file with one job per row.  A CSV row is the
+tool name followed by the arguments for the tool (as they would be given on
+the command line).  Blank rows, rows starting with "#", and a header row
+starting with "tool" are skipped.  A JSON manifest is a list of objects like
+{"tool": "add_area", "args": ["C:/data/parks.gdb/units", "Acres"]}.
+
+The tool names are the names of the script modules (see `tools`).  The
+arguments of each job are validated with the tool's `parameter_fixer()`, so
+a job with bad arguments (a `utils.ParameterError`) is logged and skipped.  A
+job that raises an error (or fails for any of its feature classes) is logged,
+and the batch continues with the next job.
+
+The log is a CSV file with the job number, tool, status, seconds, rows,
+error and arguments of each job.  The rows are the rows the job wrote (the
+"rows_written" counter, see `utils.count()`); they are empty for tools that
+do not count their rows (lake_volume, points_to_polygons and
+square_building).
+
+Each job runs with its own schema cache (see `utils.cached_schema()`), so a
+job sees the fields and outputs made by the jobs before it.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import csv
+import importlib
+import io
+import json
+import os
+import sys
+import time
+
+if __name__ == "__main__":
+    # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
+    import utils
+else:
+    # for use as a module and Python toolboxes (*.pyt)
+    from . import _import as import_tool
+    from . import utils
+
+
+# The task run by utils.execute() in each tool module.
+tools = {
+    "add_area": "add_area_to_features",
+    "add_geometry_attributes": "add_geometry_attributes",
+    "add_id": "add_id_to_features",
+    "add_length": "add_length_to_features",
+    "lake_volume": "lake_volume",
+    "line_to_rectangle": "line_to_rectangle",
+    "longest_axis": "longest_axis",
+    "obscure_points": "obscure_points",
+    "points_to_polygons": "points_to_polygons",
+    "polygon_from_point": "polygon_from_control_point",
+    "random_transects": "random_transects",
+    "square_building": "square_buildings",
+    "table_to_shape": "table_to_shape",
+}
+
+LOG_FIELDS = ["job", "tool", "status", "seconds", "rows", "error", "arguments"]
+
+
+def run_batch(manifest, log_file, workers=1):
+    """Run the jobs in a manifest file and write a log of the results.
+
+    Args:
+        manifest (text): The path to a CSV or JSON manifest (see module docs).
+        log_file (text): The path to the CSV log file to create.
+        workers (int, optional): The maximum number of jobs to run at the same
+          time (each in a worker process).  Jobs should not use their own
+          workers when this is more than 1.  Defaults to 1 (run each job
+          in this process).
+
+    Returns:
+        list[tuple]: The log row (see `LOG_FIELDS`) for each job.
+    """
+    jobs = read_manifest(manifest)
+    utils.info("Running {0} jobs from {1}".format(len(jobs), manifest))
+    results = []
+    with _open_csv(log_file, "w") as log:
+        writer = csv.writer(log)
+        _write_row(writer, LOG_FIELDS)
+        if workers > 1 and len(jobs) > 1:
+            pool = utils.worker_pool(min(workers, len(jobs)))
+            try:
+                for result in pool.imap(run_job, jobs):
+                    results.append(result)
+                    _write_row(writer, result)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for job in jobs:
+                result = run_job(job)
+                results.append(result)
+                _write_row(writer, result)
+    failed = len([result for result in results if result[2] != "OK"])
+    msg = "Finished {0} jobs; {1} failed. See {2}"
+    utils.info(msg.format(len(results), failed, log_file))
+    return results
+
+
+def run_job(job):
+    """Validate and run one job (number, tool, args) from a manifest.
+
+    Returns:
+        tuple: The log row (see `LOG_FIELDS`) for the job.  The status is
+        "OK", "INVALID" if the arguments were rejected, or "FAILED".
+    """
+    number, tool, args = job
+    utils.info("Job {0}: {1} {2}".format(number, tool, " ".join(args)))
+    start = time.time()
+    status = "OK"
+    rows = None
+    error = None
+    try:
+        task, parameter_fixer = load_tool(tool)
+        args = parameter_fixer(list(args))
+    except utils.ParameterError as ex:
+        status = "INVALID"
+        error = ex.msg
+    except Exception as ex:  # pylint: disable=broad-except
+        status = "FAILED"
+        error = _error_text(ex)
+    if status == "OK":
+        try:
+            utils.reset_metrics()
+            result = task(*args)
+            rows = utils.metrics()["counters"].get("rows_written")
+            if rows is None:
+                rows = count_rows(result)
+            error = feature_errors(result)
+            if error is not None:
+                status = "FAILED"
+        except Exception as ex:  # pylint: disable=broad-except
+            status = "FAILED"
+            error = _error_text(ex)
+    if error is not None:
+        utils.warn("Job {0} {1}: {2}".format(number, status.lower(), error))
+    seconds = round(time.time() - start, 3)
+    arguments = " ".join(job[2])
+    return (number, tool, status, seconds, rows, error, arguments)
+
+
+def load_tool(tool):
+    """Return the task and parameter_fixer of a tool (a name in `tools`)."""
+    if tool not in tools:
+        utils.die("Unknown tool '{0}'".format(tool))
+    if __name__ == "__main__":
+        module = importlib.import_module(tool)
+    else:
+        # The package imports the module, and binds its public names
+        module = import_tool(tool)
+    return getattr(module, tools[tool]), module.parameter_fixer
+
+
+def count_rows(result):
+    """Return the number of rows a task changed, or None if it is not known.
+
+    Tasks return a row count, the results of `utils.process_by_workspace()`,
+    or None.
+    """
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, list):
+        counts = [
+            item[1] for item in result if isinstance(item, tuple) and len(item) == 4
+        ]
+        counts = [count for count in counts if isinstance(count, int)]
+        if counts:
+            return sum(counts)
+    return None
+
+
+def feature_errors(result):
+    """Return the errors in the results of `utils.process_by_workspace()`, or None."""
+    if not isinstance(result, list):
+        return None
+    errors = [
+        "{0}: {1}".format(item[0], item[3])
+        for item in result
+        if isinstance(item, tuple) and len(item) == 4 and item[3] is not None
+    ]
+    return "; ".join(errors) if errors else None
+
+
+def read_manifest(manifest):
+    """Return the jobs (number, tool, args) in a CSV or JSON manifest file."""
+    if os.path.splitext(manifest)[1].lower() == ".json":
+        with io.open(manifest, encoding="utf-8") as handle:
+            rows = [
+                [item["tool"]] + [_argument(arg) for arg in item.get("args", [])]
+                for item in json.load(handle)
+            ]
+    else:
+        with _open_csv(manifest, "r") as handle:
+            rows = [_decode_row(row) for row in csv.reader(handle)]
+    jobs = []
+    for row in rows:
+        row = [cell.strip() for cell in row]
+        if not row or not row[0] or row[0].startswith("#"):
+            continue
+        if not jobs and row[0].lower() == "tool":
+            continue
+        jobs.append((len(jobs) + 1, row[0], tuple(row[1:])))
+    return jobs
+
+
+def _argument(value):
+    """Convert a JSON value to the text of a command line argument."""
+    if value is None:
+        return "#"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ";".join(_argument(item) for item in value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return value
+
+
+def _error_text(ex):
+    """Return the message of an exception, or its type if it has none."""
+    if isinstance(ex, utils.AlaskaPakError):
+        return ex.msg
+    return "{0}".format(ex).strip() or type(ex).__name__
+
+
+def _open_csv(path, mode):
+    """Open a CSV file for the csv module on Python 2 and 3."""
+    if sys.version_info[0] < 3:
+        return open(path, mode + "b")
+    return io.open(path, mode, encoding="utf-8", newline="")
+
+
+def _decode_row(row):
+    """Return a row from csv.reader as text on Python 2 and 3."""
+    if sys.version_info[0] < 3:
+        return [cell.decode("utf-8") for cell in row]
+    return row
+
+
+def _write_row(writer, row):
+    """Write a row with csv.writer on Python 2 and 3."""
+    row = ["" if cell is None else "{0}".format(cell) for cell in row]
+    if sys.version_info[0] < 3:
+        row = [cell.encode("utf-8") for cell in row]
+    writer.writerow(row)
+
+
+def parameter_fixer(args):
+    """Validates and transforms the command line arguments for the task.
+
+    Args:
+        args (list[text]): manifest, log_file and optional workers.  Provide "#"
+        as placeholder for an unspecified intermediate argument.
+
+    Returns:
+        A list of validated arguments expected by the task being called.
+        Raises utils.ParameterError if the args cannot be transformed.
+    """
+    arg_count = len(args)
+    if arg_count < 2 or arg_count > 3:
+        usage = "Usage: {0} manifest log_file [workers]"
+        utils.die(usage.format(sys.argv[0]))
+
+    args = list(args) + ["#"] * (3 - arg_count)
+    manifest, log_file, workers = ["#" if not arg else arg for arg in args]
+
+    if not os.path.exists(manifest):
+        utils.die("Manifest ({0}) not found.".format(manifest))
+    if log_file == "#":
+        utils.die("A log file is required.")
+
+    if workers == "#":
+        workers = 1
+    elif utils.is_int(workers) and int(workers) > 0:
+        workers = int(workers)
+    else:
+        utils.warn("Workers must be a positive integer. Using 1 worker.")
+        workers = 1
+
+    return [manifest, log_file, workers]
+
+
+if __name__ == "__main__":
+    # Set command line or simple testing
+    # sys.argv[1:] = ["C:/tmp/season.csv", "C:/tmp/season_log.csv", "4"]
+    utils.execute(run_batch, parameter_fixer)
@@ -0,0 +1,935 @@
+# -*- coding: utf-8 -*-
+"""
+Geodesic lengths and areas on an ellipsoid, vectorized with NumPy.
+
+Nothing in this module uses arcpy.  The tools read the vertices of each
+shape (in decimal degrees of longitude and latitude) with
+`geometry.wkb_parts()` and measure them here in large batches.
+
+The inverse problem (the distance and azimuths between two points) and the
+area of each edge (the ellipsoidal area between the geodesic and the equator,
+S12) are solved with the methods in C. F. F. Karney, "Algorithms for
+geodesics", J. Geodesy 87, 43-55 (2013), as in GeographicLib: Newton's method
+on the azimuth at the first point, started from the solution of the astroid
+problem for nearly antipodal points.  This converges for any pair of points
+on an oblate ellipsoid or a sphere, to full double precision.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import math
+import sys
+
+import numpy as np
+
+# (semi-major axis in meters, flattening)
+GRS80 = (6378137.0, 1 / 298.257222101)
+WGS84 = (6378137.0, 1 / 298.257223563)
+
+# Newton's method is used for at most MAX_NEWTON steps, then the root is
+# bracketed by bisection for at most MAX_ITERATIONS steps in all.
+MAX_NEWTON = 20
+MAX_ITERATIONS = MAX_NEWTON + sys.float_info.mant_dig + 10
+
+# The tolerances of the inverse solution, as in GeographicLib
+_TINY = math.sqrt(sys.float_info.min)
+_TOL0 = sys.float_info.epsilon
+_TOL1 = 200 * _TOL0
+_TOL2 = math.sqrt(_TOL0)
+_TOLB = _TOL0
+_XTHRESH = 1000 * _TOL2
+
+# Limit the number of vertices measured at once to limit memory use
+VERTICES_PER_BATCH = 262144
+
+# The order of the series in Karney (2013)
+_ORDER = 6
+
+# The coefficients of the A1, C1, A2 and C2 series as polynomials in eps**2,
+# and of the A3 and C3 series as polynomials in the third flattening n; each
+# polynomial is listed highest order first, followed by its divisor.  From
+# equations 17, 18, 42, 43, 24 and 25 of Karney (2013) and GeographicLib.
+_A1_COEFFICIENTS = [1, 4, 64, 0, 256]
+_C1_COEFFICIENTS = [
+    -1, 6, -16, 32,
+    -9, 64, -128, 2048,
+    9, -16, 768,
+    3, -5, 512,
+    -7, 1280,
+    -7, 2048,
+]  # fmt: skip
+_A2_COEFFICIENTS = [-11, -28, -192, 0, 256]
+_C2_COEFFICIENTS = [
+    1, 2, 16, 32,
+    35, 64, 384, 2048,
+    15, 80, 768,
+    7, 35, 512,
+    63, 1280,
+    77, 2048,
+]  # fmt: skip
+_A3_COEFFICIENTS = [
+    -3, 128,
+    -2, -3, 64,
+    -1, -3, -1, 16,
+    3, -1, -2, 8,
+    1, -1, 2,
+    1, 1,
+]  # fmt: skip
+_C3_COEFFICIENTS = [
+    3, 128,
+    2, 5, 128,
+    -1, 3, 3, 64,
+    -1, 0, 1, 8,
+    -1, 1, 4,
+    5, 256,
+    1, 3, 128,
+    -3, -2, 3, 64,
+    1, -3, 2, 32,
+    7, 512,
+    -10, 9, 384,
+    5, -9, 5, 192,
+    7, 512,
+    -14, 7, 512,
+    21, 2560,
+]  # fmt: skip
+
+# The coefficients of Karney's C4 series (order 6) as polynomials in the third
+# flattening n; each polynomial is listed highest order first, followed by its
+# divisor.  From equation 64 of Karney (2013) and GeographicLib.
+_C4_COEFFICIENTS = [
+    97, 15015,
+    1088, 156, 45045,
+    -224, -4784, 1573, 45045,
+    -10656, 14144, -4576, -858, 45045,
+    64, 624, -4576, 6864, -3003, 15015,
+    100, 208, 572, 3432, -12012, 30030, 45045,
+    1, 9009,
+    -2944, 468, 135135,
+    5792, 1040, -1287, 135135,
+    5952, -11648, 9152, -2574, 135135,
+    -64, -624, 4576, -6864, 3003, 135135,
+    8, 10725,
+    1856, -936, 225225,
+    -8448, 4992, -1144, 225225,
+    -1440, 4160, -4576, 1716, 225225,
+    -136, 63063,
+    1024, -208, 105105,
+    3584, -3328, 1144, 315315,
+    -128, 135135,
+    -2560, 832, 405405,
+    128, 99099,
+]  # fmt: skip
+
+
+class Ellipsoid(object):
+    """Measure geodesics on an ellipsoid of revolution.
+
+    All angles are in decimal degrees, and all lengths in meters.  Only
+    oblate ellipsoids and spheres (f >= 0) are supported.
+    """
+
+    # pylint: disable=invalid-name,too-many-instance-attributes
+    # The short names match the published formulas.
+
+    def __init__(self, a=GRS80[0], f=GRS80[1]):
+        """
+        Args:
+            a (double): The semi-major (equatorial) axis in meters.
+            f (double): The flattening; 0 for a sphere.
+        """
+        self.a = float(a)
+        self.f = float(f)
+        if not self.a > 0 or not 0 <= self.f < 1:
+            raise ValueError("Unsupported ellipsoid (a={0}, f={1})".format(a, f))
+        self.f1 = 1 - self.f
+        self.b = self.a * self.f1
+        self.e2 = self.f * (2 - self.f)
+        self.ep2 = self.e2 / self.f1**2
+        self.n = n = self.f / (2 - self.f)
+        # Lines shorter than this (in radians) are solved on the auxiliary
+        # sphere without iterating
+        self._etol2 = 0.1 * _TOL2 / math.sqrt(max(0.001, self.f) * (1 - self.f / 2) / 2)
+        # The square of the authalic radius
+        if self.e2 > 0:
+            e = math.sqrt(self.e2)
+            authalic = math.atanh(e) / e
+        else:
+            authalic = 1.0
+        self.c2 = (self.a**2 + self.b**2 * authalic) / 2
+        # The area of the whole ellipsoid
+        self.area0 = 4 * math.pi * self.c2
+
+        # Evaluate the n polynomials of the A3, C3 and C4 series once
+        self._a3x = _n_polynomials(
+            _A3_COEFFICIENTS,
+            n,
+            [min(_ORDER - power - 1, power) for power in range(_ORDER - 1, -1, -1)],
+        )
+        self._c3x = _n_polynomials(
+            _C3_COEFFICIENTS,
+            n,
+            [
+                min(_ORDER - power - 1, power)
+                for term in range(1, _ORDER)
+                for power in range(_ORDER - 1, term - 1, -1)
+            ],
+        )
+        self._c4x = _n_polynomials(
+            _C4_COEFFICIENTS,
+            n,
+            [
+                _ORDER - power - 1
+                for term in range(_ORDER)
+                for power in range(_ORDER - 1, term - 1, -1)
+            ],
+        )
+
+    @classmethod
+    def from_spatial_reference(cls, spatial_reference):
+        """Return the ellipsoid of a geographic arcpy.SpatialReference."""
+        return cls(spatial_reference.semiMajorAxis, spatial_reference.flattening)
+
+    def inverse(self, lon1, lat1, lon2, lat2):
+        """Solve the inverse geodesic problem for each pair of points.
+
+        Args:
+            lon1, lat1, lon2, lat2 (numpy.ndarray): The end points.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray): The distance between
+            the points, and the azimuth of the geodesic at each point.
+        """
+        solution = self._solve(lon1, lat1, lon2, lat2)
+        azi1 = np.degrees(np.arctan2(solution["salp1"], solution["calp1"]))
+        azi2 = np.degrees(np.arctan2(solution["salp2"], solution["calp2"]))
+        return solution["s12"], azi1, azi2
+
+    def edge_areas(self, lon1, lat1, lon2, lat2):
+        """Return the area between each geodesic and the equator (Karney's S12).
+
+        The sum over the edges of a closed ring is the area of the ring, but
+        only after it is reduced by `_reduce_area()`.
+        """
+        # pylint: disable=too-many-locals
+        s = self._solve(lon1, lat1, lon2, lat2)
+        sbet1, cbet1, sbet2, cbet2 = s["sbet1"], s["cbet1"], s["sbet2"], s["cbet2"]
+        salp1, calp1, salp2, calp2 = s["salp1"], s["calp1"], s["salp2"], s["calp2"]
+
+        salp0 = salp1 * cbet1
+        calp0 = np.hypot(calp1, salp1 * sbet1)
+        k2 = calp0**2 * self.ep2
+        eps = k2 / (2 * (1 + np.sqrt(1 + k2)) + k2)
+        a4 = self.a**2 * calp0 * salp0 * self.e2
+        # B4(sig2) - B4(sig1), with sig2 = sig1 + sig12 so the ends are consistent,
+        # and the differences of cosines as products to avoid cancellation on
+        # short edges.
+        sig1 = np.arctan2(sbet1, calp1 * cbet1)
+        half = s["sig12"] / 2
+        b4 = np.zeros_like(sig1)
+        for index, coefficient in enumerate(self._c4(eps)):
+            k = 2 * index + 1
+            b4 -= 2 * coefficient * np.sin(k * (sig1 + half)) * np.sin(k * half)
+        area = np.where((calp0 != 0) & (salp0 != 0), a4 * b4, 0.0)
+
+        # The change in azimuth along the geodesic
+        somg12, comg12 = np.sin(s["omg12"]), np.cos(s["omg12"])
+        domg12 = 1 + comg12
+        dbet1 = 1 + cbet1
+        dbet2 = 1 + cbet2
+        short = 2 * np.arctan2(
+            somg12 * (sbet1 * dbet2 + sbet2 * dbet1),
+            domg12 * (sbet1 * sbet2 + dbet1 * dbet2),
+        )
+        salp12 = salp2 * calp1 - calp2 * salp1
+        calp12 = calp2 * calp1 + salp2 * salp1
+        flip = (salp12 == 0) & (calp12 < 0)
+        salp12 = np.where(flip, 1e-300 * calp1, salp12)
+        calp12 = np.where(flip, -1.0, calp12)
+        wide = np.arctan2(salp12, calp12)
+        use_short = (comg12 > -0.7071) & (np.abs(sbet2 - sbet1) < 1.75)
+        return area + self.c2 * np.where(use_short, short, wide)
+
+    def ring_areas(self, rings):
+        """Return the signed area of each ring (positive if counter clockwise).
+
+        Args:
+            rings (list[numpy.ndarray]): (n, 2) arrays of longitude and latitude.
+              A ring may or may not repeat the first vertex at the end.
+
+        Returns:
+            numpy.ndarray: The area of each ring in square meters.
+        """
+        lon1, lat1, lon2, lat2, ring_ids = _edges(rings, closed=True)
+        edge_areas = self.edge_areas(lon1, lat1, lon2, lat2)
+        count = len(rings)
+        areas = np.bincount(ring_ids, weights=edge_areas, minlength=count)
+        crossings = np.bincount(
+            ring_ids, weights=_transit(lon1, lon2), minlength=count
+        ).astype(int)
+        return self._reduce_area(areas, crossings)
+
+    def path_lengths(self, paths, closed=False):
+        """Return the length of each path.
+
+        Args:
+            paths (list[numpy.ndarray]): (n, 2) arrays of longitude and latitude.
+            closed (bool, optional): If True, include the edge from the last
+              vertex back to the first. Defaults to False.
+
+        Returns:
+            numpy.ndarray: The length of each path in meters.
+        """
+        lon1, lat1, lon2, lat2, path_ids = _edges(paths, closed)
+        lengths = self._solve(lon1, lat1, lon2, lat2)["s12"]
+        return np.bincount(path_ids, weights=lengths, minlength=len(paths))
+
+    def polygon_areas(self, polygons):
+        """Return the area of each polygon.
+
+        Args:
+            polygons (list): The parts of each polygon, as returned by
+              `geometry.wkb_parts()` with longitude and latitude coordinates.
+
+        Returns:
+            numpy.ndarray: The area of the exteriors less the area of the holes,
+            in square meters.
+        """
+        rings, polygon_ids, signs = [], [], []
+        for polygon_id, parts in enumerate(polygons):
+            for part in parts:
+                for index, ring in enumerate(part):
+                    rings.append(ring)
+                    polygon_ids.append(polygon_id)
+                    signs.append(-1.0 if index else 1.0)
+        areas = np.abs(self.ring_areas(rings)) * np.array(signs)
+        return np.bincount(
+            np.array(polygon_ids, dtype=int), weights=areas, minlength=len(polygons)
+        )
+
+    def polyline_lengths(self, polylines):
+        """Return the total length of all the paths (or rings) in each shape.
+
+        Args:
+            polylines (list): The parts of each shape, as returned by
+              `geometry.wkb_parts()` with longitude and latitude coordinates.
+              Polygon rings must repeat the first vertex at the end.
+
+        Returns:
+            numpy.ndarray: The length of each shape in meters.
+        """
+        paths, shape_ids = [], []
+        for shape_id, parts in enumerate(polylines):
+            for part in parts:
+                paths.extend(part)
+                shape_ids.extend([shape_id] * len(part))
+        lengths = self.path_lengths(paths)
+        return np.bincount(
+            np.array(shape_ids, dtype=int), weights=lengths, minlength=len(polylines)
+        )
+
+    def batch_areas(self, shapes):
+        """Generate (key, area) for each (key, parts) in shapes.
+
+        The shapes are measured in batches of about VERTICES_PER_BATCH vertices,
+        so shapes can be read from a cursor without holding them all in memory.
+        A shape with no parts has an area of None.
+        """
+        return _batches(shapes, self.polygon_areas)
+
+    def batch_lengths(self, shapes):
+        """Generate (key, length) for each (key, parts) in shapes.
+
+        See `batch_areas()`.
+        """
+        return _batches(shapes, self.polyline_lengths)
+
+    def batch_measures(self, shapes, measures):
+        """Generate (key, values) for each (key, parts) in shapes.
+
+        measures is a list of "area" and/or "length"; values is a list with
+        the corresponding measurements of the shape (all None if the shape
+        has no parts).  See `batch_areas()`.
+        """
+        functions = [
+            self.polygon_areas if measure == "area" else self.polyline_lengths
+            for measure in measures
+        ]
+
+        def measure_all(batch):
+            """Return a (shapes x measures) array."""
+            return np.column_stack([function(batch) for function in functions])
+
+        return _batches(shapes, measure_all, [None] * len(measures))
+
+    def _solve(self, lon1, lat1, lon2, lat2):
+        """Karney's inverse solution; returns a dictionary of the terms.
+
+        As in GeographicLib, the points are first moved so that point 1 has
+        the larger absolute latitude and is south of the equator, and point 2
+        is east of it; the results are moved back at the end.
+        """
+        # pylint: disable=too-many-locals,too-many-statements
+        lon1, lat1, lon2, lat2 = [
+            np.atleast_1d(np.asarray(value, dtype=float))
+            for value in (lon1, lat1, lon2, lat2)
+        ]
+        lon12 = _angle_difference(lon1, lon2)
+        lonsign = np.where(lon12 < 0, -1.0, 1.0)
+        lon12 = np.abs(lon12)
+        lam12 = np.radians(lon12)
+        slam12, clam12 = _sincosd(lon12)
+        lat1 = _round_angle(lat1)
+        lat2 = _round_angle(lat2)
+        swapp = np.where(np.abs(lat1) < np.abs(lat2), -1.0, 1.0)
+        lonsign = lonsign * swapp
+        lat1, lat2 = np.where(swapp < 0, lat2, lat1), np.where(swapp < 0, lat1, lat2)
+        latsign = np.where(lat1 < 0, 1.0, -1.0)
+        lat1 = lat1 * latsign
+        lat2 = lat2 * latsign
+
+        sbet1, cbet1 = _sincosd(lat1)
+        sbet1, cbet1 = _norm(self.f1 * sbet1, cbet1)
+        cbet1 = np.maximum(_TINY, cbet1)
+        sbet2, cbet2 = _sincosd(lat2)
+        sbet2, cbet2 = _norm(self.f1 * sbet2, cbet2)
+        cbet2 = np.maximum(_TINY, cbet2)
+        # Make bet2 = +/-bet1 exactly where they are equal in magnitude
+        polar = cbet1 < -sbet1
+        sbet2 = np.where(polar & (cbet2 == cbet1), np.copysign(sbet1, sbet2), sbet2)
+        cbet2 = np.where(~polar & (np.abs(sbet2) == -sbet1), cbet1, cbet2)
+        dn1 = np.sqrt(1 + self.ep2 * sbet1**2)
+        dn2 = np.sqrt(1 + self.ep2 * sbet2**2)
+
+        s12 = np.zeros_like(lam12)
+        sig12 = np.zeros_like(lam12)
+        omg12 = np.zeros_like(lam12)
+        salp1, calp1 = np.zeros_like(lam12), np.zeros_like(lam12)
+        salp2, calp2 = np.zeros_like(lam12), np.zeros_like(lam12)
+
+        # Along a meridian, or from a pole
+        meridian = (lat1 == -90) | (slam12 == 0)
+        if meridian.any():
+            i = meridian
+            salp1[i], calp1[i] = slam12[i], clam12[i]
+            salp2[i], calp2[i] = 0.0, 1.0
+            ssig1, csig1 = sbet1[i], calp1[i] * cbet1[i]
+            ssig2, csig2 = sbet2[i], cbet2[i]
+            sig = np.arctan2(
+                np.maximum(0.0, csig1 * ssig2 - ssig1 * csig2),
+                csig1 * csig2 + ssig1 * ssig2,
+            )
+            s12b = _distance(self.n, sig, ssig1, csig1, ssig2, csig2)
+            zero = (sig < 3 * _TINY) | ((sig < _TOL0) & (s12b < 0))
+            s12[i] = np.where(zero, 0.0, self.b * s12b)
+            sig12[i] = np.where(zero, 0.0, sig)
+            omg12[i] = lam12[i]
+
+        # Along the equator, unless the geodesic goes over a pole
+        equator = ~meridian & (sbet1 == 0) & (180 - lon12 >= self.f * 180)
+        if equator.any():
+            i = equator
+            salp1[i], calp1[i] = 1.0, 0.0
+            salp2[i], calp2[i] = 1.0, 0.0
+            s12[i] = self.a * lam12[i]
+            sig12[i] = omg12[i] = lam12[i] / self.f1
+
+        general = ~meridian & ~equator
+        if general.any():
+            i = general
+            start = self._inverse_start(
+                sbet1[i], cbet1[i], sbet2[i], cbet2[i], lam12[i], slam12[i], clam12[i]
+            )
+            sig, salp1[i], calp1[i], salp2[i], calp2[i], dnm = start
+            # Very short lines are solved by the starting guess
+            short = sig >= 0
+            j = np.flatnonzero(i)[short]
+            s12[j] = sig[short] * self.b * dnm[short]
+            sig12[j] = sig[short]
+            omg12[j] = lam12[j] / (self.f1 * dnm[short])
+            j = np.flatnonzero(i)[~short]
+            if len(j):
+                salp1[j], calp1[j], solution = self._newton(
+                    sbet1[j],
+                    cbet1[j],
+                    dn1[j],
+                    sbet2[j],
+                    cbet2[j],
+                    dn2[j],
+                    salp1[j],
+                    calp1[j],
+                    slam12[j],
+                    clam12[j],
+                )
+                salp2[j], calp2[j], sig12[j] = solution[:3]
+                ssig1, csig1, ssig2, csig2, eps, domg12 = solution[3:]
+                s12[j] = self.b * _distance(eps, sig12[j], ssig1, csig1, ssig2, csig2)
+                sdomg12, cdomg12 = np.sin(domg12), np.cos(domg12)
+                omg12[j] = np.arctan2(
+                    slam12[j] * cdomg12 - clam12[j] * sdomg12,
+                    clam12[j] * cdomg12 + slam12[j] * sdomg12,
+                )
+
+        # Back to the original points
+        salp1, salp2 = np.where(swapp < 0, salp2, salp1), np.where(
+            swapp < 0, salp1, salp2
+        )
+        calp1, calp2 = np.where(swapp < 0, calp2, calp1), np.where(
+            swapp < 0, calp1, calp2
+        )
+        salp1, salp2 = salp1 * swapp * lonsign, salp2 * swapp * lonsign
+        calp1, calp2 = calp1 * swapp * latsign, calp2 * swapp * latsign
+        sbet1, sbet2 = sbet1 * latsign, sbet2 * latsign
+        sbet1, sbet2 = np.where(swapp < 0, sbet2, sbet1), np.where(
+            swapp < 0, sbet1, sbet2
+        )
+        cbet1, cbet2 = np.where(swapp < 0, cbet2, cbet1), np.where(
+            swapp < 0, cbet1, cbet2
+        )
+        return {
+            "s12": s12 + 0.0,
+            "sbet1": sbet1,
+            "cbet1": cbet1,
+            "sbet2": sbet2,
+            "cbet2": cbet2,
+            "salp1": salp1,
+            "calp1": calp1,
+            "salp2": salp2,
+            "calp2": calp2,
+            "omg12": omg12 * swapp * lonsign,
+            "sig12": sig12,
+        }
+
+    def _inverse_start(self, sbet1, cbet1, sbet2, cbet2, lam12, slam12, clam12):
+        """Return a starting guess for the azimuth at point 1.
+
+        Returns (sig12, salp1, calp1, salp2, calp2, dnm); sig12 is negative
+        except for very short lines, which are solved on the auxiliary sphere
+        (with the mean dnm) without iterating.  Nearly antipodal points start
+        from the solution of the astroid problem.
+        """
+        # pylint: disable=too-many-locals
+        sbet12 = sbet2 * cbet1 - cbet2 * sbet1
+        cbet12 = cbet2 * cbet1 + sbet2 * sbet1
+        sbet12a = sbet2 * cbet1 + cbet2 * sbet1
+        shortline = (cbet12 >= 0) & (sbet12 < 0.5) & (cbet2 * lam12 < 0.5)
+        sbetm2 = (sbet1 + sbet2) ** 2
+        sbetm2 = sbetm2 / (sbetm2 + (cbet1 + cbet2) ** 2)
+        dnm = np.sqrt(1 + self.ep2 * sbetm2)
+        omg12 = lam12 / (self.f1 * dnm)
+        somg12 = np.where(shortline, np.sin(omg12), slam12)
+        comg12 = np.where(shortline, np.cos(omg12), clam12)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            east = comg12 >= 0
+            salp1 = cbet2 * somg12
+            calp1 = np.where(
+                east,
+                sbet12 + cbet2 * sbet1 * somg12**2 / (1 + comg12),
+                sbet12a - cbet2 * sbet1 * somg12**2 / (1 - comg12),
+            )
+            ratio = np.where(east, somg12**2 / (1 + comg12), 1 - comg12)
+        ssig12 = np.hypot(salp1, calp1)
+        csig12 = sbet1 * sbet2 + cbet1 * cbet2 * comg12
+        short = shortline & (ssig12 < self._etol2)
+        salp2, calp2 = _norm(cbet1 * somg12, sbet12 - cbet1 * sbet2 * ratio)
+        sig12 = np.where(short, np.arctan2(ssig12, csig12), -1.0)
+
+        # Nearly antipodal points: scale to the astroid problem
+        astroid = (
+            ~short
+            & (abs(self.n) <= 0.1)
+            & (csig12 < 0)
+            & (ssig12 < 6 * abs(self.n) * math.pi * cbet1**2)
+        )
+        if astroid.any():
+            i = astroid
+            lam12x = np.arctan2(-slam12[i], -clam12[i])
+            k2 = sbet1[i] ** 2 * self.ep2
+            eps = k2 / (2 * (1 + np.sqrt(1 + k2)) + k2)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                lamscale = self.f * cbet1[i] * self._a3(eps) * math.pi
+                x = lam12x / lamscale
+                y = sbet12a[i] / (lamscale * cbet1[i])
+                k = _astroid(x, y)
+                omg12a = lamscale * (-x * k / (1 + k))
+                somg12a, comg12a = np.sin(omg12a), -np.cos(omg12a)
+                strip = (y > -_TOL1) & (x > -1 - _XTHRESH)
+                salp1[i] = np.where(strip, np.minimum(1.0, -x), cbet2[i] * somg12a)
+                calp1[i] = np.where(
+                    strip,
+                    -np.sqrt(1 - np.minimum(1.0, -x) ** 2),
+                    sbet12a[i] - cbet2[i] * sbet1[i] * somg12a**2 / (1 - comg12a),
+                )
+
+        usable = ~(salp1 <= 0)
+        salp1, calp1 = _norm(salp1, calp1)
+        salp1 = np.where(usable, salp1, 1.0)
+        calp1 = np.where(usable, calp1, 0.0)
+        return sig12, salp1, calp1, salp2, calp2, dnm
+
+    def _newton(
+        self, sbet1, cbet1, dn1, sbet2, cbet2, dn2, salp1, calp1, slam12, clam12
+    ):
+        """Solve lambda12(alp1) = lam12 for the azimuth at point 1.
+
+        Uses Newton's method while it stays inside a bracket of the root, and
+        bisects the bracket otherwise, so it always converges.  Returns
+        (salp1, calp1, (salp2, calp2, sig12, ssig1, csig1, ssig2, csig2, eps,
+        domg12)).
+        """
+        # pylint: disable=too-many-locals
+        count = len(salp1)
+        salp1, calp1 = salp1.copy(), calp1.copy()
+        # The bracket (alp1a, alp1b), starting with (0, pi)
+        salp1a, calp1a = np.full(count, _TINY), np.ones(count)
+        salp1b, calp1b = np.full(count, _TINY), -np.ones(count)
+        tripn = np.zeros(count, dtype=bool)
+        tripb = np.zeros(count, dtype=bool)
+        solution = [np.zeros(count) for _ in range(9)]
+        i = np.arange(count)
+        for iteration in range(MAX_ITERATIONS + 1):
+            values = self._lambda12(
+                sbet1[i],
+                cbet1[i],
+                dn1[i],
+                sbet2[i],
+                cbet2[i],
+                dn2[i],
+                salp1[i],
+                calp1[i],
+                slam12[i],
+                clam12[i],
+                iteration < MAX_NEWTON,
+            )
+            v, dv = values[0], values[-1]
+            for column, value in zip(solution, values[1:-1]):
+                column[i] = value
+            active = ~(
+                tripb[i] | (np.abs(v) < np.where(tripn[i], 8, 1) * _TOL0) | np.isnan(v)
+            )
+            if iteration == MAX_ITERATIONS or not active.any():
+                break
+            i, v, dv = i[active], v[active], dv[active]
+
+            # Narrow the bracket
+            s, c = salp1[i], calp1[i]
+            later = iteration > MAX_NEWTON
+            upper = (v > 0) & (later | (c / s > calp1b[i] / salp1b[i]))
+            lower = (v < 0) & (later | (c / s < calp1a[i] / salp1a[i]))
+            salp1b[i[upper]], calp1b[i[upper]] = s[upper], c[upper]
+            salp1a[i[lower]], calp1a[i[lower]] = s[lower], c[lower]
+
+            newton = np.zeros(len(i), dtype=bool)
+            if iteration + 1 < MAX_NEWTON:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    dalp1 = -v / dv
+                newton = (dv > 0) & (np.abs(dalp1) < math.pi)
+                sdalp1, cdalp1 = np.sin(dalp1), np.cos(dalp1)
+                nsalp1 = s * cdalp1 + c * sdalp1
+                newton &= nsalp1 > 0
+                nsalp1, ncalp1 = _norm(nsalp1, c * cdalp1 - s * sdalp1)
+                k = i[newton]
+                salp1[k], calp1[k] = nsalp1[newton], ncalp1[newton]
+                tripn[k] = np.abs(v[newton]) <= 16 * _TOL0
+            # Otherwise bisect the bracket
+            k = i[~newton]
+            s, c = _norm((salp1a[k] + salp1b[k]) / 2, (calp1a[k] + calp1b[k]) / 2)
+            salp1[k], calp1[k] = s, c
+            tripn[k] = False
+            tripb[k] = (np.abs(salp1a[k] - s) + (calp1a[k] - c) < _TOLB) | (
+                np.abs(s - salp1b[k]) + (c - calp1b[k]) < _TOLB
+            )
+        return salp1, calp1, solution
+
+    def _lambda12(
+        self,
+        sbet1,
+        cbet1,
+        dn1,
+        sbet2,
+        cbet2,
+        dn2,
+        salp1,
+        calp1,
+        slam120,
+        clam120,
+        diffp,
+    ):
+        """Return the error in the longitude difference for the azimuth alp1.
+
+        Returns (v, salp2, calp2, sig12, ssig1, csig1, ssig2, csig2, eps,
+        domg12, dv); dv is the derivative of v with alp1 (NaN if not diffp).
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        calp1 = np.where((sbet1 == 0) & (calp1 == 0), -_TINY, calp1)
+        salp0 = salp1 * cbet1
+        calp0 = np.hypot(calp1, salp1 * sbet1)
+        ssig1, csig1 = _norm(sbet1, calp1 * cbet1)
+        somg1, comg1 = salp0 * sbet1, calp1 * cbet1
+        salp2 = np.where(cbet2 != cbet1, salp0 / cbet2, salp1)
+        calp2 = np.where(
+            (cbet2 != cbet1) | (np.abs(sbet2) != -sbet1),
+            np.sqrt(
+                (calp1 * cbet1) ** 2
+                + np.where(
+                    cbet1 < -sbet1,
+                    (cbet2 - cbet1) * (cbet1 + cbet2),
+                    (sbet1 - sbet2) * (sbet1 + sbet2),
+                )
+            )
+            / cbet2,
+            np.abs(calp1),
+        )
+        ssig2, csig2 = _norm(sbet2, calp2 * cbet2)
+        somg2, comg2 = salp0 * sbet2, calp2 * cbet2
+        sig12 = np.arctan2(
+            np.maximum(0.0, csig1 * ssig2 - ssig1 * csig2) + 0.0,
+            csig1 * csig2 + ssig1 * ssig2,
+        )
+        somg12 = np.maximum(0.0, comg1 * somg2 - somg1 * comg2) + 0.0
+        comg12 = comg1 * comg2 + somg1 * somg2
+        eta = np.arctan2(
+            somg12 * clam120 - comg12 * slam120, comg12 * clam120 + somg12 * slam120
+        )
+        k2 = calp0**2 * self.ep2
+        eps = k2 / (2 * (1 + np.sqrt(1 + k2)) + k2)
+        c3 = self._c3(eps)
+        b312 = _sin_series(ssig2, csig2, c3) - _sin_series(ssig1, csig1, c3)
+        domg12 = -self.f * self._a3(eps) * salp0 * (sig12 + b312)
+        v = eta + domg12
+        if diffp:
+            m12b = _reduced_length(eps, sig12, ssig1, csig1, dn1, ssig2, csig2, dn2)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                dv = np.where(
+                    calp2 == 0,
+                    -2 * self.f1 * dn1 / sbet1,
+                    m12b * self.f1 / (calp2 * cbet2),
+                )
+        else:
+            dv = np.full_like(v, np.nan)
+        return v, salp2, calp2, sig12, ssig1, csig1, ssig2, csig2, eps, domg12, dv
+
+    def _a3(self, eps):
+        """Return the A3 coefficient for each eps."""
+        return np.polyval(self._a3x, eps)
+
+    def _c3(self, eps):
+        """Return the coefficients of the C3 series for each eps ([0, C31, ...])."""
+        coefficients = [0.0]
+        multiplier = 1
+        offset = 0
+        for term in range(1, _ORDER):
+            order = _ORDER - term - 1
+            multiplier = multiplier * eps
+            value = np.polyval(self._c3x[offset : offset + order + 1], eps)
+            coefficients.append(multiplier * value)
+            offset += order + 1
+        return coefficients
+
+    def _c4(self, eps):
+        """Return the coefficients of the C4 series for each eps."""
+        coefficients = []
+        multiplier = 1
+        offset = 0
+        for term in range(_ORDER):
+            order = _ORDER - term - 1
+            value = np.polyval(self._c4x[offset : offset + order + 1], eps)
+            coefficients.append(multiplier * value)
+            offset += order + 1
+            multiplier = multiplier * eps
+        return coefficients
+
+    def _reduce_area(self, areas, crossings):
+        """Reduce summed edge areas to signed ring areas in (-area0/2, area0/2]."""
+        area0 = self.area0
+        areas = areas - area0 * np.round(areas / area0)
+        odd = (crossings % 2) == 1
+        areas = areas + np.where(odd, np.where(areas < 0, 1, -1) * area0 / 2, 0)
+        # The edge areas are clockwise positive; return counter clockwise positive
+        areas = -areas
+        areas = np.where(areas > area0 / 2, areas - area0, areas)
+        return np.where(areas <= -area0 / 2, areas + area0, areas)
+
+
+def _batches(shapes, measure, empty=None):
+    """Measure (key, parts) shapes in batches; generate (key, measurement).
+
+    The measurement of a shape with no parts is `empty`."""
+    keys, batch = [], []
+    vertices = 0
+    for key, parts in shapes:
+        if not parts:
+            yield key, empty
+            continue
+        keys.append(key)
+        batch.append(parts)
+        vertices += sum(len(ring) for part in parts for ring in part)
+        if vertices >= VERTICES_PER_BATCH:
+            for item in zip(keys, measure(batch).tolist()):
+                yield item
+            keys, batch = [], []
+            vertices = 0
+    if batch:
+        for item in zip(keys, measure(batch).tolist()):
+            yield item
+
+
+def _edges(rings, closed):
+    """Return (lon1, lat1, lon2, lat2, ring index) for the edges of the rings."""
+    starts, ends, ids = [], [], []
+    for index, ring in enumerate(rings):
+        ring = np.asarray(ring, dtype=float)
+        if len(ring) < 2:
+            continue
+        if closed:
+            starts.append(ring)
+            ends.append(np.roll(ring, -1, axis=0))
+            ids.append(np.full(len(ring), index, dtype=int))
+        else:
+            starts.append(ring[:-1])
+            ends.append(ring[1:])
+            ids.append(np.full(len(ring) - 1, index, dtype=int))
+    if not starts:
+        empty = np.zeros(0)
+        return empty, empty, empty, empty, np.zeros(0, dtype=int)
+    start = np.concatenate(starts)
+    end = np.concatenate(ends)
+    return start[:, 0], start[:, 1], end[:, 0], end[:, 1], np.concatenate(ids)
+
+
+def _normalize(angle):
+    """Return angle in degrees reduced to (-180, 180]."""
+    angle = np.remainder(angle + 180, 360) - 180
+    return np.where(angle == -180, 180.0, angle)
+
+
+def _angle_difference(lon1, lon2):
+    """Return lon2 - lon1 in degrees, reduced to (-180, 180]."""
+    return _normalize(lon2 - lon1)
+
+
+def _transit(lon1, lon2):
+    """Return 1 (or -1) where an edge crosses the prime meridian going east
+    (or west), otherwise 0."""
+    lon12 = _angle_difference(lon1, lon2)
+    lon1 = _normalize(lon1)
+    lon2 = _normalize(lon2)
+    east = (lon12 > 0) & (((lon1 < 0) & (lon2 >= 0)) | ((lon1 > 0) & (lon2 == 0)))
+    west = (lon12 < 0) & (lon2 < 0) & (lon1 >= 0)
+    return east.astype(float) - west.astype(float)
+
+
+def _norm(sin_x, cos_x):
+    """Normalize a (sin, cos) pair."""
+    radius = np.hypot(sin_x, cos_x)
+    radius = np.where(radius == 0, 1.0, radius)
+    return sin_x / radius, cos_x / radius
+
+
+def _n_polynomials(coefficients, n, orders):
+    """Evaluate the listed polynomials in n, each followed by its divisor."""
+    values = []
+    offset = 0
+    for order in orders:
+        polynomial = coefficients[offset : offset + order + 1]
+        values.append(np.polyval(polynomial, n) / coefficients[offset + order + 1])
+        offset += order + 2
+    return values
+
+
+def _eps_series(coefficients, eps):
+    """Return [0, c1, ..., c6] of the C1 or C2 series for each eps.
+
+    Each c[l] is eps**l times a polynomial in eps**2."""
+    eps2 = eps**2
+    values = [0.0]
+    multiplier = eps
+    offset = 0
+    for term in range(1, _ORDER + 1):
+        order = (_ORDER - term) // 2
+        polynomial = coefficients[offset : offset + order + 1]
+        divisor = coefficients[offset + order + 1]
+        values.append(multiplier * np.polyval(polynomial, eps2) / divisor)
+        offset += order + 2
+        multiplier = multiplier * eps
+    return values
+
+
+def _sin_series(sin_x, cos_x, coefficients):
+    """Return the sum of c[l] * sin(2 * l * x) for l >= 1 (Clenshaw summation)."""
+    ar = 2 * (cos_x - sin_x) * (cos_x + sin_x)
+    y0 = y1 = 0.0
+    for coefficient in reversed(coefficients[1:]):
+        y0, y1 = ar * y0 - y1 + coefficient, y0
+    return 2 * sin_x * cos_x * y0
+
+
+def _distance(eps, sig12, ssig1, csig1, ssig2, csig2):
+    """Return the distance on the ellipsoid over b (equation 7)."""
+    t = np.polyval(_A1_COEFFICIENTS[:-1], eps**2) / _A1_COEFFICIENTS[-1]
+    a1 = 1 + (t + eps) / (1 - eps)
+    c1 = _eps_series(_C1_COEFFICIENTS, eps)
+    b1 = _sin_series(ssig2, csig2, c1) - _sin_series(ssig1, csig1, c1)
+    return a1 * (sig12 + b1)
+
+
+def _reduced_length(eps, sig12, ssig1, csig1, dn1, ssig2, csig2, dn2):
+    """Return the reduced length over b (equation 38)."""
+    eps2 = eps**2
+    a1m1 = np.polyval(_A1_COEFFICIENTS[:-1], eps2) / _A1_COEFFICIENTS[-1]
+    a1m1 = (a1m1 + eps) / (1 - eps)
+    a2m1 = np.polyval(_A2_COEFFICIENTS[:-1], eps2) / _A2_COEFFICIENTS[-1]
+    a2m1 = (a2m1 - eps) / (1 + eps)
+    c1 = _eps_series(_C1_COEFFICIENTS, eps)
+    c2 = _eps_series(_C2_COEFFICIENTS, eps)
+    c = [0.0] + [(1 + a1m1) * c1[l] - (1 + a2m1) * c2[l] for l in range(1, _ORDER + 1)]
+    j12 = (a1m1 - a2m1) * sig12 + (
+        _sin_series(ssig2, csig2, c) - _sin_series(ssig1, csig1, c)
+    )
+    return dn2 * (csig1 * ssig2) - dn1 * (ssig1 * csig2) - csig1 * csig2 * j12
+
+
+def _astroid(x, y):
+    """Return the positive root k of k**4 + 2k**3 - (x**2 + y**2 - 1)k**2 - 2y**2 k
+    - y**2 = 0 (equation 55)."""
+    p, q = x**2, y**2
+    r = (p + q - 1) / 6
+    s = p * q / 4
+    r2 = r**2
+    r3 = r * r2
+    disc = s * (s + 2 * r3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t3 = s + r3
+        t3 = t3 + np.where(t3 < 0, -1, 1) * np.sqrt(np.maximum(disc, 0))
+        t = np.cbrt(t3)
+        u_real = r + t + np.where(t != 0, r2 / t, 0.0)
+        angle = np.arctan2(np.sqrt(np.maximum(-disc, 0)), -(s + r3))
+        u_complex = r + 2 * r * np.cos(angle / 3)
+        u = np.where(disc >= 0, u_real, u_complex)
+        v = np.sqrt(u**2 + q)
+        uv = np.where(u < 0, q / (v - u), u + v)
+        w = (uv - q) / (2 * v)
+        k = uv / (np.sqrt(uv + w**2) + w)
+    return np.where((q == 0) & (r <= 0), 0.0, k)
+
+
+def _sincosd(degrees):
+    """Return the sine and cosine of angles in degrees, exact at multiples of 90."""
+    remainder = np.fmod(degrees, 360.0)
+    quarters = np.round(remainder / 90)
+    radians = np.radians(remainder - 90 * quarters)
+    sin, cos = np.sin(radians), np.cos(radians)
+    quarters = quarters.astype(int) % 4
+    cases = [quarters == 1, quarters == 2, quarters == 3]
+    sin, cos = np.select(cases, [cos, -sin, -cos], sin), np.select(
+        cases, [-sin, -cos, sin], cos
+    )
+    return np.where(sin == 0, np.copysign(sin, degrees), sin), cos + 0.0
+
+
+def _round_angle(degrees):
+    """Round tiny angles so that 90 - angle is exact (as GeographicLib does)."""
+    z = 1 / 16
+    y = np.abs(degrees)
+    y = np.where(y < z, z - (z - y), y)
+    return np.copysign(y, degrees)
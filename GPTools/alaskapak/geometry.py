@@ -0,0 +1,1183 @@
+# -*- coding: utf-8 -*-
+"""
+Planar geometry engines that work on NumPy coordinate arrays.
+
+Nothing in this module uses arcpy.  The tools convert arcpy geometries to
+plain coordinate rings with `polygon_rings()`, do the heavy lifting here in
+batches, and only build arcpy geometries for the final results.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import math
+import struct
+
+import numpy as np
+
+# Limit the size of the (candidates x edges) temporary arrays.
+MAX_CELLS = 1000000
+
+# The number of vertices in the ring of a circle polygon
+CIRCLE_VERTICES = 72
+
+
+def polygon_rings(polygon):
+    """Return the rings of an arcpy polygon as plain coordinate arrays.
+
+    arcpy separates the exterior ring of a part from its interior rings
+    (holes) with a None in the point array.  The closing vertex of each ring
+    (a duplicate of the first vertex) is dropped.
+
+    Args:
+        polygon (arcpy.Polygon): A polygon shape.
+
+    Returns:
+        list[list[numpy.ndarray]]: One list for each part of the polygon.  The
+        first array in each part is the exterior ring, any others are holes.
+        Each ring is a (n, 2) array of x, y coordinates.
+    """
+    parts = []
+    for part in polygon.getPart():
+        rings = []
+        ring = []
+        for point in part:
+            if point is None:
+                _append_ring(rings, ring)
+                ring = []
+            else:
+                ring.append((point.X, point.Y))
+        _append_ring(rings, ring)
+        if rings:
+            parts.append(rings)
+    return parts
+
+
+def _append_ring(rings, ring):
+    """Add the coordinate list `ring` to `rings` if it is a valid ring."""
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    if len(ring) > 2:
+        rings.append(np.array(ring, dtype=float))
+
+
+def wkb_parts(wkb):
+    """Return the coordinates in a well known binary polygon or polyline.
+
+    Reading the WKB of a shape (the SHAPE@WKB cursor token) and decoding it
+    with NumPy is much faster than walking the points of an arcpy geometry.
+    Z and M values are dropped.  Unlike `polygon_rings()`, rings keep their
+    closing vertex.
+
+    Args:
+        wkb (bytes): A (Multi)Polygon or (Multi)LineString in WKB (or ISO or
+          extended WKB with Z and/or M values).
+
+    Returns:
+        list[list[numpy.ndarray]]: One list for each part.  A polygon part is
+        its exterior ring followed by any holes; a polyline part is a list with
+        one path.  Each ring or path is a (n, 2) array of x, y coordinates.
+    """
+    wkb = bytes(wkb)
+    parts, _ = _read_wkb(wkb, 0)
+    return parts
+
+
+def _read_wkb(wkb, offset):
+    """Read the geometry at offset in wkb; return (parts, next offset)."""
+    # pylint: disable=too-many-locals
+    order = "<" if wkb[offset : offset + 1] == b"\x01" else ">"
+    (kind,) = struct.unpack_from(order + "I", wkb, offset + 1)
+    offset += 5
+    dimensions = 2
+    if kind & 0x80000000:
+        dimensions += 1
+    if kind & 0x40000000:
+        dimensions += 1
+    kind &= 0x0FFFFFFF
+    dimensions += {0: 0, 1: 1, 2: 1, 3: 2}.get(kind // 1000, 0)
+    kind %= 1000
+    dtype = np.dtype(order + "f8")
+    if kind in (5, 6):
+        # MultiLineString or MultiPolygon
+        (count,) = struct.unpack_from(order + "I", wkb, offset)
+        offset += 4
+        parts = []
+        for _ in range(count):
+            new_parts, offset = _read_wkb(wkb, offset)
+            parts.extend(new_parts)
+        return parts, offset
+    if kind == 2:
+        ring_count = 1
+    elif kind == 3:
+        (ring_count,) = struct.unpack_from(order + "I", wkb, offset)
+        offset += 4
+    else:
+        raise ValueError("Unsupported WKB geometry type {0}".format(kind))
+    rings = []
+    for _ in range(ring_count):
+        (count,) = struct.unpack_from(order + "I", wkb, offset)
+        offset += 4
+        values = np.frombuffer(wkb, dtype, count * dimensions, offset)
+        offset += 8 * count * dimensions
+        rings.append(values.reshape(count, dimensions)[:, :2].astype(float))
+    return ([rings] if rings else []), offset
+
+
+def polygon_area(parts):
+    """Return the planar area of a polygon.
+
+    Args:
+        parts (list[list[numpy.ndarray]]): The rings of each part, as returned
+          by `polygon_rings()` or `wkb_parts()`; the first ring of each part is
+          the exterior, and any others are holes.
+
+    Returns:
+        float: The area of the exteriors less the area of the holes.
+    """
+    area = 0.0
+    for rings in parts:
+        area += abs(signed_area(rings[0]))
+        for hole in rings[1:]:
+            area -= abs(signed_area(hole))
+    return float(area)
+
+
+def parts_length(parts):
+    """Return the planar length of all the paths (or rings) in a shape.
+
+    Args:
+        parts (list[list[numpy.ndarray]]): As returned by `wkb_parts()`;
+          rings must repeat the first vertex at the end.
+
+    Returns:
+        float: The total length.
+    """
+    length = 0.0
+    for part in parts:
+        for path in part:
+            steps = np.diff(path, axis=0)
+            length += np.hypot(steps[:, 0], steps[:, 1]).sum()
+    return float(length)
+
+
+class Rings(object):
+    """The edges of a set of polygon rings, ready for batch spatial tests.
+
+    Containment uses the even-odd rule, so holes do not need to be told
+    apart from exterior rings.
+    """
+
+    def __init__(self, parts):
+        """
+        Args:
+            parts (list[list[numpy.ndarray]]): Polygon parts as returned by
+              `polygon_rings()`.
+        """
+        self.parts = parts
+        self._sampler = None
+        starts = []
+        ends = []
+        for rings in parts:
+            for ring in rings:
+                starts.append(ring)
+                ends.append(np.roll(ring, -1, axis=0))
+        if starts:
+            starts = np.concatenate(starts)
+            ends = np.concatenate(ends)
+        else:
+            starts = np.empty((0, 2))
+            ends = np.empty((0, 2))
+        self.x1 = starts[:, 0]
+        self.y1 = starts[:, 1]
+        self.x2 = ends[:, 0]
+        self.y2 = ends[:, 1]
+        if len(starts):
+            self.extent = (
+                starts[:, 0].min(),
+                starts[:, 1].min(),
+                starts[:, 0].max(),
+                starts[:, 1].max(),
+            )
+        else:
+            self.extent = None
+
+    @property
+    def sampler(self):
+        """The `TriangleSampler` for these rings, or None if they could not be
+        triangulated.  The triangulation is done once, on first use."""
+        if self._sampler is None:
+            triangles = triangulate(self.parts)
+            if triangles is None:
+                self._sampler = False
+            else:
+                self._sampler = TriangleSampler(triangles)
+        return self._sampler or None
+
+    def random_points(self, count, rng=np.random):
+        """Return `count` uniformly distributed random points inside the rings.
+
+        Points are drawn from the triangulation of the rings, if possible,
+        otherwise with `random_points_in_rings()`.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The x and y coordinates of the points.
+        """
+        sampler = self.sampler
+        if sampler is not None:
+            return sampler.sample(count, rng)
+        return random_points_in_rings(self, count, rng)
+
+    def _chunks(self, count):
+        """Yield edge slices small enough to test against `count` candidates."""
+        size = max(1, MAX_CELLS // max(1, count))
+        for start in range(0, len(self.x1), size):
+            yield slice(start, start + size)
+
+    def contains_points(self, x, y):
+        """Return a boolean array; True where (x, y) is inside the rings.
+
+        Args:
+            x (numpy.ndarray): X coordinates of the points to test.
+            y (numpy.ndarray): Y coordinates of the points to test.
+        """
+        # pylint: disable=invalid-name
+        # I like x, y even if they are too short
+        x = np.asarray(x, dtype=float)[:, None]
+        y = np.asarray(y, dtype=float)[:, None]
+        inside = np.zeros(len(x), dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for edges in self._chunks(len(x)):
+                x1, y1 = self.x1[edges], self.y1[edges]
+                x2, y2 = self.x2[edges], self.y2[edges]
+                spans = (y1 > y) != (y2 > y)
+                x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                crossings = np.count_nonzero(spans & (x < x_cross), axis=1)
+                inside ^= crossings % 2 == 1
+        return inside
+
+    def crosses_segments(self, x1, y1, x2, y2):
+        """Return a boolean array; True where a segment crosses any ring edge.
+
+        Args:
+            x1, y1, x2, y2 (numpy.ndarray): The start and end coordinates of
+              the segments to test.
+        """
+        # pylint: disable=invalid-name
+        x1 = np.asarray(x1, dtype=float)[:, None]
+        y1 = np.asarray(y1, dtype=float)[:, None]
+        x2 = np.asarray(x2, dtype=float)[:, None]
+        y2 = np.asarray(y2, dtype=float)[:, None]
+        crosses = np.zeros(len(x1), dtype=bool)
+        for edges in self._chunks(len(x1)):
+            crossing = segments_cross(
+                x1,
+                y1,
+                x2,
+                y2,
+                self.x1[edges],
+                self.y1[edges],
+                self.x2[edges],
+                self.y2[edges],
+            )
+            crosses |= crossing.any(axis=1)
+        return crosses
+
+    def contains_segments(self, x1, y1, x2, y2):
+        """Return a boolean array; True where a segment is inside the rings.
+
+        A segment is inside if both ends are inside and it does not cross
+        any edge (i.e. it does not leave the polygon or enter a hole).
+        """
+        # pylint: disable=invalid-name
+        inside = self.contains_points(x1, y1) & self.contains_points(x2, y2)
+        if inside.any():
+            index = np.flatnonzero(inside)
+            inside[index] = ~self.crosses_segments(
+                x1[index], y1[index], x2[index], y2[index]
+            )
+        return inside
+
+
+def segments_cross(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2):
+    """Return True where segment a properly crosses segment b.
+
+    The arguments are broadcast against each other, so a column of `a`
+    segments and a row of `b` segments yields a table of results.  Segments
+    that only touch at an end point, or are collinear, do not cross.
+    """
+    # pylint: disable=invalid-name,too-many-arguments
+    d1 = (bx2 - bx1) * (ay1 - by1) - (by2 - by1) * (ax1 - bx1)
+    d2 = (bx2 - bx1) * (ay2 - by1) - (by2 - by1) * (ax2 - bx1)
+    d3 = (ax2 - ax1) * (by1 - ay1) - (ay2 - ay1) * (bx1 - ax1)
+    d4 = (ax2 - ax1) * (by2 - ay1) - (ay2 - ay1) * (bx2 - ax1)
+    return (d1 * d2 < 0) & (d3 * d4 < 0)
+
+
+def random_points_in_rings(rings, count, rng=np.random):
+    """Return `count` uniformly distributed random points inside `rings`.
+
+    Points are drawn in batches from the extent and the ones outside the
+    rings are discarded.  This can be slow for a polygon that fills little of
+    its extent; see `Rings.random_points()`.
+
+    Args:
+        rings (Rings): The polygon boundary.
+        count (int): The number of points to return.
+        rng (numpy.random.RandomState): The source of random numbers.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): The x and y coordinates of the points.
+        Fewer than `count` points are returned if the rings have no area.
+    """
+    # pylint: disable=invalid-name
+    if rings.extent is None or count < 1:
+        return np.empty(0), np.empty(0)
+    x_min, y_min, x_max, y_max = rings.extent
+    xs, ys = [], []
+    found = 0
+    batch = count
+    misses = 0
+    while found < count and misses < 100:
+        x = rng.uniform(x_min, x_max, batch)
+        y = rng.uniform(y_min, y_max, batch)
+        inside = rings.contains_points(x, y)
+        hits = np.count_nonzero(inside)
+        if hits:
+            xs.append(x[inside])
+            ys.append(y[inside])
+            found += hits
+            # Size the next batch from the observed hit rate
+            batch = int(math.ceil((count - found) * batch / hits)) + 1
+            misses = 0
+        else:
+            batch = min(2 * batch, MAX_CELLS)
+            misses += 1
+    if not xs:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(xs)[:count], np.concatenate(ys)[:count]
+
+
+def random_segments_in_rings(
+    rings,
+    line_goal,
+    max_attempts,
+    min_length,
+    max_length,
+    allow_overlap=True,
+    rng=np.random,
+    batch_size=256,
+):
+    """Create random line segments within a polygon.
+
+    Candidate segments are drawn in batches.  Each candidate starts at a
+    uniformly distributed point in the polygon and has a uniformly
+    distributed length and direction.  Candidates are then considered in
+    order, exactly as if they had been created one at a time: `max_attempts`
+    consecutive failures (since the last success) ends the search.
+
+    Args:
+        rings (Rings): The polygon boundary.
+        line_goal (int): Number of segments to create.
+        max_attempts (int): Number of times to try and create a segment.
+        min_length (double): Minimum length of the segments.
+        max_length (double): Maximum length of the segments.
+        allow_overlap (bool): Are segments allowed to cross each other?
+        rng (numpy.random.RandomState): The source of random numbers.
+        batch_size (int): The maximum number of candidates drawn at once.
+
+    Returns:
+        (list[((float,float),(float,float))], bool): The coordinates of the ends
+        of each segment, and True if the search ended with `max_attempts`
+        consecutive failures.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    # pylint: disable=invalid-name
+    # I like x, y even if they are too short
+
+    segments = []
+    index = SegmentIndex(max_length)
+    attempt_count = 0
+    while len(segments) < line_goal and attempt_count < max_attempts:
+        size = min(batch_size, max_attempts - attempt_count + line_goal)
+        x1, y1 = rings.random_points(size, rng)
+        if len(x1) == 0:
+            # The polygon has no area
+            attempt_count = max_attempts
+            break
+        size = len(x1)
+        length = rng.uniform(min_length, max_length, size)
+        angle = rng.uniform(0, 2 * math.pi, size)
+        x2 = x1 + length * np.cos(angle)
+        y2 = y1 + length * np.sin(angle)
+        inside = rings.contains_segments(x1, y1, x2, y2)
+        for i in range(size):
+            segment = (float(x1[i]), float(y1[i]), float(x2[i]), float(y2[i]))
+            if inside[i] and (allow_overlap or not index.crosses(*segment)):
+                segments.append((segment[:2], segment[2:]))
+                if not allow_overlap:
+                    index.insert(*segment)
+                attempt_count = 0
+            else:
+                attempt_count += 1
+            if len(segments) == line_goal or attempt_count == max_attempts:
+                break
+    return segments, attempt_count == max_attempts
+
+
+def random_generator(seed):
+    """Return a NumPy random number generator for `seed`.
+
+    Args:
+        seed (int or sequence[int]): The seed.  A sequence like (run seed,
+          feature id) gives each feature its own independent stream.
+
+    Returns:
+        numpy.random.Generator: or a numpy.random.RandomState with older
+        versions of NumPy. Both provide the `uniform()` method used here.
+    """
+    if hasattr(np.random, "default_rng"):
+        return np.random.default_rng(seed)
+    return np.random.RandomState(seed)
+
+
+def transects_in_polygon(task):
+    """Create the random transects for one polygon.
+
+    This is the unit of work for `random_segments_in_rings()` that is sent to
+    a worker process, so it takes (and returns) a single picklable tuple.
+
+    Args:
+        task (tuple): (key, parts, seed, line_goal, max_attempts, min_length,
+          max_length, allow_overlap). `key` identifies the polygon and is
+          returned unchanged; `parts` are the rings from `polygon_rings()`;
+          `seed` is given to `random_generator()`.  The others are the
+          arguments of `random_segments_in_rings()`.
+
+    Returns:
+        (key, list[((float,float),(float,float))], bool): The key, and the
+        results of `random_segments_in_rings()`.
+    """
+    (
+        key,
+        parts,
+        seed,
+        line_goal,
+        max_attempts,
+        min_length,
+        max_length,
+        allow_overlap,
+    ) = task
+    segments, exhausted = random_segments_in_rings(
+        Rings(parts),
+        line_goal,
+        max_attempts,
+        min_length,
+        max_length,
+        allow_overlap,
+        random_generator(seed),
+    )
+    return key, segments, exhausted
+
+
+class SegmentIndex(object):
+    """A uniform grid index of line segments for fast crossing tests.
+
+    Each segment is filed under every grid cell its bounding box touches, so a
+    crossing test only needs to look at the segments in the cells touched by
+    the test segment.  A cell size near the typical segment length works well.
+    """
+
+    def __init__(self, cell_size):
+        """
+        Args:
+            cell_size (double): The width and height of a grid cell.
+        """
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self.cells = {}
+        self.segments = []
+
+    def __len__(self):
+        return len(self.segments)
+
+    def _cells(self, x1, y1, x2, y2):
+        """Return the keys of the grid cells touched by a segment's extent."""
+        # pylint: disable=invalid-name
+        size = self.cell_size
+        col1 = int(math.floor(min(x1, x2) / size))
+        col2 = int(math.floor(max(x1, x2) / size))
+        row1 = int(math.floor(min(y1, y2) / size))
+        row2 = int(math.floor(max(y1, y2) / size))
+        return [
+            (col, row) for col in range(col1, col2 + 1) for row in range(row1, row2 + 1)
+        ]
+
+    def insert(self, x1, y1, x2, y2):
+        """Add the segment (x1, y1)-(x2, y2) to the index."""
+        # pylint: disable=invalid-name
+        segment_id = len(self.segments)
+        self.segments.append((x1, y1, x2, y2))
+        for key in self._cells(x1, y1, x2, y2):
+            self.cells.setdefault(key, []).append(segment_id)
+
+    def crosses(self, x1, y1, x2, y2):
+        """Does the segment (x1, y1)-(x2, y2) cross any segment in the index?"""
+        # pylint: disable=invalid-name
+        checked = set()
+        for key in self._cells(x1, y1, x2, y2):
+            for segment_id in self.cells.get(key, ()):
+                if segment_id in checked:
+                    continue
+                checked.add(segment_id)
+                if segment_crosses(x1, y1, x2, y2, *self.segments[segment_id]):
+                    return True
+        return False
+
+
+def segment_crosses(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2):
+    """Does segment a properly cross segment b?
+
+    A pure Python (scalar) version of `segments_cross()`.
+    """
+    # pylint: disable=invalid-name,too-many-arguments
+    # Reject quickly if the bounding boxes do not overlap
+    if max(ax1, ax2) < min(bx1, bx2) or max(bx1, bx2) < min(ax1, ax2):
+        return False
+    if max(ay1, ay2) < min(by1, by2) or max(by1, by2) < min(ay1, ay2):
+        return False
+    d1 = (bx2 - bx1) * (ay1 - by1) - (by2 - by1) * (ax1 - bx1)
+    d2 = (bx2 - bx1) * (ay2 - by1) - (by2 - by1) * (ax2 - bx1)
+    if d1 * d2 >= 0:
+        return False
+    d3 = (ax2 - ax1) * (by1 - ay1) - (ay2 - ay1) * (bx1 - ax1)
+    d4 = (ax2 - ax1) * (by2 - ay1) - (ay2 - ay1) * (bx2 - ax1)
+    return d3 * d4 < 0
+
+
+class PolygonIndex(object):
+    """A uniform grid index of polygon edges for batch point in polygon tests.
+
+    Each ring edge is filed under the grid cells it passes through, so the
+    size of the index depends on the number and length of the edges, not on
+    the area of the polygons.  A point is inside a polygon if the horizontal
+    line through the center of its grid row crosses the polygon an odd number
+    of times to the right of the point, give or take the edges in the point's
+    own cell that lie between the point and that line.  The crossings of each
+    row are found once, on first use.
+    """
+
+    def __init__(self, cell_size):
+        """
+        Args:
+            cell_size (double): The smallest width and height of a grid cell.
+              The cells are made larger if they would be much shorter than
+              the average edge.
+        """
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self.polygons = []
+        self._grid = None
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def insert(self, parts):
+        """Add a polygon (parts as returned by `polygon_rings()`) to the index."""
+        rings = Rings(parts)
+        if rings.extent is None:
+            return
+        self.polygons.append(rings)
+        self._grid = None
+
+    def _build(self):
+        """File every edge under the grid cells it passes through."""
+        polygon_ids = np.concatenate(
+            [np.full(len(rings.x1), i) for i, rings in enumerate(self.polygons)]
+        )
+        x1 = np.concatenate([rings.x1 for rings in self.polygons])
+        y1 = np.concatenate([rings.y1 for rings in self.polygons])
+        x2 = np.concatenate([rings.x2 for rings in self.polygons])
+        y2 = np.concatenate([rings.y2 for rings in self.polygons])
+        dx = x2 - x1
+        dy = y2 - y1
+        size = max(self.cell_size, np.hypot(dx, dy).mean())
+        # Split each edge into steps no longer than a cell; the extent of a
+        # step touches at most 2 x 2 cells.
+        steps = np.maximum(1, np.ceil(np.maximum(np.abs(dx), np.abs(dy)) / size))
+        steps = steps.astype(np.int64)
+        edge = np.repeat(np.arange(len(x1)), steps)
+        first = np.repeat(np.cumsum(steps) - steps, steps)
+        fraction = (np.arange(len(edge)) - first) / steps[edge]
+        start_x = x1[edge] + dx[edge] * fraction
+        start_y = y1[edge] + dy[edge] * fraction
+        end_x = start_x + dx[edge] / steps[edge]
+        end_y = start_y + dy[edge] / steps[edge]
+        col1 = np.floor(np.minimum(start_x, end_x) / size).astype(np.int64)
+        col2 = np.floor(np.maximum(start_x, end_x) / size).astype(np.int64)
+        row1 = np.floor(np.minimum(start_y, end_y) / size).astype(np.int64)
+        row2 = np.floor(np.maximum(start_y, end_y) / size).astype(np.int64)
+        filed = np.unique(
+            np.concatenate(
+                [
+                    np.column_stack([edge, col1, row1]),
+                    np.column_stack([edge, col2, row1]),
+                    np.column_stack([edge, col1, row2]),
+                    np.column_stack([edge, col2, row2]),
+                ]
+            ),
+            axis=0,
+        )
+        cells = {}
+        for edge_id, col, row in filed.tolist():
+            cells.setdefault((col, row), []).append(edge_id)
+        rows = {}
+        for (_, row), edge_ids in cells.items():
+            rows.setdefault(row, []).append(edge_ids)
+        self._grid = {
+            "size": size,
+            "polygon": polygon_ids,
+            "x1": x1,
+            "y1": y1,
+            "x2": x2,
+            "y2": y2,
+            "cells": dict((key, np.array(ids)) for key, ids in cells.items()),
+            "rows": rows,
+            "crossings": {},
+        }
+
+    def _row_crossings(self, row):
+        """Return the sorted x coordinates (and their polygon ids) where the
+        edges cross the horizontal line through the center of a grid row."""
+        grid = self._grid
+        if row not in grid["crossings"]:
+            edges = np.unique(np.concatenate(grid["rows"][row]))
+            x1, y1 = grid["x1"][edges], grid["y1"][edges]
+            x2, y2 = grid["x2"][edges], grid["y2"][edges]
+            y = (row + 0.5) * grid["size"]
+            spans = (y1 > y) != (y2 > y)
+            x1, y1, x2, y2 = x1[spans], y1[spans], x2[spans], y2[spans]
+            x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            polygons = grid["polygon"][edges[spans]]
+            order = np.lexsort((x_cross, polygons))
+            grid["crossings"][row] = (x_cross[order], polygons[order])
+        return grid["crossings"][row]
+
+    def contains_points(self, x, y):
+        """Return a boolean array; True where (x, y) is inside any polygon.
+
+        Args:
+            x (numpy.ndarray): X coordinates of the points to test.
+            y (numpy.ndarray): Y coordinates of the points to test.
+        """
+        # pylint: disable=invalid-name,too-many-locals
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        inside = np.zeros(len(x), dtype=bool)
+        if not self.polygons or not len(x):
+            return inside
+        if self._grid is None:
+            self._build()
+        grid = self._grid
+        size = grid["size"]
+        cols = np.floor(x / size).astype(np.int64)
+        rows = np.floor(y / size).astype(np.int64)
+        # Group the points by grid cell
+        order = np.lexsort((cols, rows))
+        cols = cols[order]
+        rows = rows[order]
+        breaks = np.flatnonzero((np.diff(cols) != 0) | (np.diff(rows) != 0)) + 1
+        starts = np.concatenate([[0], breaks]).astype(np.int64)
+        ends = np.concatenate([breaks, [len(order)]]).astype(np.int64)
+        # Group the cells by grid row
+        row_breaks = np.flatnonzero(np.diff(rows[starts]) != 0) + 1
+        first_cells = np.concatenate([[0], row_breaks]).astype(np.int64)
+        end_cells = np.concatenate([row_breaks, [len(starts)]]).astype(np.int64)
+        for first_cell, end_cell in zip(first_cells, end_cells):
+            row_start = starts[first_cell]
+            row_end = ends[end_cell - 1]
+            row = int(rows[row_start])
+            if row not in grid["rows"]:
+                # No edges in the row, so no point in it is inside a polygon
+                continue
+            x_cross, polygons = self._row_crossings(row)
+            row_points = order[row_start:row_end]
+            # Crossings to the right of each point on the row's center line
+            parity = {}
+            for polygon_id in np.unique(polygons):
+                first = np.searchsorted(polygons, polygon_id, side="left")
+                last = np.searchsorted(polygons, polygon_id, side="right")
+                right = (
+                    last
+                    - first
+                    - np.searchsorted(x_cross[first:last], x[row_points], side="right")
+                )
+                parity[int(polygon_id)] = right % 2 == 1
+            # Edges in each cell between the point and the row's center line
+            center = (row + 0.5) * size
+            for start, end in zip(
+                starts[first_cell:end_cell], ends[first_cell:end_cell]
+            ):
+                edges = grid["cells"].get((int(cols[start]), row))
+                if edges is None:
+                    continue
+                points = order[start:end]
+                px = x[points][:, None]
+                py = y[points][:, None]
+                x1, y1 = grid["x1"][edges], grid["y1"][edges]
+                x2, y2 = grid["x2"][edges], grid["y2"][edges]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    y_cross = y1 + (px - x1) * (y2 - y1) / (x2 - x1)
+                hits = ((x1 > px) != (x2 > px)) & (
+                    (y_cross > np.minimum(py, center))
+                    & (y_cross <= np.maximum(py, center))
+                )
+                offset = start - row_start
+                edge_polygons = grid["polygon"][edges]
+                for polygon_id in np.unique(edge_polygons[hits.any(axis=0)]):
+                    flips = hits[:, edge_polygons == polygon_id].sum(axis=1) % 2 == 1
+                    polygon_id = int(polygon_id)
+                    if polygon_id not in parity:
+                        parity[polygon_id] = np.zeros(len(row_points), dtype=bool)
+                    parity[polygon_id][offset : offset + len(points)] ^= flips
+            for polygon_parity in parity.values():
+                inside[row_points] |= polygon_parity
+        return inside
+
+
+class TriangleSampler(object):
+    """Draws uniformly distributed random points from a set of triangles.
+
+    A triangle is chosen with a probability proportional to its area, and
+    then a point is chosen uniformly within the triangle.  There is no
+    rejection, so the time to draw a point does not depend on the shape of
+    the polygon.
+    """
+
+    def __init__(self, triangles):
+        """
+        Args:
+            triangles (numpy.ndarray): A (n, 3, 2) array of triangle vertices.
+        """
+        self.a = triangles[:, 0, :]
+        self.ab = triangles[:, 1, :] - self.a
+        self.ac = triangles[:, 2, :] - self.a
+        areas = np.abs(self.ab[:, 0] * self.ac[:, 1] - self.ab[:, 1] * self.ac[:, 0])
+        self.cumulative_area = np.cumsum(areas / 2.0)
+        self.area = self.cumulative_area[-1] if len(areas) else 0.0
+
+    def sample(self, count, rng=np.random):
+        """Return `count` random points.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The x and y coordinates of the points.
+        """
+        if count < 1 or self.area <= 0:
+            return np.empty(0), np.empty(0)
+        choice = np.searchsorted(
+            self.cumulative_area, rng.uniform(0, self.area, count), side="right"
+        )
+        choice = np.minimum(choice, len(self.cumulative_area) - 1)
+        r1 = rng.uniform(0, 1, count)
+        r2 = rng.uniform(0, 1, count)
+        # Fold points in the far half of the parallelogram back into the triangle
+        outside = r1 + r2 > 1
+        r1[outside] = 1 - r1[outside]
+        r2[outside] = 1 - r2[outside]
+        points = (
+            self.a[choice]
+            + r1[:, None] * self.ab[choice]
+            + r2[:, None] * self.ac[choice]
+        )
+        return points[:, 0], points[:, 1]
+
+
+def triangulate(parts):
+    """Triangulate polygon parts by ear clipping.
+
+    The holes in each part are first joined to the exterior ring with bridge
+    edges, so each part becomes a single (weakly simple) ring.
+
+    Args:
+        parts (list[list[numpy.ndarray]]): Polygon parts as returned by
+          `polygon_rings()`.
+
+    Returns:
+        numpy.ndarray: A (n, 3, 2) array of triangle vertices, or None if any
+        ring could not be triangulated (e.g. it intersects itself).
+    """
+    triangles = []
+    for rings in parts:
+        outer = _oriented(rings[0], counter_clockwise=True)
+        holes = [_oriented(hole, counter_clockwise=False) for hole in rings[1:]]
+        ring = _bridge_holes(outer, holes)
+        part_triangles = _ear_clip(ring)
+        if part_triangles is None:
+            return None
+        triangles.extend(part_triangles)
+    if not triangles:
+        return None
+    return np.array(triangles, dtype=float)
+
+
+def signed_area(ring):
+    """Return the area of a ring; positive if it is counter clockwise."""
+    x = ring[:, 0]
+    y = ring[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2.0
+
+
+def _oriented(ring, counter_clockwise):
+    """Return `ring` with its vertices in the requested order."""
+    if (signed_area(ring) > 0) != counter_clockwise:
+        return ring[::-1]
+    return ring
+
+
+def _bridge_holes(outer, holes):
+    """Join the holes to the counter clockwise `outer` ring.
+
+    Holes are processed from right to left (by their rightmost x), as in
+    David Eberly's "Triangulation by Ear Clipping".  Each is connected from
+    its rightmost vertex M to the nearest vertex of the ring that M can see:
+    the bridge must enter the polygon's interior at both ends and must not
+    cross or touch the ring (with the bridges already added) or any hole.
+    The bridge is traversed in both directions, so the result is a single
+    ring.  A hole that cannot be bridged (i.e. it is not inside the outer
+    ring) is ignored.
+    """
+    ring = outer
+    holes = sorted(holes, key=lambda hole: -hole[:, 0].max())
+    if not holes:
+        return ring
+    # The edges and vertices of the holes, so the ones not bridged yet are a slice
+    hole_edges = np.concatenate([_edges(hole) for hole in holes])
+    hole_points = np.concatenate(holes)
+    starts = np.cumsum([0] + [len(hole) for hole in holes])
+    for index, hole in enumerate(holes):
+        m = int(np.argmax(hole[:, 0]))
+        # The bridge must not cross the ring or any hole not bridged yet
+        # (including this one)
+        edges = np.concatenate([_edges(ring), hole_edges[starts[index] :]])
+        points = np.concatenate([ring, hole_points[starts[index] :]])
+        p = _visible_vertex(ring, hole, m, edges, points)
+        if p is None:
+            continue
+        ring = np.concatenate([ring[: p + 1], hole[m:], hole[: m + 1], ring[p:]])
+    return ring
+
+
+def _edges(ring):
+    """Return the (n, 4) array of the x1, y1, x2, y2 of the edges of a ring."""
+    return np.concatenate([ring, np.roll(ring, -1, axis=0)], axis=1)
+
+
+def _visible_vertex(ring, hole, m, edges, points):
+    """Return the index of the vertex of `ring` nearest to hole[m] that can be
+    joined to it with a bridge (see `_bridge_holes()`), or None."""
+    # pylint: disable=too-many-locals
+    mx, my = hole[m]
+    # The bridge must enter the ring's inside at the ring vertex, and leave the
+    # hole on its outside (the clockwise hole's outside is on its left)
+    candidates = np.flatnonzero(
+        _in_wedge(np.roll(ring, 1, axis=0), ring, np.roll(ring, -1, axis=0), hole[m])
+        & _in_wedge(hole[m - 1], hole[m], hole[(m + 1) % len(hole)], ring)
+    )
+    distance = (ring[candidates, 0] - mx) ** 2 + (ring[candidates, 1] - my) ** 2
+    candidates = candidates[np.argsort(distance, kind="stable")]
+    # The nearest vertex can usually be seen, so try a few candidates first,
+    # then more at a time, each against the edges near its bridges
+    start = 0
+    size = 1
+    while start < len(candidates):
+        chunk = candidates[start : start + size]
+        start += len(chunk)
+        size = min(size * 2, max(1, MAX_CELLS // max(1, len(edges) + len(points))))
+        vx = ring[chunk, 0]
+        vy = ring[chunk, 1]
+        left = min(mx, vx.min())
+        right = max(mx, vx.max())
+        bottom = min(my, vy.min())
+        top = max(my, vy.max())
+        near = (
+            (np.minimum(edges[:, 0], edges[:, 2]) <= right)
+            & (np.maximum(edges[:, 0], edges[:, 2]) >= left)
+            & (np.minimum(edges[:, 1], edges[:, 3]) <= top)
+            & (np.maximum(edges[:, 1], edges[:, 3]) >= bottom)
+        )
+        x1, y1, x2, y2 = [edges[near, i] for i in range(4)]
+        vx = vx[:, None]
+        vy = vy[:, None]
+        blocked = segments_cross(mx, my, vx, vy, x1, y1, x2, y2).any(axis=1)
+        # A vertex on the bridge (other than its ends) also blocks it
+        near = (
+            (points[:, 0] >= left)
+            & (points[:, 0] <= right)
+            & (points[:, 1] >= bottom)
+            & (points[:, 1] <= top)
+        )
+        px = points[near, 0]
+        py = points[near, 1]
+        on_line = (vx - mx) * (py - my) - (vy - my) * (px - mx) == 0
+        between = ((px - mx) * (vx - mx) + (py - my) * (vy - my) > 0) & (
+            (px - vx) * (mx - vx) + (py - vy) * (my - vy) > 0
+        )
+        blocked |= (on_line & between).any(axis=1)
+        if not blocked.all():
+            return int(chunk[np.argmin(blocked)])
+    return None
+
+
+def _in_wedge(before, vertex, after, points):
+    """Return True where the direction from `vertex` to a point is strictly
+    inside the angle on the left of the path before -> vertex -> after.
+
+    The arguments are broadcast against each other.
+    """
+    left_in = _cross(before, vertex, points) > 0
+    left_out = _cross(vertex, after, points) > 0
+    convex = _cross(before, vertex, after) >= 0
+    return np.where(convex, left_in & left_out, left_in | left_out)
+
+
+def _reflex(ring):
+    """Return a boolean array; True where a vertex of a counter clockwise ring
+    is reflex (interior angle greater than 180 degrees)."""
+    before = np.roll(ring, 1, axis=0)
+    after = np.roll(ring, -1, axis=0)
+    return _cross(before, ring, after) < 0
+
+
+def _cross(a, b, c):
+    """The z component of (b - a) x (c - b); positive for a left turn."""
+    return (b[..., 0] - a[..., 0]) * (c[..., 1] - b[..., 1]) - (
+        b[..., 1] - a[..., 1]
+    ) * (c[..., 0] - b[..., 0])
+
+
+def _in_triangle(points, a, b, c):
+    """Return a boolean array; True where a point is inside or on the edge of
+    the triangle (a, b, c), excluding points equal to a corner."""
+    # pylint: disable=invalid-name
+    x = points[:, 0]
+    y = points[:, 1]
+    d1 = (b[0] - a[0]) * (y - a[1]) - (b[1] - a[1]) * (x - a[0])
+    d2 = (c[0] - b[0]) * (y - b[1]) - (c[1] - b[1]) * (x - b[0])
+    d3 = (a[0] - c[0]) * (y - c[1]) - (a[1] - c[1]) * (x - c[0])
+    negative = (d1 < 0) | (d2 < 0) | (d3 < 0)
+    positive = (d1 > 0) | (d2 > 0) | (d3 > 0)
+    inside = ~(negative & positive)
+    for corner in (a, b, c):
+        inside &= (x != corner[0]) | (y != corner[1])
+    return inside
+
+
+def _ear_clip(ring):
+    """Triangulate a counter clockwise ring.
+
+    Only reflex vertices can be inside a candidate ear, so only they are
+    tested.  Clipping an ear can make a neighbouring reflex vertex convex, but
+    never the reverse.
+
+    Returns:
+        list[numpy.ndarray]: The (3, 2) triangles, or None if the ring could
+        not be triangulated.
+    """
+    count = len(ring)
+    if count < 3:
+        return []
+    previous = np.roll(np.arange(count), 1)
+    following = np.roll(np.arange(count), -1)
+    reflex = _reflex(ring)
+    reflex_points = ring[reflex]
+    triangles = []
+    vertex = 0
+    misses = 0
+    while count > 3:
+        before = previous[vertex]
+        after = following[vertex]
+        a, b, c = ring[before], ring[vertex], ring[after]
+        turn = _cross(a, b, c)
+        ear = turn == 0  # a collinear vertex is clipped without a triangle
+        if turn > 0:
+            ear = not _in_triangle(reflex_points, a, b, c).any()
+            if ear:
+                triangles.append(np.array([a, b, c]))
+        if ear:
+            following[before] = after
+            previous[after] = before
+            count -= 1
+            changed = reflex[vertex]
+            reflex[vertex] = False
+            for neighbor in (before, after):
+                if reflex[neighbor]:
+                    turn = _cross(
+                        ring[previous[neighbor]],
+                        ring[neighbor],
+                        ring[following[neighbor]],
+                    )
+                    if turn >= 0:
+                        reflex[neighbor] = False
+                        changed = True
+            if changed:
+                reflex_points = ring[reflex]
+            vertex = before
+            misses = 0
+        else:
+            vertex = after
+            misses += 1
+            if misses > count:
+                return None
+    last = [ring[previous[vertex]], ring[vertex], ring[following[vertex]]]
+    if _cross(*last) != 0:
+        triangles.append(np.array(last))
+    return triangles
+
+
+def circle_ring(radius, vertex_count=CIRCLE_VERTICES):
+    """Return a closed clockwise ring of a polygon around a circle at (0, 0).
+
+    The vertices are pushed out so the edges (not the vertices) touch the
+    circle; the polygon contains every point within radius of the center.
+
+    Returns:
+        numpy.ndarray: A (vertex_count + 1, 2) array of coordinates.
+    """
+    angles = -2 * math.pi * np.arange(vertex_count + 1) / vertex_count
+    vertex_radius = radius / math.cos(math.pi / vertex_count)
+    ring = vertex_radius * np.column_stack([np.cos(angles), np.sin(angles)])
+    ring[-1] = ring[0]
+    return ring
+
+
+def circles_wkb(x, y, ring):
+    """Return the well known binary of a polygon with a copy of ring at each (x, y).
+
+    Args:
+        x, y (sequence): The centers of the circles.
+        ring (numpy.ndarray): The ring for a circle at (0, 0), as returned by
+          `circle_ring()`.
+
+    Returns:
+        bytearray: A (little endian) Polygon if there is one center, otherwise a
+        MultiPolygon with one part per center.
+    """
+    # pylint: disable=invalid-name
+    ring = np.asarray(ring, dtype="<f8")
+    ring_header = struct.pack("<BIII", 1, 3, 1, len(ring))
+    polygons = [ring_header + (ring + (dx, dy)).tobytes() for dx, dy in zip(x, y)]
+    if len(polygons) == 1:
+        return bytearray(polygons[0])
+    return bytearray(struct.pack("<BII", 1, 6, len(polygons)) + b"".join(polygons))
+
+
+# The number of bits per axis in the space filling curve keys
+CURVE_BITS = 16
+
+
+def grid_cells(x, y, bits=CURVE_BITS):
+    """Return the cell of each point in a square grid of 2**bits cells per side.
+
+    The grid covers the extent of the points, with the same cell size on both
+    axes.
+
+    Returns:
+        tuple: (column, row) numpy.ndarray of uint64 cell numbers.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if not len(x):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+    size = max(x.max() - x.min(), y.max() - y.min())
+    scale = ((1 << bits) - 1) / size if size > 0 else 0.0
+    column = np.floor((x - x.min()) * scale + 0.5).astype(np.uint64)
+    row = np.floor((y - y.min()) * scale + 0.5).astype(np.uint64)
+    return column, row
+
+
+def _spread_bits(values):
+    """Insert a zero bit between each of the low 32 bits of values (uint64)."""
+    values = values & np.uint64(0x00000000FFFFFFFF)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_keys(x, y, bits=CURVE_BITS):
+    """Return the Morton (Z-order) curve key of each point.
+
+    Args:
+        x, y (sequence): The coordinates of the points.
+        bits (int, optional): The bits per axis (at most 32). Defaults to
+          `CURVE_BITS`.
+
+    Returns:
+        numpy.ndarray: A uint64 key for each point.
+    """
+    column, row = grid_cells(x, y, bits)
+    return _spread_bits(column) | (_spread_bits(row) << np.uint64(1))
+
+
+def hilbert_keys(x, y, bits=CURVE_BITS):
+    """Return the Hilbert curve key of each point.
+
+    Points that are close on the curve are close on the map, and unlike the
+    Morton curve, the curve has no long jumps.
+
+    Args:
+        x, y (sequence): The coordinates of the points.
+        bits (int, optional): The bits per axis (at most 31). Defaults to
+          `CURVE_BITS`.
+
+    Returns:
+        numpy.ndarray: A uint64 key for each point.
+    """
+    column, row = grid_cells(x, y, bits)
+    column = column.astype(np.int64)
+    row = row.astype(np.int64)
+    last = (1 << bits) - 1
+    keys = np.zeros(len(column), dtype=np.uint64)
+    step = 1 << (bits - 1)
+    while step > 0:
+        right = (column & step) > 0
+        upper = (row & step) > 0
+        quadrant = (3 * right) ^ upper
+        keys += np.uint64(step) * np.uint64(step) * quadrant.astype(np.uint64)
+        # Rotate the quadrant so the curve is continuous
+        rotate = ~upper
+        flip = rotate & right
+        column = np.where(flip, last - column, column)
+        row = np.where(flip, last - row, row)
+        column, row = np.where(rotate, row, column), np.where(rotate, column, row)
+        step >>= 1
+    return keys
+
+
+def reading_order_keys(x, y, row_height=None):
+    """Return keys that sort points in rows, top to bottom and left to right.
+
+    Args:
+        x, y (sequence): The coordinates of the points.
+        row_height (float, optional): The height of each row.  If None, the
+          extent is split into about sqrt(count) rows. Defaults to None.
+
+    Returns:
+        numpy.ndarray: An int64 key for each point.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    count = len(x)
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+    if row_height is None:
+        row_height = (y.max() - y.min()) / max(1, round(math.sqrt(count)))
+    if row_height > 0:
+        rows = np.floor((y.max() - y) / row_height).astype(np.int64)
+    else:
+        rows = np.zeros(count, dtype=np.int64)
+    columns = np.empty(count, dtype=np.int64)
+    columns[np.argsort(x, kind="mergesort")] = np.arange(count)
+    return rows * count + columns
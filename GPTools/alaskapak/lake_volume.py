@@ -22,6 +22,7 @@ else:
     from . import utils
 
 
+@utils.instrumented
 def lake_volume(shoreline, depth_points, depth_field_name, lakes, surface):
     """Creates a bottom surface and volume from a shoreline and depth_points.
 
@@ -49,17 +50,20 @@ def lake_volume(shoreline, depth_points, depth_field_name, lakes, surface):
 
     # Merge all the input depth points
     all_points = "in_memory\\depth"
-    arcpy.Merge_management(depth_points, all_points, "")
+    with utils.span("write"):
+        arcpy.Merge_management(depth_points, all_points, "")
 
-    # Copy the input to the output
-    arcpy.management.CopyFeatures(shoreline, lakes)
+        # Copy the input to the output
+        arcpy.management.CopyFeatures(shoreline, lakes)
 
     #Add a shoreline depth of zero to the output features
     # No need to test for a schema lock on an in_memory feature class
-    arcpy.AddField_management(lakes, shoreline_depth_field_name, "Double")
+    with utils.span("schema"):
+        arcpy.AddField_management(lakes, shoreline_depth_field_name, "Double")
     # The default expression type is Python3 for Pro and VB for 10.x
     # The expression "0" is valid in both those languages
-    arcpy.CalculateField_management(lakes, shoreline_depth_field_name, "0")
+    with utils.span("write"):
+        arcpy.CalculateField_management(lakes, shoreline_depth_field_name, "0")
 
     # Create a TIN of the lake bottom
     params = "{0} {1} masspoints;{2} {3} hardclip".format(
@@ -68,16 +72,18 @@ def lake_volume(shoreline, depth_points, depth_field_name, lakes, surface):
         lakes,
         shoreline_depth_field_name
     )
-    arcpy.CreateTin_3d(surface, "", params, "DELAUNAY",
-    )
+    with utils.span("geometry"):
+        arcpy.CreateTin_3d(surface, "", params, "DELAUNAY",
+        )
 
-    # Add the volume and surface area to the output
-    arcpy.PolygonVolume_3d(
-        surface, lakes, shoreline_depth_field_name, "ABOVE", volume_field_name, surface_area_field_name, "0"
-    )
+        # Add the volume and surface area to the output
+        arcpy.PolygonVolume_3d(
+            surface, lakes, shoreline_depth_field_name, "ABOVE", volume_field_name, surface_area_field_name, "0"
+        )
 
     # Remove the temporary field from the output
-    arcpy.DeleteField_management(lakes, shoreline_depth_field_name)
+    with utils.span("schema"):
+        arcpy.DeleteField_management(lakes, shoreline_depth_field_name)
 
 
 def parameter_fixer(args):
@@ -101,7 +107,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     arg_count = len(args)
@@ -16,10 +16,7 @@ if __name__ == "__main__":
     import utils
 else:
     # for use as a module and Python toolboxes (*.pyt)
-    # FIXME: the relative import breaks when called by square_building.py
-    #        so the python toolbox will now break.
-    # from . import utils
-    import utils
+    from . import utils
 
 
 def make_rect(pt1, pt2, width):
@@ -104,6 +101,8 @@ def make_rect_from_line(line, width):
     return arcpy.Polygon(arcpy.Array([pt1, pt2, pt3, pt4, pt1]))
 
 
+@utils.instrumented
+@utils.cached_schema
 def line_to_rectangle(line_feature, rect_feature, offset_field_name):
     """Creates rect_features by adding offset to line_features.
 
@@ -126,21 +125,22 @@ def line_to_rectangle(line_feature, rect_feature, offset_field_name):
 
     # workspace may be a feature dataset, that's ok
     workspace, feature_class = os.path.split(rect_feature)
-    arcpy.CreateFeatureclass_management(
-        workspace,
-        feature_class,
-        "Polygon",
-        line_feature,
-        "SAME_AS_TEMPLATE",
-        "SAME_AS_TEMPLATE",
-        line_feature
-    )
+    with utils.span("schema"):
+        arcpy.CreateFeatureclass_management(
+            workspace,
+            feature_class,
+            "Polygon",
+            line_feature,
+            "SAME_AS_TEMPLATE",
+            "SAME_AS_TEMPLATE",
+            line_feature
+        )
 
     # create a simple field mapping from input to output
     # Need to be a lists, dicts do not have a guaranteed ordering
     line_fields = ["SHAPE@", offset_field_name]
     rect_fields = ["SHAPE@", utils.valid_field_name(offset_field_name, rect_feature)]
-    for field in arcpy.ListFields(line_feature):
+    for field in utils.list_fields(line_feature):
         if (
             field.type not in ["OID", "GlobalID", "Geometry", "Blob", "Raster"]
             and field.name != offset_field_name
@@ -149,18 +149,28 @@ def line_to_rectangle(line_feature, rect_feature, offset_field_name):
             line_fields.append(field.name)
             rect_fields.append(utils.valid_field_name(field.name, rect_feature))
 
+    # The write span includes the reads and the geometry span
+    read = written = 0
     rect_cursor = arcpy.da.InsertCursor(rect_feature, rect_fields)
-    with arcpy.da.SearchCursor(line_feature, line_fields) as line_cursor:
+    with utils.span("write"), arcpy.da.SearchCursor(
+        line_feature, line_fields
+    ) as line_cursor:
         for row in line_cursor:
+            read += 1
             shape = row[0]
             offset = row[1]
             if shape:
-                rect = make_rect_from_line(shape, offset)
+                with utils.span("geometry"):
+                    rect = make_rect_from_line(shape, offset)
                 if rect:
                     # row is a tuple in arcpy.da
                     rect_row = (rect, offset) + row[2:]
                     rect_cursor.insertRow(rect_row)
+                    written += 1
     del rect_cursor
+    utils.count("rows_read", read)
+    utils.count("rows_written", written)
+    utils.count("rows_skipped", read - written)
 
 
 def parameter_fixer(args):
@@ -184,7 +194,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     arg_count = len(args)
@@ -196,7 +206,7 @@ def parameter_fixer(args):
     rect_feature = args[1]
     offset_field_name = args[2]
 
-    line_description = arcpy.Describe(line_feature)
+    line_description = utils.describe(line_feature)
 
     if line_description.shapeType != "Polyline":
         msg = "{0} is a {1} not Polyline feature class."
@@ -20,6 +20,7 @@ else:
     from . import utils
 
 
+@utils.instrumented
 def longest_axis(in_features, out_features, name="MaxAxis"):
     """out_features is a copy of in_features with a new double field called name
     with the value of the larger of the width or height of the bounding box"""
@@ -30,19 +31,26 @@ def longest_axis(in_features, out_features, name="MaxAxis"):
 
 def make_feature_class(in_features, out_features, name):
     """Copy the in_features to out_features and add double column `name`"""
-    arcpy.CopyFeatures_management(in_features, out_features)
+    with utils.span("write"):
+        arcpy.CopyFeatures_management(in_features, out_features)
     # No need to check for a schema lock since we just created `out_features`
-    arcpy.AddField_management(
-        out_features, name, "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", ""
-    )
+    with utils.span("schema"):
+        arcpy.AddField_management(
+            out_features, name, "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", ""
+        )
 
 
 def add_max_axis(feature_class, name):
     """Add the the max axis value to the column `name` in feature_class"""
-    with arcpy.da.UpdateCursor(feature_class, ["Shape@", name]) as cursor:
+    count = 0
+    with utils.span("write"), arcpy.da.UpdateCursor(
+        feature_class, ["Shape@", name]
+    ) as cursor:
         for row in cursor:
             row[1] = max_axis(row[0])
             cursor.updateRow(row)
+            count += 1
+    utils.count("rows_written", count)
 
 
 def max_axis(geom):
@@ -89,7 +97,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # TODO: Allow optional argument
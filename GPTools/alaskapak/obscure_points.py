@@ -5,18 +5,22 @@ Create random circles that contain sensitive points.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import hashlib
 import math
 import os
 import random
 import sys
 
 import arcpy
+import numpy as np
 
 if __name__ == "__main__":
     # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
+    import geometry
     import utils
 else:
     # for use as a module and Python toolboxes (*.pyt)
+    from . import geometry
     from . import utils
 
 
@@ -30,27 +34,64 @@ if sys.version_info[0] < 3:
 # use *_commandline() , *_testing() and toolbox_validation()
 # TODO: import utils and use message functions.
 
-
-def obscure_points(pts, circles, workspace, name, min, max, no_go, must_go):
-    """Create points or circles in workspace by obscuring the location of pts"""
+# How the distance from the source point to the random point is chosen.
+# "radius": uniform in distance (points are denser near the source point)
+# "area": uniform in area within the donut
+DISTRIBUTIONS = ["radius", "area"]
+
+# Constrained points try up to MAX_CANDIDATES random locations before falling
+# back to the (slow) overlay method.  Most points are placed with one of the
+# first few candidates, so candidates are tested in rounds of increasing size.
+FIRST_ROUND_CANDIDATES = 4
+MAX_CANDIDATES = 256
+# Limit the number of points tested at once to limit memory use
+POINTS_PER_BATCH = 65536
+# Multiplier for the part number in a point's random key (OID + part * PART_KEY);
+# keeps the keys of single points equal to their OID.
+PART_KEY = 2**32
+
+
+@utils.instrumented
+@utils.cached_schema
+def obscure_points(
+    pts,
+    circles,
+    workspace,
+    name,
+    min,
+    max,
+    no_go,
+    must_go,
+    seed=None,
+    distribution="radius",
+):
+    """Create points or circles in workspace by obscuring the location of pts
+
+    Runs with the same input and `seed` create the same output.  If `seed`
+    is None, a new random seed is used.  `distribution` is one of
+    DISTRIBUTIONS; it is ignored with no_go or must_go areas, where the new
+    point is always uniformly distributed in the allowed area.
+    """
 
     # pylint: disable=too-many-arguments
 
+    seed = utils.new_seed(seed)
+    if circles:
+        out_features = os.path.join(workspace, name)
+        stream_circles(pts, out_features, min, max, no_go, must_go, seed, distribution)
+        return
     new_feature_class = None
     if no_go or must_go:
-        # TODO: Check for Advanced Licence; required for both functions.
-        if circles:
-            new_feature_class = create_limited_circles(pts, min, max, no_go, must_go)
-        else:
-            new_feature_class = create_limited_points(pts, min, max, no_go, must_go)
+        # TODO: Check for Advanced Licence; required for the overlay fallback.
+        new_feature_class = create_limited_points(pts, min, max, no_go, must_go, seed)
     else:
-        if circles:
-            new_feature_class = create_circles(pts, min, max)
-        else:
-            new_feature_class = create_points(pts, min, max)
+        new_feature_class = create_points(pts, min, max, seed, distribution)
     if new_feature_class:
-        arcpy.FeatureClassToFeatureClass_conversion(new_feature_class, workspace, name)
-        arcpy.Delete_management(new_feature_class)
+        with utils.span("write"):
+            arcpy.FeatureClassToFeatureClass_conversion(
+                new_feature_class, workspace, name
+            )
+            arcpy.Delete_management(new_feature_class)
         del new_feature_class
 
 
@@ -75,53 +116,49 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-locals,too-many-branches,too-many-statements
 
-    if not len(args) == 7:
+    if len(args) < 7 or len(args) > 9:
         usage = (
             "Usage: {0} sensitive_points obscured_features [output_shape] "
             " [minimum_offset], [maximum_offset], [no_go_areas], [must_go_areas]"
+            " [seed] [distribution]"
         )
         utils.die(usage.format(sys.argv[0]))
 
     # FIXME: Handle missing optionals
-    (in_features, out_features, type, min, max, no_go, must_go) = args
+    (in_features, out_features, type, min, max, no_go, must_go) = args[:7]
+    seed = args[7] if len(args) > 7 else "#"
+    distribution = args[8] if len(args) > 8 else "#"
 
     # validate input feature class
     if in_features in ["", "#"]:
-        arcpy.AddError("No input feature class specified.")
-        sys.exit()
-    if not arcpy.Exists(in_features):
+        utils.die("No input feature class specified.")
+    if not utils.exists(in_features):
         msg = "The input feature specified ({0}) does not exist."
-        arcpy.AddError(msg.format(in_features))
-        sys.exit()
-    desc = arcpy.Describe(in_features)
+        utils.die(msg.format(in_features))
+    desc = utils.describe(in_features)
     shape = desc.shapeType.lower()
     if shape not in ["point", "multipoint"]:
         msg = "The input feature specified ({0}) is not a point or multipoint."
-        arcpy.AddError(msg.format(in_features))
-        sys.exit()
-    multi = shape == "multipoint"
+        utils.die(msg.format(in_features))
 
     # validate output feature class
     if out_features in ["", "#"]:
-        arcpy.AddError("No output feature class specified.")
-        sys.exit()
+        utils.die("No output feature class specified.")
     workspace, name = os.path.split(out_features)
     if not arcpy.Exists(workspace):
         msg = "The output workspace specified ({0}) does not exist."
-        arcpy.AddError(msg.format(workspace))
-        sys.exit()
+        utils.die(msg.format(workspace))
     name = arcpy.ValidateTableName(name, workspace)
     feature_class = os.path.join(workspace, name)
     if arcpy.Exists(feature_class):
         if not arcpy.env.overwriteOutput:
             msg = "Cannot overwrite existing data at: {0}"
-            arcpy.AddError(msg.format(feature_class))
-            sys.exit()
+            utils.die(msg.format(feature_class))
     # no easy way to check that feature_class is not readonly or locked, so don't
 
     # validate output type
@@ -133,8 +170,7 @@ def parameter_fixer(args):
             type = potential
     if type not in choices:
         msg = "The output type specified ({0}) is not in {1}."
-        arcpy.AddError(msg.format(type, choices))
-        sys.exit()
+        utils.die(msg.format(type, choices))
     circles = type == "circles"
 
     # validate min/max
@@ -147,28 +183,22 @@ def parameter_fixer(args):
     try:
         min = float(min)
     except ValueError:
-        arcpy.AddError("The minimum offset ({0}) is not a number.".format(min))
-        sys.exit()
+        utils.die("The minimum offset ({0}) is not a number.".format(min))
     try:
         max = float(max)
     except ValueError:
-        arcpy.AddError("The maximum offset ({0}) is not a number.".format(max))
-        sys.exit()
+        utils.die("The maximum offset ({0}) is not a number.".format(max))
     if min < 0:
         msg = "The minimum offset specified ({0}) is not greater than zero."
-        arcpy.AddError(msg.format(min))
-
-        sys.exit()
+        utils.die(msg.format(min))
     if max < min:
         msg = (
             "The maximum offset specified ({0}) is not greater than the minimum offset."
         )
-        arcpy.AddError(msg.format(max))
-        sys.exit()
+        utils.die(msg.format(max))
     if max == 0:
         msg = "The maximum offset specified ({0}) is not greater than zero."
-        arcpy.AddError(msg.format(max))
-        sys.exit()
+        utils.die(msg.format(max))
 
     # validate no_go
     no_go = no_go.split(";")
@@ -178,12 +208,12 @@ def parameter_fixer(args):
     no_go = list(set(no_go))  # removes redundant feature classes
     removelist = []
     for feature_class in no_go:
-        if not arcpy.Exists(feature_class):
+        if not utils.exists(feature_class):
             msg = "'No-Go' feature class ({0}) could not be found - skipping."
             arcpy.AddMessage(msg.format(feature_class))
             removelist.append(feature_class)
             continue
-        desc = arcpy.Describe(feature_class)
+        desc = utils.describe(feature_class)
         shape = desc.shapeType.lower()
         if shape not in ["polygon"]:
             msg = "'No-Go' feature class ({0}) is not polygons - skipping."
@@ -200,12 +230,12 @@ def parameter_fixer(args):
     must_go = list(set(must_go))  # removes redundant feature classes
     removelist = []
     for feature_class in must_go:
-        if not arcpy.Exists(feature_class):
+        if not utils.exists(feature_class):
             msg = "'Must-Go' feature class ({0}) could not be found - skipping."
             arcpy.AddMessage(msg.format(feature_class))
             removelist.append(feature_class)
             continue
-        desc = arcpy.Describe(feature_class)
+        desc = utils.describe(feature_class)
         shape = desc.shapeType.lower()
         if shape not in ["polygon"]:
             msg = "'Must-Go' feature class ({0}) is not polygons - skipping."
@@ -214,28 +244,363 @@ def parameter_fixer(args):
     for feature_class in removelist:
         must_go.remove(feature_class)
 
-    if (no_go or must_go) and multi:
-        # Not supported because random point in polygon will only put 1
-        # point in a multipart polygon
-        msg = "Cannot use multipoint input when No-Go or Must-Go areas are specified."
-        arcpy.AddError(msg)
-        sys.exit()
+    # validate seed
+    if seed in ["", "#"]:
+        seed = None
+    else:
+        try:
+            seed = int(seed)
+        except ValueError:
+            utils.die("The random seed ({0}) is not a whole number.".format(seed))
+        if seed < 0:
+            utils.die("The random seed ({0}) is less than zero.".format(seed))
+
+    # validate distribution
+    if distribution in ["", "#"]:
+        distribution = "radius"
+    distribution = distribution.lower()
+    if distribution not in DISTRIBUTIONS:
+        msg = "The offset distribution specified ({0}) is not in {1}."
+        utils.die(msg.format(distribution, DISTRIBUTIONS))
 
     arcpy.AddMessage("Input has been validated.")
-    # print(in_features, circles, workspace, name, min, max, no_go, must_go)
-    return in_features, circles, workspace, name, min, max, no_go, must_go
+    # print(in_features, circles, workspace, name, min, max, no_go, must_go,
+    # seed, distribution)
+    return (
+        in_features,
+        circles,
+        workspace,
+        name,
+        min,
+        max,
+        no_go,
+        must_go,
+        seed,
+        distribution,
+    )
 
 
-def create_limited_points(pts, min, max, no_go, must_go):
+def create_limited_points(pts, min, max, no_go, must_go, seed=None, merge=True):
     """Create randomized points, considering the constraints
 
+    See `limited_locations()` for how the new locations are chosen.
+    Points with no allowed area at all are removed with a warning.
+    The locations are keyed on the OIDs of pts, so `stream_circles()` puts
+    its circles around the same points.
+    If merge is True, the no-go and must-go feature classes are each
+    combined into a single cached layer (see `merged_constraints()`).
+    Returns a feature class called "in_memory\\temp". The caller
+    is responsible for deleting this feature class when they are done."""
+
+    # pylint: disable=too-many-arguments
+
+    seed = utils.new_seed(seed)
+    locations = limited_locations(pts, min, max, no_go, must_go, seed, merge)
+    return moved_points(pts, locations)
+
+
+def limited_locations(pts, min, max, no_go, must_go, seed, merge=True):
+    """Return a dictionary of new (x, y) locations keyed by (OID, part).
+
+    Random candidate locations (uniformly distributed by area in the donut
+    around each point) are tested against a grid index of the no-go and
+    must-go polygons, and each point is moved to its first allowed candidate.
+    Each point in a multipoint is constrained on its own.
+    A point with no allowed candidate after MAX_CANDIDATES tries has very
+    little allowed area, so it is placed with the `overlay_points()` method.
+    Points with no allowed area at all are not in the dictionary; a warning
+    reports how many there are."""
+
+    # pylint: disable=too-many-arguments,too-many-locals
+
+    if merge:
+        no_go = merged_constraints(no_go, "NoGo")
+        must_go = merged_constraints(must_go, "MustGo")
+    spatial_reference = utils.describe(pts).spatialReference
+    no_go_index = read_polygons(no_go, spatial_reference, max)
+    must_go_index = read_polygons(must_go, spatial_reference, max) if must_go else None
+
+    # One row per point; the points in a multipoint share an OID.
+    with utils.span("read"):
+        data = arcpy.da.FeatureClassToNumPyArray(
+            pts, ["OID@", "SHAPE@X", "SHAPE@Y"], skip_nulls=True, explode_to_points=True
+        )
+    oids = data["OID@"]
+    parts = part_numbers(oids)
+    with utils.span("geometry"):
+        x, y, placed = sample_allowed_points(
+            data["SHAPE@X"],
+            data["SHAPE@Y"],
+            min,
+            max,
+            seed,
+            oids.astype(np.int64) + parts * PART_KEY,
+            no_go_index,
+            must_go_index,
+        )
+    keys = zip(oids[placed].tolist(), parts[placed].tolist())
+    locations = dict(zip(keys, zip(x[placed], y[placed])))
+    if not placed.all():
+        msg = "Using overlays for {0} points with little allowed area."
+        utils.info(msg.format(len(placed) - placed.sum()))
+        unplaced = ~placed
+        locations.update(
+            overlay_locations(
+                oids[unplaced],
+                parts[unplaced],
+                data["SHAPE@X"][unplaced],
+                data["SHAPE@Y"][unplaced],
+                spatial_reference,
+                min,
+                max,
+                no_go,
+                must_go,
+                seed,
+            )
+        )
+    removed = len(oids) - len(locations)
+    if removed:
+        msg = "{0} points had no allowed location and were removed."
+        utils.warn(msg.format(removed))
+    return locations
+
+
+def part_numbers(oids):
+    """Return the position of each point within its feature.
+
+    oids is the OID of each point, with the points of a feature adjacent
+    (as returned by FeatureClassToNumPyArray with explode_to_points).
+    """
+    if not len(oids):
+        return np.zeros(0, dtype=np.int64)
+    index = np.arange(len(oids))
+    first = np.ones(len(oids), dtype=bool)
+    first[1:] = oids[1:] != oids[:-1]
+    return index - np.maximum.accumulate(np.where(first, index, 0))
+
+
+def merged_constraints(feature_classes, label):
+    """Return a list with one feature class of all the polygons in feature_classes.
+
+    The polygons are merged and dissolved (into single part polygons, which
+    index better than one large multipart polygon) in the scratch geodatabase.
+    The result is cached under a name derived from the inputs (see
+    `constraints_key()`), so later runs with the same unchanged constraints
+    reuse it; the cached result for other constraints is deleted.
+    Constraints that can not be checked for changes (layers and data in an
+    enterprise geodatabase) are returned unchanged, as is an empty list.
+    """
+    if not feature_classes:
+        return feature_classes
+    key = constraints_key(feature_classes)
+    if key is None:
+        return feature_classes
+    workspace = arcpy.env.scratchGDB
+    prefix = "Obscure{0}_".format(label)
+    merged = os.path.join(workspace, prefix + key)
+    if arcpy.Exists(merged):
+        utils.info("Using cached {0} areas {1}".format(label, merged))
+        return [merged]
+    delete_feature_classes(workspace, prefix + "*")
+    temp = arcpy.Merge_management(feature_classes, "in_memory\\merged")
+    try:
+        arcpy.Dissolve_management(temp, merged, multi_part="SINGLE_PART")
+    finally:
+        arcpy.Delete_management(temp)
+    return [merged]
+
+
+def constraints_key(feature_classes):
+    """Return a key that changes when the data in feature_classes changes.
+
+    The key is made from the path, modification time, feature count and
+    extent of each feature class.  None is returned if any of the feature
+    classes is a layer (which may have a selection or definition query) or
+    is not in a folder or local geodatabase (the file of an enterprise
+    geodatabase connection does not change when the data does).
+    """
+    key = hashlib.md5()
+    for feature_class in sorted(feature_classes):
+        desc = utils.describe(feature_class)
+        if desc.dataType not in ["FeatureClass", "ShapeFile"]:
+            return None
+        path = desc.catalogPath
+        database = utils.describe(utils.get_database(path))
+        if getattr(database, "workspaceType", None) not in [
+            "FileSystem",
+            "LocalDatabase",
+        ]:
+            return None
+        count = arcpy.GetCount_management(path).getOutput(0)
+        extent = desc.extent
+        data = "{0}|{1}|{2}|{3} {4} {5} {6}|".format(
+            path,
+            modified_time(path),
+            count,
+            extent.XMin,
+            extent.YMin,
+            extent.XMax,
+            extent.YMax,
+        )
+        key.update(data.encode("utf-8"))
+    return key.hexdigest()[:16]
+
+
+def delete_feature_classes(workspace, wild_card):
+    """Delete the feature classes in workspace with names matching wild_card."""
+    saved_workspace = arcpy.env.workspace
+    arcpy.env.workspace = workspace
+    try:
+        names = arcpy.ListFeatureClasses(wild_card) or []
+    finally:
+        arcpy.env.workspace = saved_workspace
+    for name in names:
+        arcpy.Delete_management(os.path.join(workspace, name))
+
+
+def modified_time(path):
+    """Return the last time the data at path (or its container) was changed.
+
+    Data in a folder or geodatabase is not always a file (e.g. a feature class
+    in a file geodatabase), so the newest file in the nearest enclosing folder
+    is used; this may report a change when only other data has changed.
+    """
+    path = os.path.abspath(path)
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return 0
+        path = parent
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    times = [os.path.getmtime(path)]
+    for name in os.listdir(path):
+        child = os.path.join(path, name)
+        if os.path.isfile(child):
+            times.append(os.path.getmtime(child))
+    return max(times)
+
+
+def read_polygons(feature_classes, spatial_reference, cell_size):
+    """Return a geometry.PolygonIndex of the polygons in feature_classes.
+
+    The polygons are projected to spatial_reference as they are read.
+    """
+    index = geometry.PolygonIndex(cell_size)
+    for feature_class in feature_classes:
+        with utils.span("read"), arcpy.da.SearchCursor(
+            feature_class, ["SHAPE@"], spatial_reference=spatial_reference
+        ) as cursor:
+            for (shape,) in cursor:
+                if shape is not None:
+                    index.insert(geometry.polygon_rings(shape))
+    return index
+
+
+def sample_allowed_points(
+    x, y, min_radius, max_radius, seed, keys, no_go, must_go=None
+):
+    """Move each point to a random allowed location in the surrounding donut.
+
+    Candidate k for a point uses the numbers at positions 2k and 2k+1 in the
+    point's random stream, so a point's location does not depend on the
+    other points.
+
+    Args:
+        x, y (numpy.ndarray): The coordinates of the source points.
+        min_radius, max_radius (double): The range of distances to move.
+        seed (int): The seed for the random numbers.
+        keys (numpy.ndarray): A unique integer key for each point (e.g. OID).
+        no_go (geometry.PolygonIndex): Areas where a point may not go.
+        must_go (geometry.PolygonIndex): Areas where a point must go, or None.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray, numpy.ndarray): The new x and y
+        coordinates, and a boolean array that is False where no allowed
+        location was found (those points are not moved).
+    """
+    # pylint: disable=invalid-name,too-many-arguments,too-many-locals
+    new_x = np.array(x, dtype=float)
+    new_y = np.array(y, dtype=float)
+    placed = np.zeros(len(new_x), dtype=bool)
+    for start in range(0, len(new_x), POINTS_PER_BATCH):
+        remaining = np.arange(start, min(start + POINTS_PER_BATCH, len(new_x)))
+        first = 0
+        size = FIRST_ROUND_CANDIDATES
+        while first < MAX_CANDIDATES and len(remaining):
+            size = min(size, MAX_CANDIDATES - first)
+            candidates = [
+                randomize_points(
+                    x[remaining],
+                    y[remaining],
+                    min_radius,
+                    max_radius,
+                    seed,
+                    keys[remaining],
+                    "area",
+                    2 * k,
+                )
+                for k in range(first, first + size)
+            ]
+            first += size
+            size *= 2
+            cx = np.column_stack([candidate[0] for candidate in candidates])
+            cy = np.column_stack([candidate[1] for candidate in candidates])
+            allowed = ~no_go.contains_points(cx.ravel(), cy.ravel())
+            if must_go is not None:
+                allowed &= must_go.contains_points(cx.ravel(), cy.ravel())
+            allowed = allowed.reshape(cx.shape)
+            found = allowed.any(axis=1)
+            choice = np.argmax(allowed, axis=1)[found]
+            done = remaining[found]
+            new_x[done] = cx[found, choice]
+            new_y[done] = cy[found, choice]
+            placed[done] = True
+            remaining = remaining[~found]
+    return new_x, new_y, placed
+
+
+def overlay_locations(
+    oids, parts, x, y, spatial_reference, min, max, no_go, must_go, seed
+):
+    """Return a dictionary of new (x, y) locations keyed by (OID, part), for
+    the points at x, y, using `overlay_points()`.
+    Points with no allowed area are not in the dictionary."""
+
+    # pylint: disable=invalid-name,too-many-arguments,too-many-locals
+
+    source = arcpy.CreateFeatureclass_management(
+        "in_memory", "overlay_source", "POINT", spatial_reference=spatial_reference
+    )
+    arcpy.AddField_management(source, "SourceOID", "LONG")
+    arcpy.AddField_management(source, "SourcePart", "LONG")
+    fields = ["SHAPE@XY", "SourceOID", "SourcePart"]
+    with arcpy.da.InsertCursor(source, fields) as cursor:
+        for row in zip(zip(x.tolist(), y.tolist()), oids.tolist(), parts.tolist()):
+            cursor.insertRow(row)
+    overlay = overlay_points(source, min, max, no_go, must_go, seed)
+    fields = ["SourceOID", "SourcePart", "SHAPE@XY"]
+    with arcpy.da.SearchCursor(overlay, fields) as cursor:
+        locations = dict(((oid, part), xy) for oid, part, xy in cursor)
+    arcpy.Delete_management(overlay)
+    arcpy.Delete_management(source)
+    return locations
+
+
+def overlay_points(pts, min, max, no_go, must_go, seed=None):
+    """Create randomized points, considering the constraints, with overlays
+
     It is very slow to create a random point, then check it against
     a no-go area.  The New strategy is:
     buffer each input point with the max offset
     erase with a buffer of each point with min offset (if not 0)
     erase with each polygon in no go
     if any polygon has area < 0 issue warning
-    put 1 random point in this area."""
+    put 1 random point in this area.
+
+    CreateRandomPoints uses the arcpy random generator, so `seed` makes the
+    output repeatable for the same input, but (unlike the other tools) a
+    feature's location depends on the other features in the input."""
 
     allowed = arcpy.Buffer_analysis(pts, "in_memory\\allow", max)
     if min > 0:
@@ -263,9 +628,15 @@ def create_limited_points(pts, min, max, no_go, must_go):
         allowed = new_allowed
 
     # requires Advanced (ArcInfo) license or Spatial Analyst or 3d Analyst
-    newpts = arcpy.CreateRandomPoints_management(
-        "in_memory", "pts", allowed, "", 1, "", "POINT", ""
-    )
+    random_generator = arcpy.env.randomGenerator
+    if seed is not None:
+        arcpy.env.randomGenerator = "{0} ACM599".format(seed)
+    try:
+        newpts = arcpy.CreateRandomPoints_management(
+            "in_memory", "pts", allowed, "", 1, "", "POINT", ""
+        )
+    finally:
+        arcpy.env.randomGenerator = random_generator
 
     # CID is an attribute created by CreateRandomPoints to tie back to source
     desc = arcpy.Describe(allowed)
@@ -276,52 +647,262 @@ def create_limited_points(pts, min, max, no_go, must_go):
     return newpts
 
 
-def create_limited_circles(pts, min, max, no_go, must_go):
+def create_limited_circles(pts, min, max, no_go, must_go, seed=None, merge=True):
     """returns a polygon feature class called "in_memory\\circles". The
     caller is responsible for deleting this feature class when they are
-    done. See create_points for more information."""
-    newpts = create_limited_points(pts, min, max, no_go, must_go)
+    done. See create_limited_points for more information."""
+
+    # pylint: disable=too-many-arguments
+
+    newpts = create_limited_points(pts, min, max, no_go, must_go, seed, merge)
     circles = arcpy.Buffer_analysis(newpts, "in_memory\\circles", max)
     arcpy.Delete_management(newpts)
     del newpts
     return circles
 
 
-def create_points(existing, min_offset, max_offset):
+def create_points(existing, min_offset, max_offset, seed=None, distribution="radius"):
     """existing is a point or multipoint feature class
-    if a multipoint feature class, the centroid is used as the basis for the new point.
+    if a multipoint feature class, each point is moved on its own.
     min = minimum distance of random point from source point in (0,max_offset)
     max_offset = maximum distance of random point from source point in (min,..)
+    seed = the seed for the random offsets; each point's offset depends only
+    on the seed and the point's OID and part (not on the processing order).
+    distribution = how the offset distance is chosen; one of DISTRIBUTIONS.
     returns a feature class called "in_memory\temp". The caller
-    is responsible for deleting this feature class when they are done."""
+    is responsible for deleting this feature class when they are done.
+
+    The new locations are calculated at once with NumPy (see
+    `offset_locations()`), keyed on the OID and part of each point in
+    existing, and then written to the copy in one pass (see `moved_points()`)."""
+
+    seed = utils.new_seed(seed)
+    locations = offset_locations(existing, min_offset, max_offset, seed, distribution)
+    return moved_points(existing, locations)
+
+
+def moved_points(pts, locations):
+    """Return a copy of pts called "in_memory\\temp", with the points moved.
+
+    locations is a dictionary of new (x, y) locations keyed by (OID, part)
+    of the features in pts (see `offset_locations()`).  A point with no new
+    location is left out, and so is a feature with no points left; features
+    with no shape are copied as is.  The caller is responsible for deleting
+    this feature class when they are done."""
 
     # pylint: disable=invalid-name
-    # I like x, y even if they are too short
 
-    newpts = arcpy.FeatureClassToFeatureClass_conversion(existing, "in_memory", "temp")
-    with arcpy.da.UpdateCursor(newpts, ["SHAPE@XY"]) as cursor:
-        for row in cursor:
-            x, y = row[0]
-            row[0] = randomize_point(x, y, min_offset, max_offset)
-            cursor.updateRow(row)
+    desc = utils.describe(pts)
+    multipoint = desc.shapeType.lower() == "multipoint"
+    points = {}
+    for (oid, _), location in sorted(locations.items()):
+        points.setdefault(oid, []).append(location)
+
+    newpts = "in_memory\\temp"
+    with utils.span("schema"):
+        arcpy.CreateFeatureclass_management(
+            "in_memory",
+            "temp",
+            desc.shapeType.upper(),
+            pts,
+            spatial_reference=desc.spatialReference,
+        )
+    in_fields, out_fields = matching_fields(pts, newpts)
+
+    shape_field = "SHAPE@" if multipoint else "SHAPE@XY"
+    read = written = 0
+    with utils.span("write"), arcpy.da.SearchCursor(
+        pts, ["OID@", "SHAPE@XY"] + in_fields
+    ) as search:
+        with arcpy.da.InsertCursor(newpts, [shape_field] + out_fields) as insert:
+            for row in search:
+                read += 1
+                shape = None
+                if row[1] is not None:
+                    xys = points.get(row[0])
+                    if not xys:
+                        continue
+                    if multipoint:
+                        array = arcpy.Array([arcpy.Point(x, y) for x, y in xys])
+                        shape = arcpy.Multipoint(array, desc.spatialReference)
+                    else:
+                        shape = xys[0]
+                insert.insertRow((shape,) + row[2:])
+                written += 1
+    utils.count("rows_read", read)
+    utils.count("rows_written", written)
+    utils.count("rows_skipped", read - written)
     return newpts
 
 
-def create_circles(existing, min_offset, max_offset):
+def matching_fields(source, target):
+    """Return the editable attribute fields of source that are also in target.
+
+    Returns:
+        (list[text], list[text]): The names of the fields in source, and the
+        names of the same fields in target.
+    """
+    source_fields = dict(
+        (field.name.lower(), field.name)
+        for field in utils.list_fields(source)
+        if field.editable and field.type not in ["OID", "Geometry"]
+    )
+    target_fields = [
+        field.name
+        for field in arcpy.ListFields(target)
+        if field.editable
+        and field.type not in ["OID", "Geometry"]
+        and field.name.lower() in source_fields
+    ]
+    return [source_fields[field.lower()] for field in target_fields], target_fields
+
+
+def create_circles(existing, min_offset, max_offset, seed=None, distribution="radius"):
     """returns a polygon feature class called "in_memory\\circles". The
     caller is responsible for deleting this feature class when they are
     done. See create_points for more information."""
-    newpts = create_points(existing, min_offset, max_offset)
-    circles = arcpy.Buffer_analysis(newpts, "in_memory\\circles", max_offset)
+    newpts = create_points(existing, min_offset, max_offset, seed, distribution)
+    with utils.span("geometry"):
+        circles = arcpy.Buffer_analysis(newpts, "in_memory\\circles", max_offset)
     arcpy.Delete_management(newpts)
     del newpts
     return circles
 
 
-def randomize_geometry(geom, min_offset, max_offset):
+def stream_circles(
+    pts,
+    out_features,
+    min,
+    max,
+    no_go,
+    must_go,
+    seed=None,
+    distribution="radius",
+    merge=True,
+):
+    """Write the circles that obscure pts directly to out_features.
+
+    The new center of each point is calculated as in `create_points()` (or
+    `limited_locations()` if there are no_go or must_go areas), and a circle
+    polygon with radius max around it is inserted in the output along with
+    the attributes of the source feature.  Unlike `create_circles()`, there
+    are no intermediate feature classes.  A multipoint gets one circle per
+    point.  out_features must not exist (or arcpy.env.overwriteOutput must
+    be True).
+    """
+
+    # pylint: disable=too-many-arguments,too-many-locals
+
+    seed = utils.new_seed(seed)
+    if no_go or must_go:
+        locations = limited_locations(pts, min, max, no_go, must_go, seed, merge)
+    else:
+        locations = offset_locations(pts, min, max, seed, distribution)
+    centers = {}
+    for (oid, _), location in sorted(locations.items()):
+        centers.setdefault(oid, []).append(location)
+
+    desc = utils.describe(pts)
+    workspace, name = os.path.split(out_features)
+    with utils.span("schema"):
+        arcpy.CreateFeatureclass_management(
+            workspace, name, "POLYGON", pts, spatial_reference=desc.spatialReference
+        )
+    in_fields, out_fields = matching_fields(pts, out_features)
+
+    # The write span includes the reads and the geometry span
+    ring = geometry.circle_ring(max)
+    read = written = 0
+    with utils.span("write"), arcpy.da.SearchCursor(
+        pts, ["OID@"] + in_fields
+    ) as search:
+        with arcpy.da.InsertCursor(out_features, ["SHAPE@WKB"] + out_fields) as insert:
+            for row in search:
+                read += 1
+                points = centers.get(row[0])
+                if points:
+                    x, y = zip(*points)
+                    with utils.span("geometry"):
+                        wkb = geometry.circles_wkb(x, y, ring)
+                    insert.insertRow((wkb,) + row[1:])
+                    written += 1
+    utils.count("rows_read", read)
+    utils.count("rows_written", written)
+    utils.count("rows_skipped", read - written)
+
+
+def offset_locations(pts, min_offset, max_offset, seed, distribution="radius"):
+    """Return a dictionary of new (x, y) locations keyed by (OID, part).
+
+    Each point is moved (as in `create_points()`) by a random offset keyed
+    on its OID and part (see PART_KEY); each point in a multipoint moves on
+    its own, as if the feature class was individual points."""
+
+    # pylint: disable=invalid-name
+
+    # One row per point; the points in a multipoint share an OID.
+    with utils.span("read"):
+        data = arcpy.da.FeatureClassToNumPyArray(
+            pts, ["OID@", "SHAPE@X", "SHAPE@Y"], skip_nulls=True, explode_to_points=True
+        )
+    oids = data["OID@"]
+    parts = part_numbers(oids)
+    with utils.span("geometry"):
+        x, y = randomize_points(
+            data["SHAPE@X"],
+            data["SHAPE@Y"],
+            min_offset,
+            max_offset,
+            seed,
+            oids.astype(np.int64) + parts * PART_KEY,
+            distribution,
+        )
+    keys = zip(oids.tolist(), parts.tolist())
+    return dict(zip(keys, zip(x, y)))
+
+
+def randomize_points(
+    x, y, min_radius, max_radius, seed, keys, distribution="radius", counter=0
+):
+    """Return new coordinate arrays, each somewhere in the donut surrounding (x,y)
+
+    The vectorized version of `randomize_point()`.  For the same seed and key,
+    the new location is the same as randomize_point() with a
+    utils.RandomStream(seed, key) (when counter is 0).
+
+    Args:
+        x, y (numpy.ndarray): The coordinates of the source points.
+        min_radius, max_radius (double): The range of distances to move.
+        seed (int): The seed for the random numbers.
+        keys (numpy.ndarray): A unique integer key for each point (e.g. OID).
+        distribution (text): How the distance is chosen; see DISTRIBUTIONS.
+        counter (int): The position of the first of the two random numbers
+          used from each point's stream.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): The new x and y coordinates.
+    """
+    # pylint: disable=invalid-name,too-many-arguments
+    fraction = utils.keyed_random_array(seed, keys, counter)
+    radius = _radius(fraction, min_radius, max_radius, distribution)
+    phi = 2 * math.pi * utils.keyed_random_array(seed, keys, counter + 1)
+    return x + radius * np.cos(phi), y + radius * np.sin(phi)
+
+
+def _radius(fraction, min_radius, max_radius, distribution):
+    """Convert a uniform fraction in [0, 1) to a distance between min_radius
+    and max_radius.  Works with floats or NumPy arrays."""
+    if distribution == "area":
+        # The area inside radius r grows with r**2, so choose r**2 uniformly
+        return np.sqrt(min_radius**2 + fraction * (max_radius**2 - min_radius**2))
+    return min_radius + fraction * (max_radius - min_radius)
+
+
+def randomize_geometry(geom, min_offset, max_offset, rng=random):
     """returns None, new pointGeometry or new multipoint
     depending on the input geometry.  Each new point is
-    between min and max distance away from the input point"""
+    between min and max distance away from the input point.
+    rng is the source of random numbers (e.g. a utils.RandomStream)"""
 
     # pylint: disable=invalid-name
     # I like x, y even if they are too short
@@ -332,25 +913,29 @@ def randomize_geometry(geom, min_offset, max_offset):
 
     if part_count == 1:
         pnt = geom.getPart(0)
-        x, y = randomize_point(pnt.X, pnt.Y, min_offset, max_offset)
+        x, y = randomize_point(pnt.X, pnt.Y, min_offset, max_offset, rng)
         return arcpy.PointGeometry(arcpy.Point(x, y))
 
     points = arcpy.Array()
     for part_index in range(part_count):
         pnt = geom.getPart(part_index)
-        x, y = randomize_point(pnt.X, pnt.Y, min_offset, max_offset)
+        x, y = randomize_point(pnt.X, pnt.Y, min_offset, max_offset, rng)
         points.append(arcpy.Point(x, y))
     return arcpy.Multipoint(points)
 
 
-def randomize_point(x, y, min_radius, max_radius):
-    """Return a coordinate somewhere in the donut surrounding (x,y)"""
+def randomize_point(x, y, min_radius, max_radius, rng=random, distribution="radius"):
+    """Return a coordinate somewhere in the donut surrounding (x,y)
 
-    # pylint: disable=invalid-name
+    rng is the source of random numbers; anything with a random() method
+    like the random module (the default) or a utils.RandomStream.
+    distribution is how the distance is chosen; one of DISTRIBUTIONS."""
+
+    # pylint: disable=invalid-name,too-many-arguments
     # I like x, y, x2, and y2 even if they are too short
 
-    radius = random.uniform(min_radius, max_radius)
-    phi = random.uniform(0, 2 * math.pi)
+    radius = float(_radius(rng.random(), min_radius, max_radius, distribution))
+    phi = 2 * math.pi * rng.random()
     x2 = x + radius * math.cos(phi)
     y2 = y + radius * math.sin(phi)
     return (x2, y2)
@@ -17,6 +17,7 @@ else:
     from . import utils
 
 
+@utils.instrumented
 def points_to_polygons(
     point_feature_class, polygon_feature_class, polygon_id_fieldname, sort_field_name
 ):
@@ -24,14 +25,15 @@ def points_to_polygons(
     # TODO: Document parameters in the doc string
 
     lines = "in_memory\\lines"
-    # Points To Lines (Basic License)
-    arcpy.PointsToLine_management(
-        point_feature_class, lines, polygon_id_fieldname, sort_field_name, "CLOSE"
-    )
-    # Lines To Polygon (Advanced License)
-    arcpy.FeatureToPolygon_management(
-        lines, polygon_feature_class, "", "ATTRIBUTES", ""
-    )
+    with utils.span("geometry"):
+        # Points To Lines (Basic License)
+        arcpy.PointsToLine_management(
+            point_feature_class, lines, polygon_id_fieldname, sort_field_name, "CLOSE"
+        )
+        # Lines To Polygon (Advanced License)
+        arcpy.FeatureToPolygon_management(
+            lines, polygon_feature_class, "", "ATTRIBUTES", ""
+        )
 
 
 def parameter_fixer(args):
@@ -55,7 +57,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     arg_count = len(args)
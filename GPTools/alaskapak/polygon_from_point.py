@@ -161,6 +161,8 @@ def make_polygon(point, point_id, group_id, polygon_data):
     return arcpy.Polygon(arcpy.Array(vertices))
 
 
+@utils.instrumented
+@utils.cached_schema
 def polygon_from_control_point(
     point_layer,
     point_id_field_name,
@@ -176,13 +178,14 @@ def polygon_from_control_point(
     # pylint: disable=too-many-arguments,too-many-locals,too-many-branches,too-many-statements
 
     workspace, feature_class = os.path.split(polygon_feature_class)
-    arcpy.CreateFeatureclass_management(
-        workspace, feature_class, "Polygon", "#", "#", "#", point_layer
-    )
+    with utils.span("schema"):
+        arcpy.CreateFeatureclass_management(
+            workspace, feature_class, "Polygon", "#", "#", "#", point_layer
+        )
 
     utils.info("Empty polygon feature class has been created")
     # polygon_feature_class is brand new, so no need to check for a schema lock
-    polygon_fields = arcpy.ListFields(polygon_data_table)
+    polygon_fields = utils.list_fields(polygon_data_table)
     # Add the polygon_id_field_name to the polygon FC
     polygon_id_new_field_name = utils.valid_field_name(
         polygon_id_field_name, polygon_feature_class
@@ -195,9 +198,7 @@ def polygon_from_control_point(
     if field_type is None:
         msg = "Id field '{0}' could not be found in polygon data table {1}"
         utils.die(msg.format(polygon_id_field_name, polygon_data_table))
-    arcpy.AddField_management(
-        polygon_feature_class, polygon_id_new_field_name, field_type
-    )
+    utils.add_field(polygon_feature_class, polygon_id_new_field_name, field_type)
 
     # Add the polygon_group_field_name to the polygon FC
     polygon_group_new_field_name = None
@@ -213,19 +214,18 @@ def polygon_from_control_point(
         if field_type is None:
             msg = "Group field '{0}' could not be found in polygon data table {1}"
             utils.die(msg.format(polygon_group_field_name, polygon_data_table))
-        arcpy.AddField_management(
-            polygon_feature_class, polygon_group_new_field_name, field_type
-        )
+        utils.add_field(polygon_feature_class, polygon_group_new_field_name, field_type)
 
     utils.info("Reading polygon data.")
-    all_polygon_data = get_polygon_data(
-        polygon_data_table,
-        polygon_id_field_name,
-        polygon_group_field_name,
-        polygon_sort_field_name,
-        polygon_azimuth_field_name,
-        polygon_distance_field_name,
-    )
+    with utils.span("read"):
+        all_polygon_data = get_polygon_data(
+            polygon_data_table,
+            polygon_id_field_name,
+            polygon_group_field_name,
+            polygon_sort_field_name,
+            polygon_azimuth_field_name,
+            polygon_distance_field_name,
+        )
     if polygon_group_new_field_name:
         polygon_fields = [
             polygon_id_new_field_name,
@@ -236,9 +236,14 @@ def polygon_from_control_point(
         polygon_fields = [polygon_id_new_field_name, "SHAPE@"]
     point_fields = [point_id_field_name, "SHAPE@XY"]
     utils.info("Creating polygons.")
+    # The write span includes the point reads and the geometry span
+    read = written = skipped = 0
     poly_cursor = arcpy.da.InsertCursor(polygon_feature_class, polygon_fields)
-    with arcpy.da.SearchCursor(point_layer, point_fields) as points:
+    with utils.span("write"), arcpy.da.SearchCursor(
+        point_layer, point_fields
+    ) as points:
         for point in points:
+            read += 1
             point_id = point[0]
             centroid = point[1]
             try:
@@ -246,20 +251,28 @@ def polygon_from_control_point(
             except KeyError:
                 msg = "No polygon data for point {0}. Skipping."
                 utils.warn(msg.format(point_id))
+                skipped += 1
                 continue
             # utils.info("Creating polygons for point {0}".format(point_id))
             if polygon_group_new_field_name:
                 for group_id in polygon_data:
-                    polygon_shape = make_polygon(
-                        centroid, point_id, group_id, polygon_data[group_id]
-                    )
+                    with utils.span("geometry"):
+                        polygon_shape = make_polygon(
+                            centroid, point_id, group_id, polygon_data[group_id]
+                        )
                     if polygon_shape:
                         poly_cursor.insertRow([point_id, group_id, polygon_shape])
+                        written += 1
             else:
-                polygon_shape = make_polygon(centroid, point_id, "", polygon_data)
+                with utils.span("geometry"):
+                    polygon_shape = make_polygon(centroid, point_id, "", polygon_data)
                 if polygon_shape:
                     poly_cursor.insertRow([point_id, polygon_shape])
+                    written += 1
     del poly_cursor
+    utils.count("rows_read", read)
+    utils.count("rows_written", written)
+    utils.count("rows_skipped", skipped)
     utils.info("Output feature class has been populated")
 
 
@@ -284,7 +297,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-branches
@@ -321,7 +334,7 @@ def parameter_fixer(args):
     polygon_feature_class = args[4]
 
     # validate point_layer
-    if not arcpy.Exists(point_layer):
+    if not utils.exists(point_layer):
         utils.die("Control point layer cannot be found. Quitting.")
     # TODO: test for points
 
@@ -329,7 +342,7 @@ def parameter_fixer(args):
     # TODO: check that field exists and is the correct type
 
     # validate polygon_data_table
-    if not arcpy.Exists(polygon_data_table):
+    if not utils.exists(polygon_data_table):
         utils.die("Polygon data table cannot be found. Quitting.")
 
     # validate polygon_id_field_name
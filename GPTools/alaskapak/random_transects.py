@@ -5,18 +5,18 @@ Create random survey transects (lines) within a polygon boundary.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-import math
 import os
-import random
 import sys
 
 import arcpy
 
 if __name__ == "__main__":
     # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
+    import geometry
     import utils
 else:
     # for use as a module and Python toolboxes (*.pyt)
+    from . import geometry
     from . import utils
 
 # TODO: Use environment SR, Z, M, when creating feature class
@@ -24,6 +24,8 @@ else:
 # use *_commandline() , *_testing() and toolbox_validation()
 
 
+@utils.instrumented
+@utils.cached_schema
 def random_transects(
     polygons,
     workspace,
@@ -33,6 +35,8 @@ def random_transects(
     max_length,
     max_tries,
     allow_overlap,
+    workers=1,
+    seed=None,
 ):
     """Creates a feature class of random transect lines within polygons
 
@@ -45,6 +49,11 @@ def random_transects(
         max_length (double): Minimum length of the lines to create
         max_tries (int): Number of times to try and create a line
         allow_overlap (bool): Are lines allowed to overlap each other?
+        workers (int, optional): The number of processes creating transects.
+          Defaults to 1 (no additional processes).
+        seed (int, optional): The seed for the random numbers.  Runs with the
+          same input and seed create the same transects.  Defaults to None
+          (a new random seed).
     """
     # pylint: disable=too-many-arguments
 
@@ -59,6 +68,8 @@ def random_transects(
         min_length,
         max_length,
         allow_overlap,
+        workers,
+        seed,
     )
     arcpy.ResetProgressor()
 
@@ -84,16 +95,16 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     # pylint: disable=too-many-locals,too-many-branches,too-many-statements
 
     # TODO: handle optional command line arguments
-    if len(args) != 7:
+    if len(args) < 7 or len(args) > 9:
         usage = (
             "Usage: {0} areas transects [transects_per_area] "
-            "[min_length] [max_length] [max_tries] [allow_overlap]"
+            "[min_length] [max_length] [max_tries] [allow_overlap] [workers] [seed]"
         )
         utils.die(usage.format(sys.argv[0]))
 
@@ -105,40 +116,36 @@ def parameter_fixer(args):
         max_length,
         max_tries,
         allow_overlap,
-    ) = args
+    ) = args[:7]
+    workers = args[7] if len(args) > 7 else "#"
+    seed = args[8] if len(args) > 8 else "#"
 
     # validate input feature class
     if in_feature_class in ["", "#"]:
-        arcpy.AddError("No input feature class specified.")
-        sys.exit()
-    if not arcpy.Exists(in_feature_class):
-        arcpy.AddError(
+        utils.die("No input feature class specified.")
+    if not utils.exists(in_feature_class):
+        utils.die(
             "The input feature specified (" + in_feature_class + ") does not exist."
         )
-        sys.exit()
-    desc = arcpy.Describe(in_feature_class)
+    desc = utils.describe(in_feature_class)
     shape = desc.shapeType.lower()
     if shape != "polygon":
         msg = "The input features specified ({0}) is not a polygons."
-        arcpy.AddError(msg.format(in_feature_class))
-        sys.exit()
+        utils.die(msg.format(in_feature_class))
 
     # validate output feature class
     if out_feature_class in ["", "#"]:
-        arcpy.AddError("No output feature class specified.")
-        sys.exit()
+        utils.die("No output feature class specified.")
     workspace, name = os.path.split(out_feature_class)
     if not arcpy.Exists(workspace):
         msg = "The output workspace specified ({0}) does not exist."
-        arcpy.AddError(msg.format(workspace))
-        sys.exit()
+        utils.die(msg.format(workspace))
     name = arcpy.ValidateTableName(name, workspace)
     feature_class = os.path.join(workspace, name)
     if arcpy.Exists(feature_class):
         if not arcpy.env.overwriteOutput:
             msg = "Cannot overwrite existing data at: {0}"
-            arcpy.AddError(msg.format(feature_class))
-            sys.exit()
+            utils.die(msg.format(feature_class))
     # no easy way to check that fc is not readonly or locked, so don't
 
     # validate lines_per_poly
@@ -149,12 +156,10 @@ def parameter_fixer(args):
         lines_per_poly = int(lines_per_poly)
     except ValueError:
         msg = "The transects per feature ({0}) is not a whole number."
-        arcpy.AddError(msg.format(lines_per_poly))
-        sys.exit()
+        utils.die(msg.format(lines_per_poly))
     if lines_per_poly < 0:
         msg = "The transects per feature ({0}) is not greater than zero."
-        arcpy.AddError(msg.format(lines_per_poly))
-        sys.exit()
+        utils.die(msg.format(lines_per_poly))
 
     # validate max_tries
     if max_tries in ["", "#"]:
@@ -164,12 +169,10 @@ def parameter_fixer(args):
         max_tries = int(max_tries)
     except ValueError:
         msg = "The number of attempts ({0}) is not a whole number."
-        arcpy.AddError(msg.format(max_tries))
-        sys.exit()
+        utils.die(msg.format(max_tries))
     if max_tries < 0:
         msg = "The number of attempts ({0}) is not greater than zero."
-        arcpy.AddError(msg.format(max_tries))
-        sys.exit()
+        utils.die(msg.format(max_tries))
 
     # validate min_length/max_length
     min_input, max_input = min_length, max_length
@@ -186,24 +189,20 @@ def parameter_fixer(args):
     min_length = linear_units_to_meters(min_length)
     if min_length == -1:
         msg = "The minimum transect length ({0}) is not a number or the units are invalid."
-        arcpy.AddError(msg.format(min_input))
-        sys.exit()
+        utils.die(msg.format(min_input))
     max_length = linear_units_to_meters(max_length)
     if max_length == -1:
         msg = "The maximum transect length ({0}) is not a number or the units are invalid."
-        arcpy.AddError(msg.format(max_input))
-        sys.exit()
+        utils.die(msg.format(max_input))
     if min_length <= 0:
         msg = "The minimum transect length specified ({0} Meters) is not greater than zero."
-        arcpy.AddError(msg.format(min_length))
-        sys.exit()
+        utils.die(msg.format(min_length))
     if max_length < min_length:
         msg = (
             "The maximum transect length specified ({0} Meters) is not greater "
             "than the minimum transect length ({1} Meters)."
         )
-        arcpy.AddError(msg.format(max_length, min_length))
-        sys.exit()
+        utils.die(msg.format(max_length, min_length))
 
     # validate allow_overlap
     if allow_overlap in ["", "#"]:
@@ -211,9 +210,34 @@ def parameter_fixer(args):
         arcpy.AddMessage("Allowing overlaping transects (by default)")
     allow_overlap = allow_overlap.lower() == "true"
 
+    # validate workers
+    if workers in ["", "#"]:
+        workers = 1
+    try:
+        workers = int(workers)
+    except ValueError:
+        msg = "The number of workers ({0}) is not a whole number."
+        utils.die(msg.format(workers))
+    if workers < 1:
+        msg = "The number of workers ({0}) is not greater than zero."
+        utils.die(msg.format(workers))
+
+    # validate seed
+    if seed in ["", "#"]:
+        seed = None
+    else:
+        try:
+            seed = int(seed)
+        except ValueError:
+            msg = "The random seed ({0}) is not a whole number."
+            utils.die(msg.format(seed))
+        if seed < 0:
+            msg = "The random seed ({0}) is less than zero."
+            utils.die(msg.format(seed))
+
     arcpy.AddMessage("Input has been validated.")
     # print(in_feature_class, workspace, name, lines_per_poly, min_length,
-    # max_length, max_tries, allow_overlap)
+    # max_length, max_tries, allow_overlap, workers, seed)
     return (
         in_feature_class,
         workspace,
@@ -223,81 +247,60 @@ def parameter_fixer(args):
         max_length,
         max_tries,
         allow_overlap,
+        workers,
+        seed,
     )
 
 
 def linear_units_to_meters(distance):
     """Toolbox parameters can have a linear unit type which translates a real
     number and a pick UOM pick box to a string like '10.3 Meters'.  This
-    function will convert the known units to meters.
+    function will convert the known units to meters (see
+    `utils.parse_linear_unit()`).
     Return -1 if there is an error."""
 
-    # pylint: disable=too-many-return-statements,too-many-branches
-
-    parts = distance.split()
-    # Too many or two few parts
-    if len(parts) < 1 or len(parts) > 2:
-        return -1
-    # first part must be a number, if no second part assume units are meters
-    number = parts[0]
     try:
-        val = float(number)
+        return utils.parse_linear_unit(distance)
     except ValueError:
-        val = -1
-    if len(parts) == 1:
-        return val
-    # second part (if given) must be a well known units - these come from toolbox
-    units = parts[1]
-    units = units.lower()
-    if units == "centimeters":
-        return val / 100.0
-    if units == "decimaldegrees":
         return -1
-    if units == "decimeters":
-        return val / 10.0
-    if units == "feet":  # international
-        return val * 12 * 2.54 / 100.0
-    if units == "inches":  # international: 2.54 cm == 1 in
-        return val * 2.54 / 100.0
-    if units == "kilometers":
-        return val * 1000
-    if units == "meters":
-        return val
-    if units == "miles":
-        return val * 5280 * 12 * 2.54 / 100.0
-    if units == "millimeters":
-        return val / 1000.0
-    if units == "nauticalmiles":
-        return val * 1852
-    if units == "points":  # 72 points per inch
-        return val * 2.54 / 100.0 / 72
-    if units == "unknown":  # assume meters
-        return val
-    if units == "yards":  # international
-        return val * 3 * 12 * 2.54 / 100.0
-    return -1
 
 
 def create_feature_class(template, workspace, name):
     """Create a new feature class `name` based on the template"""
     shape = "Polyline"
-    description = arcpy.Describe(template)
+    description = utils.describe(template)
     spatial_reference = description.SpatialReference
     has_m, has_z = "DISABLED", "DISABLED"
     if description.hasM:
         has_m = "ENABLED"
     if description.hasZ:
         has_z = "ENABLED"
-    return arcpy.CreateFeatureclass_management(
-        workspace, name, shape, "", has_m, has_z, spatial_reference
-    )
+    with utils.span("schema"):
+        return arcpy.CreateFeatureclass_management(
+            workspace, name, shape, "", has_m, has_z, spatial_reference
+        )
 
 
 def create_lines(
-    polygons, lines, line_goal, max_attempts, min_length, max_length, allow_overlap
+    polygons,
+    lines,
+    line_goal,
+    max_attempts,
+    min_length,
+    max_length,
+    allow_overlap,
+    workers=1,
+    seed=None,
 ):
     """Create lines in the polygons
 
+    The polygon boundaries are read once, then the transects for each
+    polygon are created independently (in worker processes if `workers` > 1)
+    and written to `lines` as they are returned.  Each polygon has its own
+    random number stream (seeded from `seed` and the polygon's OID), so the
+    results do not depend on the number of workers or the order of the
+    polygons.
+
     Args:
         polygons (text): ArcGIS polygon feature class path
         lines (text): ArcGIS polyline feature class path
@@ -306,37 +309,78 @@ def create_lines(
         min_length (double): Minimum length of the lines to create
         max_length (double): Minimum length of the lines to create
         allow_overlap (bool): Are lines allowed to overlap each other?
+        workers (int, optional): The number of processes creating transects.
+          Defaults to 1 (no additional processes).
+        seed (int, optional): The seed for the random numbers.
+          Defaults to None (a new random seed).
     """
 
     # pylint: disable=too-many-arguments,too-many-locals
 
-    spatial_reference = arcpy.Describe(polygons).SpatialReference
+    spatial_reference = utils.describe(polygons).SpatialReference
+
+    seed = utils.new_seed(seed)
+    tasks = []
+    with utils.span("read"), arcpy.da.SearchCursor(
+        polygons, ["OID@", "SHAPE@"]
+    ) as poly_cursor:
+        for oid, shape in poly_cursor:
+            if shape is None:
+                continue
+            tasks.append(
+                (
+                    oid,
+                    geometry.polygon_rings(shape),
+                    (seed, oid),
+                    line_goal,
+                    max_attempts,
+                    min_length,
+                    max_length,
+                    allow_overlap,
+                )
+            )
+    utils.count("rows_read", len(tasks))
+
+    pool = None
+    if workers > 1 and len(tasks) > 1:
+        pool = utils.worker_pool(min(workers, len(tasks)))
+        results = pool.imap(geometry.transects_in_polygon, tasks)
+    else:
+        results = (geometry.transects_in_polygon(task) for task in tasks)
 
     step_num = 0
-    line_fields = ["SHAPE@"]
-    poly_fields = ["OID@", "SHAPE@"]
-    line_cursor = arcpy.da.InsertCursor(lines, line_fields)
-    with arcpy.da.SearchCursor(polygons, poly_fields) as poly_cursor:
-        for row in poly_cursor:
+    line_cursor = arcpy.da.InsertCursor(lines, ["SHAPE@"])
+    try:
+        # The time to search for (or wait for) the transects is a geometry span
+        for oid, segments, exhausted in timed(results, "geometry"):
             step_num += 1
             arcpy.SetProgressorLabel("Processing polygon {0}".format(step_num))
-            oid = row[0]
-            shape = row[1]
-            name = "OBJECTID = {0}".format(oid)
-            lines = get_lines(
-                name,
-                shape,
-                line_goal,
-                max_attempts,
-                min_length,
-                max_length,
-                allow_overlap,
-                spatial_reference,
-            )
-            for line in lines:
-                line_cursor.insertRow([line])
+            with utils.span("geometry"):
+                new_lines = make_lines(segments, spatial_reference)
+            with utils.span("write"):
+                for line in new_lines:
+                    line_cursor.insertRow([line])
+            utils.count("rows_written", len(new_lines))
+            if exhausted:
+                warn_exhausted("OBJECTID = {0}".format(oid), len(segments))
             arcpy.SetProgressorPosition()  # Steps by 1 from 0 to feature count
-    del line_cursor
+    finally:
+        del line_cursor
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def timed(results, span_name):
+    """Yield the items in results, adding the time to get each one to a span."""
+    results = iter(results)
+    while True:
+        with utils.span(span_name):
+            try:
+                item = next(results)
+            except StopIteration:
+                return
+        yield item
 
 
 def get_feature_count(data):
@@ -355,6 +399,8 @@ def get_lines(
     max_length,
     allow_overlap,
     spatial_reference,
+    seed=None,
+    key=0,
 ):
     """Create line within an area
 
@@ -368,118 +414,70 @@ def get_lines(
         allow_overlap (bool): Are lines allowed to overlap each other?
         spatial_reference (arcpy.SpatialReference): The spatial reference system
           of the the polygon and lines.
+        seed (int, optional): The seed for the random numbers.
+          Defaults to None (a new random seed).
+        key (int, optional): The key of the polygon's random number stream.
+          With the polygon's OID, the lines are the same as those made by
+          `create_lines()` with the same seed.  Defaults to 0.
 
     Returns:
         List of arcpy.Polyline: The lines in the polygon
     """
-    # pylint: disable=too-many-arguments,too-many-locals
-    # pylint: disable=invalid-name
-    # I like x, y even if they are too short
-
-    attempt_count = 0
-    lines_in_poly = []
-
-    while len(lines_in_poly) < line_goal and attempt_count < max_attempts:
-        x, y = get_random_point_in_polygon(polygon_shape)
-        pt1, pt2 = get_random_line_ends(x, y, min_length, max_length)
-        # Spatial compare (i.e. contains) will always fail if the two geometries
-        # have different spatial references (including null and not null).
-        line = arcpy.Polyline(
-            arcpy.Array([arcpy.Point(pt1[0], pt1[1]), arcpy.Point(pt2[0], pt2[1])]),
-            spatial_reference,
-        )
-        if polygon_shape.contains(line) and (
-            allow_overlap or not is_overlap(line, lines_in_poly)
-        ):
-            lines_in_poly.append(line)
-            attempt_count = 0
-        else:
-            attempt_count = attempt_count + 1
-    if attempt_count == max_attempts:
-        if len(lines_in_poly) == 0:
-            msg = (
-                "No transect could be created for polygon {0}. Try reducing the length."
-            )
-            arcpy.AddWarning(msg.format(polygon_name))
-        else:
-            msg = "Polygon {0} exceeded maximum attempts at finding all transects."
-            arcpy.AddWarning(msg.format(polygon_name))
-            msg = "   Try increasing the number of attempts, or reducing the transect length."
-            arcpy.AddWarning(msg)
-    return lines_in_poly
-
-
-def is_overlap(my_line, other_lines):
-    """Does `my_line` overlap (spatially) any of the lines in `other_lines`?
-
-    Args:
-        my_line (arcpy.Polyline): The line that may overlap other_lines
-        other_lines (List of arcpy.Polyline): A list of lines
-
-    Returns:
-        bool: True if the line overlaps
-    """
-    for line in other_lines:
-        if my_line.crosses(line):
-            return True
-    return False
-
-
-def get_random_line_ends(x1, y1, min_length, max_length):
-    """The ends of a random line starting at (x1,y1)
-
-    Args:
-        x1 (float): X coordinate of one end of line
-        y1 (float): Y coordinate of one end of line
-        min_length (float): Minimum length of the lines to create
-        max_length (float): Maximum length of the lines to create
-
-    Returns:
-        ((float,float),(float,float)): The coordinate pairs at the end of the line.
-    """
-    # pylint: disable=invalid-name
-    # I like x1, y1, x1, x2 even if they are too short
-
-    length = random.uniform(min_length, max_length)
-    angle = random.uniform(0, 2 * math.pi)
-    x2 = x1 + length * math.cos(angle)
-    y2 = y1 + length * math.sin(angle)
-    return ((x1, y1), (x2, y2))
-
-
-def get_random_point_in_polygon(polygon):
-    """Return a random point in the polygon
-
-    Args:
-        polygon (arcpy.Polygon): A polygon shape
+    # pylint: disable=too-many-arguments
 
-    Returns:
-        (float,float): A coordinate tuple within the polygon
-    """
-    # pylint: disable=invalid-name
-    # I like x, y even if they are too short
-    while True:
-        x, y = get_random_point_in_envelope(polygon.extent)
-        # do not use a point geometry unless you create it with the
-        # same spatial reference as polygon.
-        if polygon.contains(arcpy.Point(x, y)):
-            return (x, y)
+    # Candidates are generated and tested in batches with NumPy.  Only the
+    # accepted lines are turned into arcpy geometries.  The start points are
+    # drawn from a triangulation of the polygon, which is built once, on the
+    # first draw, and reused for all the lines in this polygon.
+    seed = utils.new_seed(seed)
+    rings = geometry.Rings(geometry.polygon_rings(polygon_shape))
+    segments, exhausted = geometry.random_segments_in_rings(
+        rings,
+        line_goal,
+        max_attempts,
+        min_length,
+        max_length,
+        allow_overlap,
+        geometry.random_generator((seed, key)),
+    )
+    lines_in_poly = make_lines(segments, spatial_reference)
+    if exhausted:
+        warn_exhausted(polygon_name, len(lines_in_poly))
+    return lines_in_poly
 
 
-def get_random_point_in_envelope(env):
-    """Return a random point in the envelope
+def make_lines(segments, spatial_reference):
+    """Return a list of arcpy.Polyline for the coordinate pairs in segments
 
     Args:
-        env (arcpy.Extent): A rectangular extents (spatial envelope)
-
-    Returns:
-        (float,float): A coordinate tuple within the envelope
+        segments (list[((float,float),(float,float))]): The ends of each line.
+        spatial_reference (arcpy.SpatialReference): The spatial reference system
+          of the the lines.  Spatial compares will always fail if the two
+          geometries have different spatial references.
     """
     # pylint: disable=invalid-name
-    # I like x, y even if they are too short
-    x = random.uniform(env.XMin, env.XMax)
-    y = random.uniform(env.YMin, env.YMax)
-    return (x, y)
+    # I like x1, y1, x2, y2 even if they are too short
+    return [
+        arcpy.Polyline(
+            arcpy.Array([arcpy.Point(x1, y1), arcpy.Point(x2, y2)]),
+            spatial_reference,
+        )
+        for (x1, y1), (x2, y2) in segments
+    ]
+
+
+def warn_exhausted(polygon_name, line_count):
+    """Warn that a polygon ran out of attempts after creating line_count lines"""
+    if line_count == 0:
+        msg = "No transect could be created for polygon {0}. Try reducing the length."
+        arcpy.AddWarning(msg.format(polygon_name))
+    else:
+        msg = "Polygon {0} exceeded maximum attempts at finding all transects."
+        arcpy.AddWarning(msg.format(polygon_name))
+        msg = (
+            "   Try increasing the number of attempts, or reducing the transect length."
+        )
+        arcpy.AddWarning(msg)
 
 
 if __name__ == "__main__":
@@ -12,13 +12,16 @@ import arcpy
 if __name__ == "__main__":
     # for use as a command line script and with old style ArcGIS toolboxes (*.tbx)
     import utils
-    import line_to_rectangle
+    from line_to_rectangle import line_to_rectangle
 else:
     # for use as a module and Python toolboxes (*.pyt)
+    # The package exports a function with the same name as the line_to_rectangle
+    # module, so `from . import line_to_rectangle` may get the function.
     from . import utils
-    from . import line_to_rectangle
+    from .line_to_rectangle import line_to_rectangle
 
 
+@utils.instrumented
 def square_buildings(edges, buildings):
     """Create rectangular building polygons from a single edge.
 
@@ -39,18 +42,22 @@ def square_buildings(edges, buildings):
 
     # Create an in memory copy of edges and prep it for line_to_rectangles
     # Since temp_edges is in_memory, no need to check for a schema lock
-    arcpy.CopyFeatures_management(edges, temp_edges, "", "0", "0", "0")
-    arcpy.AddField_management(temp_edges, temp_field, "DOUBLE")
-    arcpy.CalculateField_management(
-        temp_edges,
-        temp_field,
-        # FIXME: Will crash with Right_Left null or empty
-        "!Width_Ft! * 0.3048 * (1 if !Right_Left!.lower()[0] == 'r' else -1)",
-        expression_type,
-    )
+    with utils.span("write"):
+        arcpy.CopyFeatures_management(edges, temp_edges, "", "0", "0", "0")
+    with utils.span("schema"):
+        arcpy.AddField_management(temp_edges, temp_field, "DOUBLE")
+    with utils.span("write"):
+        arcpy.CalculateField_management(
+            temp_edges,
+            temp_field,
+            # FIXME: Will crash with Right_Left null or empty
+            "!Width_Ft! * 0.3048 * (1 if !Right_Left!.lower()[0] == 'r' else -1)",
+            expression_type,
+        )
     # Process: Line to Rectangle
-    line_to_rectangle.line_to_rectangle(temp_edges, buildings, temp_field)
-    arcpy.DeleteField_management(buildings, temp_field)
+    line_to_rectangle(temp_edges, buildings, temp_field)
+    with utils.span("schema"):
+        arcpy.DeleteField_management(buildings, temp_field)
 
 
 def parameter_fixer(args):
@@ -74,7 +81,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     arg_count = len(args)
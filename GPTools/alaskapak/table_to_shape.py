@@ -38,12 +38,13 @@ def get_points(featureclass, id_field):
     """
     points = {}
     fields = [id_field, "SHAPE@XY"]
-    with arcpy.da.SearchCursor(featureclass, fields) as cursor:
+    with utils.span("read"), arcpy.da.SearchCursor(featureclass, fields) as cursor:
         for row in cursor:
             pt_id = row[0]
             xy_pair = row[1]
             if pt_id is not None:
                 points[pt_id] = xy_pair
+    utils.count("rows_read", len(points))
     return points
 
 
@@ -97,7 +98,7 @@ def parameter_fixer(args):
 
     Returns:
         A list of validated arguments expected by the task being called.
-        Exits with an error message if the args cannot be transformed.
+        Raises utils.ParameterError if the args cannot be transformed.
     """
 
     if len(args) != 6:
@@ -115,7 +116,7 @@ def parameter_fixer(args):
     out_feature_class = args[5]
 
     # validate table
-    if not arcpy.Exists(table):
+    if not utils.exists(table):
         msg = "shape_table ({0}) does not exist."
         utils.die(msg.format(table))
 
@@ -134,17 +135,17 @@ def parameter_fixer(args):
         utils.die(msg.format(shape_type))
 
     # validate point_feature_class
-    if not arcpy.Exists(point_feature_class):
+    if not utils.exists(point_feature_class):
         msg = "point_features ({0}) does not exist."
         utils.die(msg.format(point_feature_class))
 
-    shape = arcpy.Describe(point_feature_class).shapeType
+    shape = utils.describe(point_feature_class).shapeType
     if shape.lower() != "point":
         msg = "{0} is a {1} not a point feature class."
         utils.die(msg.format(point_feature_class, shape))
 
     # validate point_id_field
-    point_field_names = [field.name for field in arcpy.ListFields(point_feature_class)]
+    point_field_names = [field.name for field in utils.list_fields(point_feature_class)]
     if point_id_field not in point_field_names:
         msg = "point_id_name ({0}) is not a field in {1}."
         utils.die(msg.format(point_id_field, point_feature_class))
@@ -157,7 +158,6 @@ def parameter_fixer(args):
     if not arcpy.Exists(workspace):
         msg = "The destination workspace '{0}' does not exist."
         utils.die(msg.format(workspace))
-        sys.exit()
 
     return [
         table,
@@ -231,7 +231,7 @@ def verify_vertex_names(vertex_names, table):
         None
     """
     # verify vertex names exist in input table
-    table_field_names = [field.name for field in arcpy.ListFields(table)]
+    table_field_names = [field.name for field in utils.list_fields(table)]
     missing_ids = set(vertex_names) - set(table_field_names)
     if missing_ids:
         msg = "The following fields {0} were not found in {1}."
@@ -253,14 +253,14 @@ def verify_vertex_types(vertex_names, table, point_feature_class, point_id_field
     Returns:
         None
     """
-    point_fields = arcpy.ListFields(point_feature_class)
+    point_fields = utils.list_fields(point_feature_class)
     point_id_types = [
         field.type for field in point_fields if field.name == point_id_field
     ]
     if not point_id_types:
         msg = "The point id field '{0}' was not found in {1}."
         utils.die(msg.format(point_id_field, point_feature_class))
-    table_fields = arcpy.ListFields(table)
+    table_fields = utils.list_fields(table)
     vertex_field_types = [
         field.type for field in table_fields if field.name in vertex_names
     ]
@@ -273,6 +273,8 @@ def verify_vertex_types(vertex_names, table, point_feature_class, point_id_field
         utils.die(msg.format(point_id_types[0], vertex_field_types[0]))
 
 
+@utils.instrumented
+@utils.cached_schema
 def table_to_shape(
     table,
     vertex_list,
@@ -317,16 +319,17 @@ def table_to_shape(
         verify_vertex_types(vertex_names, table, point_feature_class, point_id_field)
 
     # Create an in memory feature class for the output.
-    spatial_reference = arcpy.Describe(point_feature_class).SpatialReference
-    temp_fc = arcpy.CreateFeatureclass_management(
-        "in_memory",
-        "temp_fc",
-        shape_type,
-        "",
-        "DISABLED",
-        "DISABLED",
-        spatial_reference,
-    )
+    spatial_reference = utils.describe(point_feature_class).SpatialReference
+    with utils.span("schema"):
+        temp_fc = arcpy.CreateFeatureclass_management(
+            "in_memory",
+            "temp_fc",
+            shape_type,
+            "",
+            "DISABLED",
+            "DISABLED",
+            spatial_reference,
+        )
 
     # Need the database to verify the field name is valid
     database = utils.get_database(out_feature_class)
@@ -334,7 +337,7 @@ def table_to_shape(
     # need field lists for the search and insert cursors.
     in_field_names = []
     out_field_names = []
-    for field in arcpy.ListFields(table):
+    for field in utils.list_fields(table):
         name = field.name
         if (
             # field.type not in ["OID", "Geometry", "GlobalID", "Blob", "Raster"]
@@ -344,18 +347,19 @@ def table_to_shape(
         ):
             new_name = utils.valid_field_name(name, database)
             # Schema lock is not required for an in-memory feature class
-            arcpy.AddField_management(
-                temp_fc,
-                new_name,
-                utils.type_map[field.type],
-                field.precision,
-                field.scale,
-                field.length,
-                field.aliasName,
-                field.isNullable,
-                field.required,
-                field.domain,
-            )
+            with utils.span("schema"):
+                arcpy.AddField_management(
+                    temp_fc,
+                    new_name,
+                    utils.type_map[field.type],
+                    field.precision,
+                    field.scale,
+                    field.length,
+                    field.aliasName,
+                    field.isNullable,
+                    field.required,
+                    field.domain,
+                )
             in_field_names.append(name)
             out_field_names.append(new_name)
 
@@ -366,14 +370,18 @@ def table_to_shape(
     table_fields = vertex_names + in_field_names
     out_fields = ["SHAPE@"] + out_field_names
     vertex_count = len(vertex_names)
+    # The write span includes the table reads and the geometry span
+    read = written = 0
     out_cursor = arcpy.da.InsertCursor(temp_fc, out_fields)
-    with arcpy.da.SearchCursor(table, table_fields) as cursor:
+    with utils.span("write"), arcpy.da.SearchCursor(table, table_fields) as cursor:
         for row in cursor:
+            read += 1
             vertex_ids = row[:vertex_count]
             attributes = row[vertex_count:]
             try:
                 geom_pts = [points[pt_id] for pt_id in vertex_ids]
-                geometry = make_shape(shape_type, geom_pts)
+                with utils.span("geometry"):
+                    geometry = make_shape(shape_type, geom_pts)
             except KeyError:
                 utils.warn("Invalid point id, skipping")
                 geometry = None
@@ -387,14 +395,19 @@ def table_to_shape(
                 # arcpy.da row is a tuple, not a list
                 new_row = (geometry,) + attributes
                 out_cursor.insertRow(new_row)
+                written += 1
 
     del out_cursor
+    utils.count("rows_read", read)
+    utils.count("rows_written", written)
+    utils.count("rows_skipped", read - written)
 
     utils.info("Saving in memory feature class to {0}".format(out_feature_class))
     # feature_set = arcpy.FeatureSet(temp_fc)
-    feature_set = arcpy.FeatureSet()
-    feature_set.load(temp_fc)
-    feature_set.save(out_feature_class)
+    with utils.span("write"):
+        feature_set = arcpy.FeatureSet()
+        feature_set.load(temp_fc)
+        feature_set.save(out_feature_class)
     utils.info("Done.")
 
 
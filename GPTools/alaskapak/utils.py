@@ -6,16 +6,45 @@ Created: 2013-10-24
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import functools
+import hashlib
+import io
+import json
+import math
 import os
+import random
 import sys
+import time
 
 import arcpy
 
+# numpy, multiprocessing, cProfile and the geodesic and geometry modules are
+# imported by the functions that use them, so every tool (most do not need
+# them) imports faster.  The fallback imports of the alaskapak modules are for
+# when utils is imported as a top level module by a command line script.
+
+
+class AlaskaPakError(Exception):
+    """The base class for the errors raised by the alaskapak tools.
+
+    Library code raises these errors instead of exiting, so a tool can be
+    run in a worker process or a long running script.  Only `execute()` (the
+    command line and toolbox entry point) turns them into an error message
+    and an exit.
+    """
+
+    def __init__(self, msg):
+        super(AlaskaPakError, self).__init__(msg)
+        self.msg = msg
+
+
+class ParameterError(AlaskaPakError):
+    """The arguments for a tool are not valid."""
+
 
 def die(msg):
-    """Print error message to console and ArcGIS and exit."""
-    arcpy.AddError(msg)
-    sys.exit()
+    """Stop the tool by raising a ParameterError with msg."""
+    raise ParameterError(msg)
 
 
 def warn(msg):
@@ -62,15 +91,694 @@ def float_range(start, stop, step=1.0):
             start += step
 
 
+def worker_pool(workers, initializer=None, initargs=()):
+    """Return a pool of `workers` worker processes.
+
+    Inside ArcGIS the python executable (sys.executable) is the ArcGIS
+    application, so the worker processes must be told where to find python.
+    Each worker calls initializer(*initargs) when it starts; this is the only
+    way to give the workers shared objects like a multiprocessing.Value.
+    The caller must close() and join() the pool when done.
+    """
+    import multiprocessing
+
+    if not os.path.basename(sys.executable).lower().startswith("python"):
+        executable = os.path.join(sys.exec_prefix, "python.exe")
+        if os.path.exists(executable):
+            multiprocessing.set_executable(executable)
+    return multiprocessing.Pool(workers, initializer, initargs)
+
+
+def new_seed(seed=None):
+    """Return `seed` as an int, or a new random seed if `seed` is None.
+
+    Log the seed so a run can be repeated.
+    """
+    if seed is None:
+        seed = random.randrange(2**31)
+        info("Using random seed {0}".format(seed))
+    return int(seed)
+
+
+# Constants for the SplitMix64 mixing function
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+
+def keyed_random(seed, key, counter):
+    """Return a random number in [0, 1) determined by seed, key and counter.
+
+    This is a counter based generator: the result is a hash (SplitMix64) of
+    the inputs, so there is no hidden state and the numbers for a feature do
+    not depend on which other features were processed first (or where).
+    `keyed_random_array()` is a vectorized version that returns the same
+    numbers.
+
+    Args:
+        seed (int): The seed for the run.
+        key (int): The feature key, typically the OID.
+        counter (int): The position in the feature's stream (0, 1, 2, ...).
+    """
+    value = (seed * _GOLDEN + key) & _MASK64
+    value = (_mix64(value) + (counter + 1) * _GOLDEN) & _MASK64
+    return (_mix64(value) >> 11) / 9007199254740992.0  # 2**53
+
+
+def _mix64(value):
+    """The SplitMix64 finalizer for a python int in [0, 2**64)."""
+    value = ((value ^ (value >> 30)) * _MIX1) & _MASK64
+    value = ((value ^ (value >> 27)) * _MIX2) & _MASK64
+    return value ^ (value >> 31)
+
+
+def keyed_random_array(seed, keys, counter):
+    """Return `keyed_random(seed, key, counter)` for each key in keys.
+
+    Args:
+        seed (int): The seed for the run.
+        keys (numpy.ndarray): The feature keys, typically the OIDs.
+        counter (int): The position in each feature's stream.
+
+    Returns:
+        numpy.ndarray: An array of floats in [0, 1), one for each key.
+    """
+    import numpy as np
+
+    golden = np.uint64(_GOLDEN)
+    with np.errstate(over="ignore"):
+        keys = np.asarray(keys).astype(np.uint64)
+        value = np.uint64(seed & _MASK64) * golden + keys
+        step = np.uint64(((counter + 1) * _GOLDEN) & _MASK64)
+        value = _mix64_array(_mix64_array(value) + step)
+    return (value >> np.uint64(11)).astype(float) / 9007199254740992.0
+
+
+def _mix64_array(value):
+    """The SplitMix64 finalizer for an array of uint64."""
+    import numpy as np
+
+    value = (value ^ (value >> np.uint64(30))) * np.uint64(_MIX1)
+    value = (value ^ (value >> np.uint64(27))) * np.uint64(_MIX2)
+    return value ^ (value >> np.uint64(31))
+
+
+class RandomStream(object):
+    """The stream of random numbers for one feature.
+
+    Provides the `random()` and `uniform()` methods of the random module, but
+    the numbers depend only on the seed, the feature key and how many numbers
+    have been drawn for this feature.
+    """
+
+    def __init__(self, seed, key):
+        self.seed = seed
+        self.key = key
+        self.counter = 0
+
+    def random(self):
+        """Return the next random number in [0, 1)."""
+        value = keyed_random(self.seed, self.key, self.counter)
+        self.counter += 1
+        return value
+
+    def uniform(self, low, high):
+        """Return the next random number in [low, high)."""
+        return low + (high - low) * self.random()
+
+
 def get_points(point_feature, spatial_reference=None):
     """returns a python list of (x,y) pairs"""
-    with arcpy.da.SearchCursor(
+    with span("read"), arcpy.da.SearchCursor(
         point_feature, "SHAPE@XY", spatial_reference=spatial_reference
     ) as cursor:
         points = [row[0] for row in cursor]
+    count("rows_read", len(points))
     return points
 
 
+def planar_measures(feature, measures, oids=None):
+    """Return the planar areas, lengths and/or centroids of each shape keyed by OID.
+
+    The shapes are read (in a SearchCursor, so they are never written back).
+    Areas and lengths are measured from the well known binary of the shape
+    with `geometry.polygon_area()` and `geometry.parts_length()`; the WKB is
+    only read if they are requested.  Centroids are read as the
+    SHAPE@TRUECENTROID, so they work for every shape type, including points.
+
+    Args:
+        feature (text): The path to a feature class.
+        measures (list[text]): Any of "area" (polygons only), "length" (the
+          perimeter of polygons; polygons and polylines only) and "centroid".
+        oids (container, optional): If not None, only the shapes with these
+          OIDs are measured. Defaults to None.
+
+    Returns:
+        dict: A list for each OID of the area, length (in the units of the
+        feature class) or (x, y) centroid of the shape for each of `measures`;
+        None for empty shapes.
+    """
+    try:
+        from . import geometry
+    except (ImportError, ValueError):
+        import geometry
+
+    fields = ["OID@"]
+    if "area" in measures or "length" in measures:
+        fields.append("SHAPE@WKB")
+    if "centroid" in measures:
+        fields.append("SHAPE@TRUECENTROID")
+    values = {}
+    with span("read"), arcpy.da.SearchCursor(feature, fields) as cursor:
+        for row in cursor:
+            if oids is not None and row[0] not in oids:
+                continue
+            shape = dict(zip(fields[1:], row[1:]))
+            if any(value is None for value in shape.values()):
+                values[row[0]] = [None] * len(measures)
+                continue
+            parts = None
+            if "SHAPE@WKB" in shape:
+                parts = geometry.wkb_parts(shape["SHAPE@WKB"])
+            shape_values = []
+            for measure in measures:
+                if measure == "centroid":
+                    shape_values.append(shape["SHAPE@TRUECENTROID"])
+                elif measure == "area":
+                    shape_values.append(geometry.polygon_area(parts))
+                else:
+                    shape_values.append(geometry.parts_length(parts))
+            values[row[0]] = shape_values
+    count("rows_read", len(values))
+    return values
+
+
+def geodesic_measures(feature, measures, oids=None):
+    """Return the geodesic areas and/or lengths of each shape keyed by OID.
+
+    The shapes in feature (which must have a geographic coordinate system) are
+    read as well known binary and measured in batches on the ellipsoid of the
+    coordinate system with `geodesic.Ellipsoid`.
+
+    Args:
+        feature (text): The path to a polygon or polyline feature class.
+        measures (list[text]): Any of "area" (polygons only) and "length" (the
+          perimeter of polygons).
+        oids (container, optional): If not None, only the shapes with these
+          OIDs are measured. Defaults to None.
+
+    Returns:
+        dict: A list for each OID of the square meters or meters of the shape
+        for each of `measures`; None for empty shapes.
+    """
+    try:
+        from . import geodesic
+        from . import geometry
+    except (ImportError, ValueError):
+        import geodesic
+        import geometry
+
+    spatial_reference = describe(feature).spatialReference
+    ellipsoid = geodesic.Ellipsoid.from_spatial_reference(spatial_reference)
+    degrees = math.degrees(spatial_reference.radiansPerUnit)
+    if abs(degrees - 1) < 1e-12:
+        degrees = None
+
+    def shapes():
+        """Generate (OID, parts in decimal degrees)."""
+        with arcpy.da.SearchCursor(feature, ["OID@", "SHAPE@WKB"]) as cursor:
+            for oid, wkb in cursor:
+                if oids is not None and oid not in oids:
+                    continue
+                parts = [] if wkb is None else geometry.wkb_parts(wkb)
+                if degrees is not None:
+                    parts = [[ring * degrees for ring in part] for part in parts]
+                yield oid, parts
+
+    # The shapes are read while they are measured, so this includes the math.
+    with span("read"):
+        values = dict(ellipsoid.batch_measures(shapes(), measures))
+    count("rows_read", len(values))
+    return values
+
+
+# The length of a hex encoded MD5 digest
+HASH_LENGTH = 32
+
+
+def add_hash_field(feature, field_name):
+    """Return the text field for the geometry hashes of the values in field_name.
+
+    The hash field is named for the value field (i.e. "Area_Hash" for "Area")
+    and is created if it does not exist.
+
+    Args:
+        feature (text): The path to a feature class.
+        field_name (text): The name of the field with the calculated values.
+
+    Returns:
+        text: The name of the hash field, or None if it cannot be used or
+        created (with a warning).
+    """
+    hash_field = valid_field_name(field_name + "_Hash", feature)
+    if list_fields(feature, hash_field):
+        if not list_fields(feature, hash_field, "String"):
+            msg = "Field {0} exists, but is not the right type. Skipping..."
+            warn(msg.format(hash_field))
+            return None
+        return hash_field
+    if not arcpy.TestSchemaLock(feature):
+        msg = "Unable to acquire a schema lock to add the hash field. Skipping..."
+        warn(msg)
+        return None
+    info("Creating new field {0}".format(hash_field))
+    add_field(feature, hash_field, "TEXT", field_length=HASH_LENGTH)
+    return hash_field
+
+
+def changed_shapes(feature, hash_field, salt="", force=False):
+    """Return the new geometry hash of each shape that changed, keyed by OID.
+
+    The hash is the MD5 digest of salt and the well known binary of the shape.
+    The salt should describe how the value is calculated (i.e. the units), so
+    that all the values are recalculated when that changes.
+
+    Args:
+        feature (text): The path to a feature class.
+        hash_field (text): The text field with the hash of each shape when its
+          value was last calculated (see `add_hash_field()`).
+        salt (text, optional): Added to the hash of each shape. Defaults to "".
+        force (bool, optional): If True, ignore the saved hashes and return the
+          hash of every shape. Defaults to False.
+
+    Returns:
+        dict: The hash of each shape that does not match its saved hash.
+    """
+    salt = salt.encode("utf-8")
+    changed = {}
+    rows = 0
+    with span("read"), arcpy.da.SearchCursor(
+        feature, ["OID@", "SHAPE@WKB", hash_field]
+    ) as cursor:
+        for oid, wkb, saved in cursor:
+            rows += 1
+            digest = hashlib.md5(salt)
+            if wkb is not None:
+                digest.update(bytes(wkb))
+            digest = digest.hexdigest()
+            if force or digest != saved:
+                changed[oid] = digest
+    count("rows_read", rows)
+    return changed
+
+
+# The number of meters in each linear unit, keyed by the upper case name
+# (without spaces) used by toolbox linear unit parameters.  Decimal degrees
+# are not a fixed length and are not included.
+meters_per_unit = {
+    "CENTIMETERS": 0.01,
+    "DECIMETERS": 0.1,
+    "FEET": 0.3048,  # international: 2.54 cm == 1 in
+    "INCHES": 0.0254,
+    "KILOMETERS": 1000.0,
+    "METERS": 1.0,
+    "MILES": 1609.344,
+    "MILLIMETERS": 0.001,
+    "NAUTICALMILES": 1852.0,
+    "POINTS": 0.0254 / 72,  # 72 points per inch
+    "UNKNOWN": 1.0,  # assume meters
+    "YARDS": 0.9144,
+}
+
+# The number of square meters in each areal unit
+square_meters_per_unit = {
+    "ACRES": 4046.8564224,
+    "ARES": 100.0,
+    "HECTARES": 10000.0,
+    "SQUARECENTIMETERS": 0.0001,
+    "SQUAREDECIMETERS": 0.01,
+    "SQUAREINCHES": 0.00064516,
+    "SQUAREFEET": 0.09290304,
+    "SQUAREKILOMETERS": 1000000.0,
+    "SQUAREMETERS": 1.0,
+    "SQUAREMILES": 2589988.110336,
+    "SQUAREMILLIMETERS": 0.000001,
+    "SQUAREYARDS": 0.83612736,
+}
+
+
+def units_key(units):
+    """Return the registry key for units, i.e. "Square Feet" => "SQUAREFEET"."""
+    return units.upper().replace(" ", "").replace("_", "")
+
+
+def unit_factor(from_units, to_units):
+    """Return the number of to_units in one of from_units.
+
+    Args:
+        from_units (text): A key (or name) in `meters_per_unit` or
+          `square_meters_per_unit`.
+        to_units (text): A unit of the same kind (linear or areal).
+
+    Returns:
+        float: The multiplier to convert values in from_units to to_units.
+
+    Raises:
+        ValueError: If the units are unknown, or not the same kind.
+    """
+    from_key, to_key = units_key(from_units), units_key(to_units)
+    for table in (meters_per_unit, square_meters_per_unit):
+        if from_key in table and to_key in table:
+            return table[from_key] / table[to_key]
+    msg = "Cannot convert from {0} to {1}".format(from_units, to_units)
+    raise ValueError(msg)
+
+
+def convert(values, from_units, to_units):
+    """Convert a number or a sequence of numbers from one unit to another.
+
+    Args:
+        values (float or array_like): The values in from_units.  None or NaN
+          values in a sequence are returned as NaN.
+        from_units (text): See `unit_factor()`.
+        to_units (text): See `unit_factor()`.
+
+    Returns:
+        float or numpy.ndarray: The values in to_units.
+    """
+    import numpy as np
+
+    factor = unit_factor(from_units, to_units)
+    if np.isscalar(values):
+        return values * factor
+    return np.asarray(values, dtype=float) * factor
+
+
+def parse_linear_unit(text):
+    """Return the meters in a toolbox linear unit string like '10.3 Meters'.
+
+    A number without units is assumed to be in meters.
+
+    Raises:
+        ValueError: If text is not a number, optionally followed by one of the
+          units in `meters_per_unit`.
+    """
+    parts = text.split()
+    if len(parts) not in (1, 2):
+        raise ValueError("'{0}' is not a linear unit".format(text))
+    value = float(parts[0])
+    if len(parts) == 1:
+        return value
+    return value * unit_factor(parts[1], "METERS")
+
+
+# The wall time of each kind of work in the current tool run (see span()),
+# keyed by name: [calls, seconds]
+_spans = {}
+
+# The counters (i.e. rows read) for the current tool run (see count())
+_counters = {}
+
+# The number of instrumented() functions that are running
+_instrumented_users = 0
+
+# The environment variables for the optional outputs of instrumented()
+METRICS_FILE_VARIABLE = "ALASKAPAK_METRICS"
+PROFILE_FOLDER_VARIABLE = "ALASKAPAK_PROFILE"
+
+
+class span(object):  # pylint: disable=invalid-name
+    """Context manager that adds the wall time of a block to the span `name`.
+
+    Spans are for the kinds of work a tool does ("schema", "read", "geometry"
+    and "write"), not for each function.  Spans can be nested, in which case
+    the time is included in each of them.
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        entry = _spans.get(self.name)
+        if entry is None:
+            entry = _spans[self.name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += time.time() - self.start
+        return False
+
+
+def count(name, value=1):
+    """Add value to the counter `name` (i.e. "rows_read", "rows_written")."""
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def metrics():
+    """Return a copy of the spans and counters recorded in this process."""
+    spans = dict((name, list(entry)) for name, entry in _spans.items())
+    return {"spans": spans, "counters": dict(_counters)}
+
+
+def merge_metrics(other):
+    """Add the spans and counters returned by `metrics()` in another process."""
+    for name, (calls, seconds) in other["spans"].items():
+        entry = _spans.setdefault(name, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+    for name, value in other["counters"].items():
+        count(name, value)
+
+
+def reset_metrics():
+    """Forget the spans and counters recorded in this process."""
+    _spans.clear()
+    _counters.clear()
+
+
+def instrumented(function):
+    """Decorator that records and reports the metrics of a tool run.
+
+    The spans and counters are reset when the outermost decorated function
+    starts.  When it finishes, a JSON summary of the run (the total time,
+    the time and calls of each span, and the counters) is printed.  The
+    summary is also appended as a line to the file named by the
+    ALASKAPAK_METRICS environment variable, if it is set.  If the
+    ALASKAPAK_PROFILE environment variable is set to a folder, the run is
+    profiled with cProfile, and the stats are saved in that folder (worker
+    processes are not profiled).
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        """Run function and report its metrics."""
+        global _instrumented_users  # pylint: disable=global-statement
+        if _instrumented_users:
+            return function(*args, **kwargs)
+        _instrumented_users += 1
+        reset_metrics()
+        started = time.time()
+        profile_folder = os.environ.get(PROFILE_FOLDER_VARIABLE)
+        profiler = None
+        if profile_folder:
+            import cProfile
+
+            profiler = cProfile.Profile()
+        status = "error"
+        try:
+            if profiler is None:
+                result = function(*args, **kwargs)
+            else:
+                result = profiler.runcall(function, *args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            _instrumented_users -= 1
+            report_metrics(function.__name__, status, started)
+            if profiler is not None:
+                save_profile(profiler, profile_folder, function.__name__, started)
+
+    return wrapper
+
+
+def report_metrics(name, status, started):
+    """Print (and optionally save) the JSON summary of a tool run."""
+    spans = dict(
+        (span_name, {"calls": calls, "seconds": round(seconds, 3)})
+        for span_name, (calls, seconds) in _spans.items()
+    )
+    summary = {
+        "tool": name,
+        "status": status,
+        "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "seconds": round(time.time() - started, 3),
+        "spans": spans,
+        "counters": dict(_counters),
+    }
+    text = "{0}".format(json.dumps(summary, sort_keys=True))
+    info("Metrics: {0}".format(text))
+    metrics_file = os.environ.get(METRICS_FILE_VARIABLE)
+    if metrics_file:
+        try:
+            with io.open(metrics_file, "a", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+        except (IOError, OSError) as ex:
+            warn("Unable to save the metrics to {0}: {1}".format(metrics_file, ex))
+
+
+def save_profile(profiler, folder, name, started):
+    """Save the cProfile stats of a tool run as <folder>/<name>_<start>.prof."""
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(started))
+    stamp += "_{0:03d}".format(int(started * 1000) % 1000)
+    path = os.path.join(folder, "{0}_{1}.prof".format(name, stamp))
+    try:
+        profiler.dump_stats(path)
+        info("Saved the profile to {0}".format(path))
+    except (IOError, OSError) as ex:
+        warn("Unable to save the profile to {0}: {1}".format(path, ex))
+
+
+# Cached schema metadata (see cached_schema()), keyed by (kind, data set, ...)
+_schema_cache = {}
+
+# The number of cached_schema() functions that are running
+_schema_users = 0
+
+
+def cached_schema(function):
+    """Decorator that caches the schema lookups in utils while function runs.
+
+    While any decorated function is running, `describe()`, `list_fields()`,
+    `exists()` and `get_database()` remember their results, so the same data
+    set is only described once per run (each call is a round trip to an
+    enterprise geodatabase).  The cache is emptied when the outermost decorated
+    function returns, so schema changes made between runs are always seen.
+    Schema changes made during a run must go through `add_field()` and
+    `delete_field()` (or call `invalidate_schema()`).
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        """Run function with the schema cache on."""
+        global _schema_users  # pylint: disable=global-statement
+        _schema_users += 1
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _schema_users -= 1
+            if not _schema_users:
+                _schema_cache.clear()
+
+    return wrapper
+
+
+def _cached(key, lookup, *args):
+    """Return lookup(*args), cached as key if the cache is on."""
+    if not _schema_users:
+        with span("schema"):
+            return lookup(*args)
+    if key not in _schema_cache:
+        with span("schema"):
+            _schema_cache[key] = lookup(*args)
+    return _schema_cache[key]
+
+
+def describe(data_set):
+    """Return arcpy.Describe(data_set) (cached, see `cached_schema()`)."""
+    return _cached(("describe", data_set), arcpy.Describe, data_set)
+
+
+def list_fields(data_set, wild_card=None, field_type=None):
+    """Return arcpy.ListFields() as a new list (cached, see `cached_schema()`)."""
+    args = [data_set]
+    if wild_card is not None or field_type is not None:
+        args.append("*" if wild_card is None else wild_card)
+    if field_type is not None:
+        args.append(field_type)
+    key = ("fields", data_set, wild_card, field_type)
+    return list(_cached(key, arcpy.ListFields, *args))
+
+
+def exists(data_set):
+    """Return arcpy.Exists(data_set) (cached, see `cached_schema()`).
+
+    Only True is cached, since a data set can be created at any time.
+    """
+    key = ("exists", data_set)
+    if key in _schema_cache:
+        return True
+    with span("schema"):
+        result = arcpy.Exists(data_set)
+    if result and _schema_users:
+        _schema_cache[key] = True
+    return result
+
+
+def invalidate_schema(data_set=None):
+    """Forget the cached schema of data_set, or of all data sets if None.
+
+    Entries for other names (i.e. a layer) of the same catalog path are also
+    removed.
+    """
+    if data_set is None:
+        _schema_cache.clear()
+        return
+    description = _schema_cache.get(("describe", data_set))
+    catalog_path = getattr(description, "catalogPath", data_set)
+    names = set([data_set, catalog_path])
+    for key, value in list(_schema_cache.items()):
+        if key[0] == "describe" and getattr(value, "catalogPath", None) == catalog_path:
+            names.add(key[1])
+    for key in list(_schema_cache):
+        if key[1] in names:
+            del _schema_cache[key]
+
+
+def add_field(data_set, field_name, field_type, *args, **kwargs):
+    """Call arcpy.AddField_management() and invalidate the cached schema."""
+    try:
+        with span("schema"):
+            return arcpy.AddField_management(
+                data_set, field_name, field_type, *args, **kwargs
+            )
+    finally:
+        invalidate_schema(data_set)
+
+
+def add_fields(data_set, field_description):
+    """Add fields with arcpy.AddFields_management() if available (ArcGIS Pro
+    2.5+), or one at a time, and invalidate the cached schema.
+
+    Args:
+        data_set (text): The table or feature class.
+        field_description (list[list]): [name, type] for each new field.
+    """
+    try:
+        with span("schema"):
+            if hasattr(arcpy, "AddFields_management"):
+                arcpy.AddFields_management(data_set, field_description)
+            else:
+                for field_name, field_type in field_description:
+                    arcpy.AddField_management(data_set, field_name, field_type)
+    finally:
+        invalidate_schema(data_set)
+
+
+def delete_field(data_set, field_names):
+    """Call arcpy.DeleteField_management() and invalidate the cached schema."""
+    try:
+        with span("schema"):
+            return arcpy.DeleteField_management(data_set, field_names)
+    finally:
+        invalidate_schema(data_set)
+
+
 # Maps the string returned by Describe.Field.type and ListFields().type
 # to the string required by arcpy.AddField()
 # Field.type = SmallInteger, Integer, Single, Double, String, Date, OID, Geometry, BLOB.
@@ -103,9 +811,14 @@ def get_database(data_set):
     Returns:
         text: the path to the database
     """
-    if arcpy.Exists(data_set):
-        workspace = os.path.dirname(arcpy.Describe(data_set).catalogPath)
-        desc = arcpy.Describe(workspace)
+    return _cached(("database", data_set), _get_database, data_set)
+
+
+def _get_database(data_set):
+    """Return the database of data_set (uncached, see `get_database()`)."""
+    if exists(data_set):
+        workspace = os.path.dirname(describe(data_set).catalogPath)
+        desc = describe(workspace)
         if hasattr(desc, "datasetType") and desc.datasetType == "FeatureDataset":
             workspace = os.path.dirname(workspace)
         return workspace
@@ -119,6 +832,123 @@ def get_database(data_set):
     return os.path.dirname(data_set)
 
 
+@cached_schema
+def process_by_workspace(
+    task, features, args=(), workers=1, initializer=None, initargs=()
+):
+    """Run task(feature, *args) for each feature; workspaces in parallel.
+
+    The features are grouped by database (see `get_database()`).  The features
+    in a database are processed one at a time to avoid lock contention, but
+    with more than one worker, different databases are processed at the same
+    time in worker processes.  Worker processes get the catalog path of each
+    feature, so layer selections and definition queries are ignored, and their
+    messages are not shown.  The time and status of each feature is reported
+    in a summary.
+
+    Args:
+        task (callable): A module level function (so it can be sent to a worker
+          process) that returns a row count or None if the feature is skipped.
+        features (list[text]): The feature classes (or layers) to process.
+        args (tuple, optional): The other arguments for task. Defaults to ().
+        workers (int, optional): The maximum number of worker processes.
+          Defaults to 1 (process everything in this process).
+        initializer (callable, optional): Called with initargs in each worker
+          process (or in this process) before any features are processed.
+          Defaults to None.
+        initargs (tuple, optional): The arguments for initializer.
+          Defaults to ().
+
+    Returns:
+        list[tuple]: (feature, rows, seconds, error) for each feature, where
+        rows is the result of task and error is None or the error message.
+    """
+    groups = {}
+    order = []
+    for feature in features:
+        database = get_database(feature)
+        if database not in groups:
+            groups[database] = []
+            order.append(database)
+        groups[database].append(feature)
+    jobs = [(task, groups[database], tuple(args)) for database in order]
+
+    if workers > 1 and len(jobs) > 1:
+        jobs = [
+            (task, [describe(feature).catalogPath for feature in group], args)
+            for task, group, args in jobs
+        ]
+        workers = min(workers, len(jobs))
+        info("Processing {0} workspaces with {1} workers".format(len(jobs), workers))
+        pool = worker_pool(workers, initializer, initargs)
+        try:
+            results = []
+            for group, worker_metrics in pool.map(_process_features_in_worker, jobs):
+                results.append(group)
+                merge_metrics(worker_metrics)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        if initializer is not None:
+            initializer(*initargs)
+        results = [_process_features(job) for job in jobs]
+    results = [result for group in results for result in group]
+    report_results(results)
+    return results
+
+
+def _process_features(job):
+    """Run task on each feature in job (task, features, args); time each one."""
+    task, features, args = job
+    results = []
+    for feature in features:
+        start = time.time()
+        error = None
+        rows = None
+        try:
+            rows = task(feature, *args)
+        except AlaskaPakError as ex:
+            error = ex.msg
+        except Exception as ex:  # pylint: disable=broad-except
+            error = str(ex).strip() or type(ex).__name__
+        results.append((feature, rows, time.time() - start, error))
+    return results
+
+
+def _process_features_in_worker(job):
+    """Run `_process_features()` in a worker process, and return its metrics too.
+
+    The worker's part of the run is nested in the parent's instrumented() run,
+    so an instrumented task does not reset or report the metrics of each
+    feature; they add up, and the parent reports them.
+    """
+    global _instrumented_users  # pylint: disable=global-statement
+    reset_metrics()
+    _instrumented_users += 1
+    try:
+        return _process_features(job), metrics()
+    finally:
+        _instrumented_users -= 1
+
+
+def report_results(results):
+    """Print a summary of the results from `process_by_workspace()`."""
+    info("Summary:")
+    failed = 0
+    for feature, rows, seconds, error in results:
+        if error is not None:
+            failed += 1
+            status = "failed ({0})".format(error)
+        elif rows is None:
+            status = "skipped"
+        else:
+            status = "updated {0} rows".format(rows)
+        info("  {0}: {1} in {2:.1f} seconds".format(feature, status, seconds))
+    if failed:
+        warn("{0} of {1} feature classes failed.".format(failed, len(results)))
+
+
 def valid_field_name(field_name, data_set):
     """Returns field_name or a slight modification suitable for the data_set.
 
@@ -134,6 +964,7 @@ def valid_field_name(field_name, data_set):
     return new_field_name
 
 
+@cached_schema
 def execute(task, transformer=None):
     """Execute a task with transformed toolbox parameters (or command line arguments).
 
@@ -156,6 +987,10 @@ def execute(task, transformer=None):
                 raise ValueError("Too many parameters")
     except (RuntimeError, ValueError):
         pass
-    if transformer is not None:
-        args = transformer(args)
-    task(*args)
+    try:
+        if transformer is not None:
+            args = transformer(args)
+        task(*args)
+    except AlaskaPakError as ex:
+        arcpy.AddError(ex.msg)
+        sys.exit()
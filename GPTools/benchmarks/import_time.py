@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the time to import the alaskapak package.
+
+Each case is run in a new Python process (so nothing is cached in
+`sys.modules`) and the median time is reported.  The cases are:
+
+  package: `import alaskapak` (what the toolbox does when it is loaded)
+  <tool module>: import the package and use the first public name of one
+    tool module; this is what a toolbox tool imports when it runs
+  all tools: import the package and use every public name; this is the
+    cost of the old eager import, and of Python 2.7 and 3.5/3.6.
+
+Requires arcpy.
+
+Usage: python import_time.py [runs]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_FOLDER = os.path.join(HERE, "..")
+
+SETUP = "import sys, time; sys.path.insert(0, {0!r}); start = time.time()\n"
+REPORT = "\nprint(time.time() - start)"
+
+TOOL = (
+    "import alaskapak\n"
+    "name = min(n for n, (m, _) in alaskapak._exports.items() if m == {0!r})\n"
+    "getattr(alaskapak, name)"
+)
+ALL_TOOLS = "import alaskapak\nfor name in alaskapak._exports: getattr(alaskapak, name)"
+TOOL_MODULES = [
+    "add_area",
+    "add_geometry_attributes",
+    "add_id",
+    "add_length",
+    "batch",
+    "lake_volume",
+    "line_to_rectangle",
+    "longest_axis",
+    "obscure_points",
+    "points_to_polygons",
+    "polygon_from_point",
+    "random_transects",
+    "square_building",
+    "table_to_shape",
+]
+CASES = (
+    [("package", "import alaskapak")]
+    + [(module, TOOL.format(module)) for module in TOOL_MODULES]
+    + [("all tools", ALL_TOOLS)]
+)
+
+
+def run(code, runs):
+    """Return the median time (in seconds) to run `code` in a new process."""
+    # arcpy is imported first, so the time is only for alaskapak.
+    script = "import arcpy\n" + SETUP.format(PACKAGE_FOLDER) + code + REPORT
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", script])
+        times.append(float(output.decode("utf-8").split()[-1]))
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    """Print a table of import times for each case."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("{0:>23} {1:>12}".format("case", "import (s)"))
+    for name, code in CASES:
+        print("{0:>23} {1:>12.3f}".format(name, run(code, runs)))
+
+
+if __name__ == "__main__":
+    main()
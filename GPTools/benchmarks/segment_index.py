@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the transect overlap check with and without a segment index.
+
+Creates non-overlapping random transects in a square and times the search
+using `SegmentIndex` and using a brute force check against every previously
+accepted line.  Does not require arcpy.
+
+Usage: python segment_index.py [max_transects]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Import the module directly; the alaskapak package requires arcpy
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "alaskapak"))
+import geometry  # pylint: disable=wrong-import-position
+
+
+class BruteForceIndex(object):
+    """Check a segment against every segment previously inserted."""
+
+    def __init__(self, cell_size):
+        # pylint: disable=unused-argument
+        self.segments = []
+
+    def insert(self, x1, y1, x2, y2):
+        """Add a segment."""
+        # pylint: disable=invalid-name
+        self.segments.append((x1, y1, x2, y2))
+
+    def crosses(self, x1, y1, x2, y2):
+        """Does the segment cross any previously inserted segment?"""
+        # pylint: disable=invalid-name
+        for segment in self.segments:
+            if geometry.segment_crosses(x1, y1, x2, y2, *segment):
+                return True
+        return False
+
+
+def run(line_goal, index_class):
+    """Time the creation of `line_goal` non-overlapping transects."""
+    side = 100.0 * line_goal**0.5
+    square = np.array([[0, 0], [0, side], [side, side], [side, 0]], dtype=float)
+    rings = geometry.Rings([[square]])
+    saved = geometry.SegmentIndex
+    geometry.SegmentIndex = index_class
+    try:
+        start = time.time()
+        rng = np.random.RandomState(line_goal)
+        segments, _ = geometry.random_segments_in_rings(
+            rings, line_goal, 1000, 10, 100, allow_overlap=False, rng=rng
+        )
+        elapsed = time.time() - start
+    finally:
+        geometry.SegmentIndex = saved
+    return len(segments), elapsed
+
+
+def main():
+    """Print a table of timings for a range of transect counts."""
+    max_transects = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print("{0:>10} {1:>12} {2:>12}".format("transects", "index (s)", "brute (s)"))
+    line_goal = 10
+    while line_goal <= max_transects:
+        count, indexed = run(line_goal, geometry.SegmentIndex)
+        _, brute = run(line_goal, BruteForceIndex)
+        print("{0:>10} {1:>12.3f} {2:>12.3f}".format(count, indexed, brute))
+        line_goal *= 10
+
+
+if __name__ == "__main__":
+    main()
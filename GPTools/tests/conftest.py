@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Test configuration: make the alaskapak package importable from the tests.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the space filling curve keys in alaskapak.geometry, checked against
+bit by bit references and the properties of the curves.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+
+from alaskapak import geometry
+
+
+def morton_reference(column, row, bits):
+    """Interleave the bits of column (even bits) and row (odd bits)."""
+    key = 0
+    for bit in range(bits):
+        key |= ((column >> bit) & 1) << (2 * bit)
+        key |= ((row >> bit) & 1) << (2 * bit + 1)
+    return key
+
+
+def hilbert_reference(column, row, bits):
+    """The xy2d function from the Wikipedia article on the Hilbert curve."""
+    size = 1 << bits
+    key = 0
+    step = size // 2
+    while step > 0:
+        right = 1 if column & step else 0
+        upper = 1 if row & step else 0
+        key += step * step * ((3 * right) ^ upper)
+        if not upper:
+            if right:
+                column = size - 1 - column
+                row = size - 1 - row
+            column, row = row, column
+        step //= 2
+    return key
+
+
+def full_grid(bits):
+    """Return the x and y of the center of every cell in a 2**bits grid."""
+    cells = np.arange(1 << bits, dtype=float)
+    x, y = np.meshgrid(cells, cells)
+    return x.ravel(), y.ravel()
+
+
+def test_grid_cells():
+    x = np.array([10.0, 20.0, 10.0, 15.0])
+    y = np.array([5.0, 5.0, 10.0, 7.5])
+    column, row = geometry.grid_cells(x, y, bits=2)
+    # The square extent is 10 wide, so the 4 x 4 grid has cells 10 / 3 apart
+    assert column.tolist() == [0, 3, 0, 2]
+    assert row.tolist() == [0, 0, 2, 1]
+
+
+@pytest.mark.parametrize("bits", [1, 3, 5])
+def test_keys_match_references(bits):
+    x, y = full_grid(bits)
+    column, row = geometry.grid_cells(x, y, bits)
+    assert (column == x).all() and (row == y).all()
+    morton = [morton_reference(int(c), int(r), bits) for c, r in zip(x, y)]
+    hilbert = [hilbert_reference(int(c), int(r), bits) for c, r in zip(x, y)]
+    assert geometry.morton_keys(x, y, bits).tolist() == morton
+    assert geometry.hilbert_keys(x, y, bits).tolist() == hilbert
+
+
+@pytest.mark.parametrize("bits", [1, 2, 4, 6])
+def test_hilbert_curve_visits_neighbors(bits):
+    x, y = full_grid(bits)
+    keys = geometry.hilbert_keys(x, y, bits)
+    # Each cell has its own key, and consecutive cells are next to each other
+    assert sorted(keys.tolist()) == list(range(len(x)))
+    order = np.argsort(keys)
+    steps = np.abs(np.diff(x[order])) + np.abs(np.diff(y[order]))
+    assert (steps == 1).all()
+
+
+def test_morton_keys_with_many_bits():
+    rng = np.random.default_rng(7)
+    x = rng.uniform(-1e6, 1e6, 200)
+    y = rng.uniform(-1e6, 1e6, 200)
+    column, row = geometry.grid_cells(x, y, 32)
+    expected = [morton_reference(int(c), int(r), 32) for c, r in zip(column, row)]
+    assert geometry.morton_keys(x, y, 32).tolist() == expected
+
+
+def test_reading_order_keys():
+    x = np.array([0.0, 5.0, 1.0, 6.0])
+    y = np.array([9.0, 8.5, 1.0, 0.5])
+    keys = geometry.reading_order_keys(x, y, row_height=5.0)
+    # Top row left to right, then the bottom row left to right
+    assert np.argsort(keys).tolist() == [0, 1, 2, 3]
+
+
+def test_empty_input():
+    empty = np.zeros(0)
+    assert len(geometry.morton_keys(empty, empty)) == 0
+    assert len(geometry.hilbert_keys(empty, empty)) == 0
+    assert len(geometry.reading_order_keys(empty, empty)) == 0
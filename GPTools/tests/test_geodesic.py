@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for alaskapak.geodesic against reference values from GeographicLib 2.1
+(Geodesic.WGS84.Inverse and PolygonArea).
+
+The geodesic module does not use arcpy, so these tests run anywhere NumPy does.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+
+from alaskapak import geodesic
+
+WGS84 = geodesic.Ellipsoid(*geodesic.WGS84)
+
+# (lon1, lat1, lon2, lat2, distance, azimuth 1, azimuth 2)
+INVERSE = [
+    # The JFK to LHR example in the GeographicLib documentation
+    (-73.8, 40.6, -0.5, 51.6, 5551759.4003186785, 51.19888284557983, 107.82177673551426),
+    (-149.9981, 61.1743, -147.8564, 64.8151, 420014.0267777233, 14.024275197391134, 15.933464043798935),
+    (0.0, 0.0, 1.0, 0.0, 111319.49079327357, 90.0, 90.0),
+    (10.0, -45.0, 10.0, 45.0, 9969888.755955487, 0.0, 0.0),
+    (-150.0, 61.0, -150.00001, 61.00001, 1.2387116253433408, -25.900162422868295, -25.900171169065793),
+    (179.5, 52.0, -179.5, 53.0, 130359.28552044141, 30.999223468006225, 31.792614549405105),
+    (-150.0, 60.0, 30.0, -50.0, 18890705.680819087, 0.0, 180.0),
+]  # fmt: skip
+
+# (ring as (lon, lat) vertices, signed area, perimeter)
+RINGS = [
+    ([(0, 0), (1, 0), (1, 1), (0, 1)], 12308778361.469452, 443770.91724830196),
+    (
+        [(-141, 60), (-141, 70), (-156, 71.3), (-168, 65.6), (-165, 60), (-152, 57)],
+        1554240451867.8052,
+        4678829.779731034,
+    ),
+    (
+        [(179, 50), (-179, 50), (-179, 52), (179, 52)],
+        31233266337.253174,
+        725731.9533953337,
+    ),
+    ([(20, -80), (60, -70), (100, -85)], -897201958284.9297, 4543024.280173394),
+    ([(-120, -30), (60, -40), (150, 40)], -136115069793297.22, 37041104.83934064),
+]
+
+
+def _inverse(lon1, lat1, lon2, lat2):
+    """Return the distance and azimuths for one pair of points."""
+    distance, azi1, azi2 = WGS84.inverse(
+        np.array([lon1]), np.array([lat1]), np.array([lon2]), np.array([lat2])
+    )
+    return distance[0], azi1[0], azi2[0]
+
+
+@pytest.mark.parametrize("lon1,lat1,lon2,lat2,distance,azi1,azi2", INVERSE)
+def test_inverse(lon1, lat1, lon2, lat2, distance, azi1, azi2):
+    # pylint: disable=too-many-arguments
+    result = _inverse(lon1, lat1, lon2, lat2)
+    assert result[0] == pytest.approx(distance, rel=1e-11, abs=1e-6)
+    assert result[1] == pytest.approx(azi1, abs=1e-7)
+    assert result[2] == pytest.approx(azi2, abs=1e-7)
+
+
+def test_inverse_batch():
+    lon1, lat1, lon2, lat2, distance, _, _ = [
+        np.array(column) for column in zip(*INVERSE)
+    ]
+    result = WGS84.inverse(lon1, lat1, lon2, lat2)[0]
+    np.testing.assert_allclose(result, distance, rtol=1e-11, atol=1e-6)
+
+
+@pytest.mark.parametrize("ring,area,perimeter", RINGS)
+def test_ring_area(ring, area, perimeter):
+    ring = np.array(ring, dtype=float)
+    assert WGS84.ring_areas([ring])[0] == pytest.approx(area, rel=1e-9)
+    closed = np.vstack([ring, ring[:1]])
+    assert WGS84.ring_areas([closed])[0] == pytest.approx(area, rel=1e-9)
+    length = WGS84.path_lengths([ring], closed=True)[0]
+    assert length == pytest.approx(perimeter, rel=1e-11)
+
+
+def test_polygon_with_hole():
+    outer = np.array([(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)], dtype=float)
+    hole = np.array([(0.5, 0.5), (0.5, 1.5), (1.5, 1.5), (1.5, 0.5), (0.5, 0.5)])
+    areas = WGS84.polygon_areas([[[outer, hole]], [[hole]]])
+    assert areas[0] == pytest.approx(36924174572.75576, rel=1e-9)
+    assert areas[1] > 0
+
+
+def test_batch_measures():
+    square = np.array([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)], dtype=float)
+    shapes = [(1, [[square]]), (2, []), (3, [[square[::-1]]])]
+    results = dict(WGS84.batch_measures(shapes, ["area", "length"]))
+    assert results[1][0] == pytest.approx(12308778361.469452, rel=1e-9)
+    assert results[1][1] == pytest.approx(443770.91724830196, rel=1e-11)
+    assert list(results[2]) == [None, None]
+    assert results[3][0] == pytest.approx(results[1][0])
+
+
+# Nearly antipodal points, where Newton's method starts from the astroid problem
+NEAR_ANTIPODAL = [
+    (0.0, 0.0, 179.9, 0.0, 20003008.42150941, 9.545672694738908, 170.4543273052611),
+    (0.0, 0.0, 179.5, 0.5, 19936288.578965314, 25.67187286829188, 154.3270854699416),
+    (-30.0, -20.0, 149.8, 20.1, 19989761.013608053, 17.164833164906387, 162.82395677078563),
+    (100.0, 0.01, -80.2, -0.01, 20000239.43772467, 19.368626843454063, 160.63137315654595),
+    (0.0, 89.9, 179.99, -89.91, 20002814.517330103, 179.91001504752768, 0.09998328032657097),
+]  # fmt: skip
+
+
+@pytest.mark.parametrize("lon1,lat1,lon2,lat2,distance,azi1,azi2", NEAR_ANTIPODAL)
+def test_near_antipodal(lon1, lat1, lon2, lat2, distance, azi1, azi2):
+    # pylint: disable=too-many-arguments
+    result = _inverse(lon1, lat1, lon2, lat2)
+    assert result[0] == pytest.approx(distance, rel=1e-11)
+    assert result[1] == pytest.approx(azi1, abs=1e-7)
+    assert result[2] == pytest.approx(azi2, abs=1e-7)
+
+
+def test_unsupported_ellipsoid():
+    with pytest.raises(ValueError):
+        geodesic.Ellipsoid(6378137.0, -0.01)
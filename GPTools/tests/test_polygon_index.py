@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for PolygonIndex in alaskapak.geometry, checked against testing each
+polygon with Rings.contains_points.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+
+from alaskapak import geometry
+
+
+def star(rng, cx, cy, radius, count):
+    """Return a simple ring with `count` vertices around (cx, cy)."""
+    angles = (np.arange(count) + rng.uniform(0, 0.9, count)) * 2 * np.pi / count
+    radii = radius * rng.uniform(0.4, 1.0, count)
+    return np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)])
+
+
+def brute_force(polygons, x, y):
+    """Return True where a point is inside any of the polygons."""
+    inside = np.zeros(len(x), dtype=bool)
+    for parts in polygons:
+        inside |= geometry.Rings(parts).contains_points(x, y)
+    return inside
+
+
+def overlapping_polygons(rng, count):
+    """Return `count` polygons (with holes) that overlap each other."""
+    polygons = []
+    for _ in range(count):
+        cx, cy = rng.uniform(0, 300, 2)
+        outer = star(rng, cx, cy, 80, rng.integers(3, 60))
+        hole = star(rng, cx, cy, 25, rng.integers(3, 12))
+        polygons.append([[outer, hole]])
+    return polygons
+
+
+def build(polygons, cell_size):
+    """Return a PolygonIndex of the polygons."""
+    index = geometry.PolygonIndex(cell_size)
+    for parts in polygons:
+        index.insert(parts)
+    return index
+
+
+@pytest.mark.parametrize("cell_size", [0, 0.7, 5, 33, 1000])
+def test_overlapping_polygons(cell_size):
+    rng = np.random.default_rng(3)
+    polygons = overlapping_polygons(rng, 8)
+    index = build(polygons, cell_size)
+    assert len(index) == len(polygons)
+    x = rng.uniform(-100, 400, 5000)
+    y = rng.uniform(-100, 400, 5000)
+    expected = brute_force(polygons, x, y)
+    assert (index.contains_points(x, y) == expected).all()
+    assert 0 < expected.sum() < len(x)
+
+
+@pytest.mark.parametrize("cell_size", [4, 6, 8])
+def test_vertices_on_row_centers(cell_size):
+    # With integer vertices and even cells (larger than the edges), vertices
+    # and horizontal edges lie on the center lines of the grid rows
+    rng = np.random.default_rng(4)
+    polygons = [
+        [[np.round(star(rng, 20, 20, 15, 40))]],
+        [[np.array([[0, 0], [8, 0], [8, 3], [4, 3], [4, 5], [0, 5]], dtype=float)]],
+    ]
+    index = build(polygons, cell_size)
+    x = rng.uniform(-2, 40, 5000)
+    y = rng.uniform(-2, 40, 5000)
+    assert (index.contains_points(x, y) == brute_force(polygons, x, y)).all()
+
+
+def test_points_on_cell_boundaries():
+    rng = np.random.default_rng(5)
+    polygons = overlapping_polygons(rng, 4)
+    index = build(polygons, 10)
+    x = np.concatenate([10.0 * rng.integers(-5, 40, 2000), rng.uniform(-50, 400, 2000)])
+    y = np.concatenate([rng.uniform(-50, 400, 2000), 10.0 * rng.integers(-5, 40, 2000)])
+    assert (index.contains_points(x, y) == brute_force(polygons, x, y)).all()
+
+
+def test_insert_after_query():
+    rng = np.random.default_rng(6)
+    first, second = overlapping_polygons(rng, 2)
+    index = build([first], 10)
+    x = rng.uniform(-100, 400, 1000)
+    y = rng.uniform(-100, 400, 1000)
+    assert (index.contains_points(x, y) == brute_force([first], x, y)).all()
+    index.insert(second)
+    expected = brute_force([first, second], x, y)
+    assert (index.contains_points(x, y) == expected).all()
+
+
+def test_empty_index():
+    index = geometry.PolygonIndex(10)
+    index.insert([])
+    assert len(index) == 0
+    assert not index.contains_points(np.array([1.0]), np.array([2.0])).any()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for segments_cross and the Rings spatial tests in alaskapak.geometry,
+checked against brute force references (exact intersections with fractions,
+and winding angles).
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from alaskapak import geometry
+
+
+def crosses_reference(a, b):
+    """Do segments a and b (x1, y1, x2, y2) cross at a point inside both?"""
+    ax1, ay1, ax2, ay2 = [Fraction(value) for value in a]
+    bx1, by1, bx2, by2 = [Fraction(value) for value in b]
+    denominator = (ax2 - ax1) * (by2 - by1) - (ay2 - ay1) * (bx2 - bx1)
+    if denominator == 0:
+        return False  # parallel or collinear
+    t = ((bx1 - ax1) * (by2 - by1) - (by1 - ay1) * (bx2 - bx1)) / denominator
+    u = ((bx1 - ax1) * (ay2 - ay1) - (by1 - ay1) * (ax2 - ax1)) / denominator
+    return 0 < t < 1 and 0 < u < 1
+
+
+def winding_inside(rings, x, y):
+    """Is (x, y) inside an odd number of rings?  Uses the winding angle."""
+    inside = False
+    for ring in rings:
+        angles = np.arctan2(ring[:, 1] - y, ring[:, 0] - x)
+        turns = np.diff(np.append(angles, angles[0]))
+        turns = (turns + np.pi) % (2 * np.pi) - np.pi
+        if abs(turns.sum()) > np.pi:
+            inside = not inside
+    return inside
+
+
+def star(rng, cx, cy, radius, count):
+    """Return a simple ring with `count` vertices around (cx, cy)."""
+    angles = (np.arange(count) + rng.uniform(0, 0.9, count)) * 2 * np.pi / count
+    radii = radius * rng.uniform(0.4, 1.0, count)
+    return np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)])
+
+
+def test_segments_cross_matches_exact_intersections():
+    rng = np.random.default_rng(0)
+    # Small integers make many touching, collinear and shared end points
+    a = rng.integers(0, 6, (150, 4))
+    b = rng.integers(0, 6, (150, 4))
+    result = geometry.segments_cross(
+        a[:, 0:1], a[:, 1:2], a[:, 2:3], a[:, 3:4], b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    )
+    expected = [[crosses_reference(sa, sb) for sb in b] for sa in a]
+    assert (result == np.array(expected)).all()
+    assert result.any()
+
+
+def test_segment_crosses_matches_segments_cross():
+    rng = np.random.default_rng(1)
+    segments = rng.integers(0, 6, (2000, 8))
+    for values in segments:
+        assert geometry.segment_crosses(*values) == geometry.segments_cross(*values)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contains_points(seed):
+    rng = np.random.default_rng(seed)
+    outer = star(rng, 0, 0, 100, 30)
+    hole = star(rng, 0, 0, 30, 12)
+    island = star(rng, 200, 0, 40, 8)
+    rings = geometry.Rings([[outer, hole], [island]])
+    x = rng.uniform(-120, 260, 2000)
+    y = rng.uniform(-120, 120, 2000)
+    expected = [winding_inside([outer, hole, island], *point) for point in zip(x, y)]
+    assert (rings.contains_points(x, y) == np.array(expected)).all()
+
+
+def test_contains_points_is_independent_of_chunk_size(monkeypatch):
+    rng = np.random.default_rng(5)
+    rings = geometry.Rings([[star(rng, 0, 0, 100, 200)]])
+    x = rng.uniform(-100, 100, 500)
+    y = rng.uniform(-100, 100, 500)
+    expected = rings.contains_points(x, y)
+    monkeypatch.setattr(geometry, "MAX_CELLS", 1000)
+    assert (rings.contains_points(x, y) == expected).all()
+
+
+def test_contains_segments():
+    square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=float)
+    hole = np.array([[4, 4], [6, 4], [6, 6], [4, 6]], dtype=float)
+    rings = geometry.Rings([[square, hole]])
+    x1 = np.array([1.0, 1.0, 1.0, 1.0])
+    y1 = np.array([1.0, 1.0, 1.0, 5.0])
+    x2 = np.array([9.0, 9.0, 12.0, 3.0])
+    y2 = np.array([2.0, 8.0, 1.0, 5.0])
+    # inside; through the hole; leaves the square; inside, left of the hole
+    expected = [True, False, False, True]
+    assert rings.contains_segments(x1, y1, x2, y2).tolist() == expected
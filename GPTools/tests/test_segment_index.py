@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for SegmentIndex in alaskapak.geometry, checked against testing every
+segment with segments_cross.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+
+from alaskapak import geometry
+
+
+def random_segments(rng, count, extent, length):
+    """Return a (count, 4) array of segments with random ends and directions."""
+    x = rng.uniform(0, extent, count)
+    y = rng.uniform(0, extent, count)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    size = rng.uniform(0, length, count)
+    return np.column_stack([x, y, x + size * np.cos(angle), y + size * np.sin(angle)])
+
+
+@pytest.mark.parametrize("cell_size", [0, 0.5, 10, 45, 1000])
+def test_crosses_matches_brute_force(cell_size):
+    rng = np.random.default_rng(2)
+    inserted = random_segments(rng, 300, 500, 60)
+    queries = random_segments(rng, 500, 500, 60)
+    index = geometry.SegmentIndex(cell_size)
+    for segment in inserted:
+        index.insert(*segment)
+    assert len(index) == len(inserted)
+    expected = geometry.segments_cross(
+        queries[:, 0:1],
+        queries[:, 1:2],
+        queries[:, 2:3],
+        queries[:, 3:4],
+        inserted[:, 0],
+        inserted[:, 1],
+        inserted[:, 2],
+        inserted[:, 3],
+    ).any(axis=1)
+    result = [index.crosses(*segment) for segment in queries]
+    assert result == expected.tolist()
+    assert 0 < expected.sum() < len(queries)
+
+
+def test_negative_coordinates_and_touching_ends():
+    index = geometry.SegmentIndex(1.0)
+    index.insert(-5.0, -5.0, -1.0, -1.0)
+    assert index.crosses(-5.0, -1.0, -1.0, -5.0)
+    # Sharing an end point, or continuing along the same line, is not a crossing
+    assert not index.crosses(-1.0, -1.0, 3.0, -1.0)
+    assert not index.crosses(-1.0, -1.0, 2.0, 2.0)
+    assert not index.crosses(-5.0, -4.0, -1.0, 0.0)
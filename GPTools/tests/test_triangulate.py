@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the ear clipping triangulation and TriangleSampler in
+alaskapak.geometry, checked against the polygon area and Rings.contains_points.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+
+from alaskapak import geometry
+
+
+def star(rng, cx, cy, radius, count):
+    """Return a simple ring with `count` vertices around (cx, cy)."""
+    angles = (np.arange(count) + rng.uniform(0, 0.9, count)) * 2 * np.pi / count
+    radii = radius * rng.uniform(0.4, 1.0, count)
+    return np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)])
+
+
+def polygon_with_holes(rng, hole_count):
+    """Return the rings of a polygon with `hole_count` disjoint holes inside it."""
+    outer = star(rng, 0, 0, 100, rng.integers(5, 40))
+    rings = [outer]
+    while len(rings) <= hole_count:
+        cx, cy = rng.uniform(-80, 80, 2)
+        hole = star(rng, cx, cy, rng.uniform(3, 20), rng.integers(3, 15))
+        others = geometry.Rings([rings])
+        edges = geometry.Rings([[hole]])
+        if not others.contains_points(hole[:, 0], hole[:, 1]).all():
+            continue
+        if edges.contains_points(others.x1, others.y1).any():
+            continue
+        if edges.crosses_segments(others.x1, others.y1, others.x2, others.y2).any():
+            continue
+        rings.append(hole)
+    return rings
+
+
+def square_holes(rng, size):
+    """Return the rings of a square with holes on a grid (many equal x values)."""
+    side = 2.0 * size + 1
+    outer = np.array([[0, 0], [side, 0], [side, side], [0, side]], dtype=float)
+    unit = np.array([[1, 1], [2, 1], [2, 2], [1, 2]], dtype=float)
+    cells = rng.choice(size * size, rng.integers(2, size * size + 1), replace=False)
+    return [outer] + [
+        unit + 2 * np.array([cell % size, cell // size]) for cell in cells
+    ]
+
+
+def triangle_areas(triangles):
+    """Return the area of each triangle in a (n, 3, 2) array."""
+    ab = triangles[:, 1] - triangles[:, 0]
+    ac = triangles[:, 2] - triangles[:, 0]
+    return np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]) / 2
+
+
+def check_triangulation(rings, rng):
+    """Triangulate rings and check the area and the sampled points."""
+    triangles = geometry.triangulate([rings])
+    assert triangles is not None
+    area = geometry.polygon_area([rings])
+    assert triangle_areas(triangles).sum() == pytest.approx(area, rel=1e-9)
+    polygon = geometry.Rings([rings])
+    x, y = polygon.sampler.sample(500, rng)
+    assert len(x) == 500
+    assert polygon.contains_points(x, y).all()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_disjoint_holes(seed):
+    rng = np.random.default_rng(seed)
+    for hole_count in (2, 3, 4):
+        check_triangulation(polygon_with_holes(rng, hole_count), rng)
+
+
+@pytest.mark.parametrize("size", [2, 3, 5, 7])
+def test_holes_on_a_grid(size):
+    rng = np.random.default_rng(size)
+    for _ in range(10):
+        check_triangulation(square_holes(rng, size), rng)
+
+
+def test_hole_outside_is_ignored():
+    outer = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=float)
+    hole = np.array([[3, 3], [3, 6], [6, 6], [6, 3]], dtype=float)
+    away = hole + 20
+    triangles = geometry.triangulate([[outer, hole, away]])
+    assert triangle_areas(triangles).sum() == pytest.approx(91)
+
+
+def test_sampler_is_uniform():
+    rng = np.random.default_rng(1)
+    outer = np.array([[0, 0], [4, 0], [4, 4], [0, 4]], dtype=float)
+    hole = np.array([[1, 1], [1, 3], [3, 3], [3, 1]], dtype=float)
+    sampler = geometry.TriangleSampler(geometry.triangulate([[outer, hole]]))
+    assert sampler.area == pytest.approx(12)
+    x, y = sampler.sample(120000, rng)
+    # The four 2 x 2 quadrants of the square each hold a quarter of the area
+    counts = np.bincount((x >= 2).astype(int) * 2 + (y >= 2), minlength=4)
+    assert counts / len(x) == pytest.approx([0.25] * 4, abs=0.01)